@@ -2,7 +2,10 @@ import io
 import json
 import os
 import random
+import shutil
 import sys
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Any
 from sqlmodel import SQLModel, Field, create_engine, Session, select
@@ -16,23 +19,44 @@ from pydantic import BaseModel
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
 
-from causal_agent.analysis import ExperimentAnalysis, analyze_experiment, analyze_observational
+from causal_agent.analysis import (
+    ExperimentAnalysis,
+    QuantileAnalysis,
+    Scorecard,
+    SummaryAnalysis,
+    analyze_experiment,
+    analyze_experiment_stream,
+    analyze_observational,
+    analyze_quantiles,
+    analyze_scorecard,
+    analyze_scorecard_stream,
+    analyze_summary_stats,
+)
+from causal_agent.batch import analyze_batch
 from causal_agent.causal import CausalResult
 from causal_agent.config import Settings, load_settings
 from causal_agent.critic import CriticService
+from causal_agent.ingest import compact_dtypes, file_format, iter_table_chunks, read_table
+from causal_agent.memo import CacheStats, ResultCache, result_key
 from causal_agent.planner import build_plan
 from causal_agent.power import calculate_sample_size
+from causal_agent.pushdown import analyze_experiment_sql, did_sql
 from causal_agent.rag import LocalRAG
+from causal_agent.registry import DatasetInfo, DatasetRegistry, content_hash
 from causal_agent.schemas import (
     AnalysisType,
+    BatchAnalysisRequest,
     ExperimentContext,
     ExperimentInputs,
     ExperimentPlan,
     ExperimentSpec,
+    MetricSpec,
     MetricType,
     PowerRequest,
     PowerResult,
+    SummaryAnalysisRequest,
 )
+from causal_agent.sequential import SequentialTest
 
 router = APIRouter()
 default_settings = load_settings()
@@ -42,6 +66,11 @@ default_settings = load_settings()
 # 尝试从环境变量读取数据库地址，如果没有则报错 (本地开发可以用 sqlite)
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./local.db")
 
+# Parsed uploads, cached as memory-mapped Arrow files keyed by content hash
+DATASET_CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "causal_agent_datasets"))
+DATASET_CACHE_MB = int(os.environ.get("DATASET_CACHE_MB", "2048"))
+dataset_registry = DatasetRegistry(DATASET_CACHE_DIR, max_bytes=DATASET_CACHE_MB << 20)
+
 # 创建数据库连接引擎
 # 增加 pool_pre_ping=True 参数
 engine = create_engine(
@@ -60,6 +89,12 @@ class Experiment(SQLModel, table=True):
     metric: str
     progress: int = 0
 
+class AnalysisResultRecord(SQLModel, table=True):
+    # Persistent tier of the analysis result cache
+    __table_args__ = {"extend_existing": True}
+    key: str = Field(primary_key=True)
+    payload: str
+
 # --- 3. 启动时自动建表 ---
 # 这是一个简单的建表函数，稍后在 main.py 里调用，或者直接在这里并在模块加载时执行(偷懒做法)
 def create_db_and_tables():
@@ -74,6 +109,31 @@ try:
 except Exception:
     pass
 
+class SqlResultStore:
+    """Persists cached analysis results in the local SQL database."""
+
+    def load(self, key: str) -> str | None:
+        try:
+            with Session(engine) as session:
+                record = session.get(AnalysisResultRecord, key)
+                return record.payload if record else None
+        except Exception as e:
+            print(f"Warning: result cache lookup failed: {e}")
+            return None
+
+    def save(self, key: str, payload: str) -> None:
+        try:
+            with Session(engine) as session:
+                session.merge(AnalysisResultRecord(key=key, payload=payload))
+                session.commit()
+        except Exception as e:
+            print(f"Warning: result cache write failed: {e}")
+
+# Identical analysis requests (same file bytes and parameters) are answered from here
+RESULT_CACHE_MB = int(os.environ.get("RESULT_CACHE_MB", "64"))
+RESULT_CACHE_PERSIST = os.environ.get("RESULT_CACHE_PERSIST", "0") == "1"
+result_cache = ResultCache(RESULT_CACHE_MB << 20, store=SqlResultStore() if RESULT_CACHE_PERSIST else None)
+
 class DashboardStats(BaseModel):
     total_experiments: int
     active_experiments: int
@@ -90,6 +150,10 @@ class PreviewResponse(BaseModel):
     columns: list[str]
     preview: list[dict[str, Any]]
 
+class SequentialResponse(BaseModel):
+    analysis: ExperimentAnalysis
+    state: dict[str, Any]
+
 # --- LLM Adapter ---
 class LLMAdapter:
     def __init__(self, settings: Settings):
@@ -285,11 +349,8 @@ async def brain_ask(
 @router.post("/common/preview", response_model=PreviewResponse)
 async def common_preview(file: UploadFile = File(...)):
     try:
-        contents = await file.read()
-        if file.filename and file.filename.endswith('.xlsx'):
-            df = pd.read_excel(io.BytesIO(contents), nrows=5)
-        else:
-            df = pd.read_csv(io.BytesIO(contents), nrows=5)
+        await file.seek(0)
+        df = read_table(file.file, file_format(file.filename), nrows=5)
             
         # Replace NaN with None for JSON serialization
         df = df.where(pd.notnull(df), None)
@@ -379,98 +440,486 @@ def generate_data(type: str, method: str | None = None):
     response.headers["Content-Disposition"] = "attachment; filename=random_data.csv"
     return response
 
+def _sanitize_analysis(result: ExperimentAnalysis) -> ExperimentAnalysis:
+    # Ensure JSON compatibility for infinite/NaN values
+    for res in result.results:
+        if res.lift is not None and (pd.isna(res.lift) or pd.api.types.is_float(res.lift) and (res.lift == float('inf') or res.lift == float('-inf'))):
+            res.lift = None
+        if res.mean is not None and (pd.isna(res.mean) or pd.api.types.is_float(res.mean) and (res.mean == float('inf') or res.mean == float('-inf'))):
+             res.mean = 0.0 # fallback
+    return result
+
+def _require_source(file: UploadFile | None, dataset_id: str | None) -> UploadFile | None:
+    if file is None and not dataset_id:
+        raise ValueError("Provide either a file or a dataset_id")
+    return file
+
+async def _upload_chunks(
+    file: UploadFile | None,
+    columns: set[str | None],
+    categorical: set[str | None],
+    chunksize: int,
+    dataset_id: str | None = None
+):
+    # The upload is already spooled to disk; read it in bounded chunks and only
+    # the columns the analysis needs, so memory scales with variants, not rows.
+    if dataset_id:
+        return dataset_registry.iter_chunks(dataset_id, columns, categorical, chunksize)
+    file = _require_source(file, dataset_id)
+    await file.seek(0)
+    return iter_table_chunks(file.file, file_format(file.filename), columns, categorical, chunksize)
+
+async def _upload_frame(
+    file: UploadFile | None,
+    columns: set[str | None],
+    categorical: set[str | None] = frozenset(),
+    dataset_id: str | None = None
+):
+    # CSV, XLSX, Parquet or Arrow IPC; only the referenced columns are parsed.
+    # A registered dataset_id skips parsing and reads the memory-mapped cache.
+    if dataset_id:
+        return dataset_registry.read(dataset_id, columns, categorical)
+    file = _require_source(file, dataset_id)
+    await file.seek(0)
+    df, _ = compact_dtypes(read_table(file.file, file_format(file.filename), columns, categorical))
+    return df
+
+def _dataset_key(file: UploadFile | None, dataset_id: str | None) -> str:
+    # Registered ids are the content hash prefix, so uploads and dataset_ids share cache entries
+    if dataset_id:
+        return dataset_id
+    return content_hash(_require_source(file, dataset_id).file)[:32]
+
+@router.get("/cache/stats", response_model=CacheStats)
+def cache_stats():
+    return result_cache.stats()
+
+@contextmanager
+def _local_file(file: UploadFile | None, dataset_id: str | None):
+    # Path on local disk for the DuckDB backend: the registry cache or a copy of the upload
+    if dataset_id:
+        yield dataset_registry.path(dataset_id)
+        return
+    file = _require_source(file, dataset_id)
+    file.file.seek(0)
+    suffix = Path(file.filename or "").suffix or ".csv"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+    try:
+        yield tmp.name
+    finally:
+        os.unlink(tmp.name)
+
+@router.post("/datasets", response_model=DatasetInfo)
+async def register_dataset(file: UploadFile = File(...)):
+    """Parse an upload once; later analyses pass the returned dataset_id instead of the file."""
+    try:
+        return dataset_registry.register(file.file, file.filename)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+@router.get("/datasets/{dataset_id}", response_model=DatasetInfo)
+def get_dataset(dataset_id: str):
+    try:
+        return dataset_registry.info(dataset_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+
 @router.post("/analysis/upload", response_model=ExperimentAnalysis)
 async def analysis_upload(
-    file: UploadFile = File(...),
+    file: UploadFile | None = File(None),
+    dataset_id: str | None = Form(None), # from /datasets; replaces the file
     metric_col: str = Form(...),
     variant_col: str = Form(...),
-    metric_type: str = Form(...), # "binary" or "continuous"
+    metric_type: str = Form(...), # "binary", "continuous" or "ratio"
     control_label: str = Form(...),
-    covariate_col: str | None = Form(None),
-    analysis_type: str = Form("frequentist")
+    covariate_col: str | None = Form(None), # one column, or several separated by commas
+    analysis_type: str = Form("frequentist"),
+    denominator_col: str | None = Form(None), # ratio metrics: metric_col / denominator_col
+    cuped_cache_key: str | None = Form(None), # e.g. experiment id; reuses the fitted CUPED theta
+    stream: bool = Form(False),  # fold the file into per-variant moments chunk by chunk (XLSX is read whole)
+    chunksize: int = Form(200_000),
+    bayesian_method: str = Form("quadrature"), # "quadrature" or "monte_carlo"
+    seed: int | None = Form(None), # Monte Carlo and bootstrap
+    ci_method: str = Form("normal"), # "normal" or "bootstrap"
+    n_boot: int = Form(1000),
+    n_jobs: int = Form(1),
+    allocation: str | None = Form(None), # JSON weights per variant, e.g. {"control": 0.9, "treatment": 0.1}
+    timestamp_col: str | None = Form(None), # adds the cumulative daily SRM series
+    backend: str = Form("pandas") # "pandas" or "duckdb" (aggregates CSV/Parquet out of core)
 ):
     try:
-        contents = await file.read()
-        if file.filename and file.filename.endswith('.xlsx'):
-             df = pd.read_excel(io.BytesIO(contents))
-        else:
-             df = pd.read_csv(io.BytesIO(contents))
-        
         m_type = MetricType(metric_type)
         a_type = AnalysisType(analysis_type)
-        
-        result = analyze_experiment(
-            df=df,
-            metric_col=metric_col,
-            variant_col=variant_col,
-            metric_type=m_type,
-            control_label=control_label,
-            covariate_col=covariate_col,
-            analysis_type=a_type
-        )
-        # Ensure JSON compatibility for infinite/NaN values
-        for res in result.results:
-            if res.lift is not None and (pd.isna(res.lift) or pd.api.types.is_float(res.lift) and (res.lift == float('inf') or res.lift == float('-inf'))):
-                res.lift = None
-            if res.mean is not None and (pd.isna(res.mean) or pd.api.types.is_float(res.mean) and (res.mean == float('inf') or res.mean == float('-inf'))):
-                 res.mean = 0.0 # fallback
+        weights = json.loads(allocation) if allocation else None
+        covariates = [c.strip() for c in covariate_col.split(",") if c.strip()] if covariate_col else []
+        covariate_arg = covariates if len(covariates) > 1 else (covariates[0] if covariates else None)
+        columns = {metric_col, variant_col, denominator_col, timestamp_col, *covariates}
+
+        # Unseeded Monte Carlo / bootstrap results are random, so they are not memoized
+        randomized = ci_method == "bootstrap" or (a_type == AnalysisType.BAYESIAN and bayesian_method == "monte_carlo")
+        key = None
+        if seed is not None or not randomized:
+            params = dict(
+                metric_col=metric_col, variant_col=variant_col, metric_type=m_type, control_label=control_label,
+                covariates=covariates, analysis_type=a_type, denominator_col=denominator_col,
+                cuped_cache_key=cuped_cache_key, bayesian_method=bayesian_method, seed=seed, ci_method=ci_method,
+                n_boot=n_boot, allocation=weights, timestamp_col=timestamp_col, backend=backend
+            )
+            key = result_key("experiment", _dataset_key(file, dataset_id), params)
+            cached = result_cache.get(key, ExperimentAnalysis)
+            if cached is not None:
+                return cached
+
+        if backend == "duckdb":
+            if ci_method != "normal":
+                raise ValueError("Bootstrap CIs need row-level data and are not available with the DuckDB backend")
+            with _local_file(file, dataset_id) as path:
+                result = analyze_experiment_sql(
+                    path,
+                    metric_col=metric_col,
+                    variant_col=variant_col,
+                    metric_type=m_type,
+                    control_label=control_label,
+                    covariate_col=covariate_arg,
+                    analysis_type=a_type,
+                    bayesian_method=bayesian_method,
+                    seed=seed,
+                    denominator_col=denominator_col,
+                    allocation=weights,
+                    timestamp_col=timestamp_col
+                )
+        elif backend != "pandas":
+            raise ValueError(f"Unknown backend: {backend}")
+        elif stream:
+            if ci_method != "normal":
+                raise ValueError("Bootstrap CIs need row-level data and are not available in stream mode")
+            chunks = await _upload_chunks(file, columns, {variant_col}, chunksize, dataset_id)
+            result = analyze_experiment_stream(
+                chunks,
+                metric_col=metric_col,
+                variant_col=variant_col,
+                metric_type=m_type,
+                control_label=control_label,
+                covariate_col=covariate_arg,
+                analysis_type=a_type,
+                bayesian_method=bayesian_method,
+                seed=seed,
+                denominator_col=denominator_col,
+                allocation=weights,
+                timestamp_col=timestamp_col
+            )
+        else:
+            df = await _upload_frame(file, columns, {variant_col}, dataset_id)
+            result = analyze_experiment(
+                df=df,
+                metric_col=metric_col,
+                variant_col=variant_col,
+                metric_type=m_type,
+                control_label=control_label,
+                covariate_col=covariate_arg,
+                analysis_type=a_type,
+                bayesian_method=bayesian_method,
+                seed=seed,
+                ci_method=ci_method,
+                n_boot=n_boot,
+                n_jobs=n_jobs,
+                denominator_col=denominator_col,
+                cuped_cache_key=cuped_cache_key,
+                allocation=weights,
+                timestamp_col=timestamp_col
+            )
+
+        result = _sanitize_analysis(result)
+        if key is not None:
+            result_cache.put(key, result)
+        return result
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+@router.post("/analysis/scorecard", response_model=Scorecard)
+async def analysis_scorecard(
+    file: UploadFile | None = File(None),
+    dataset_id: str | None = Form(None), # from /datasets; replaces the file
+    metrics: str = Form(...), # JSON list of {"column", "metric_type", "covariate_col", "denominator_col"}
+    variant_col: str = Form(...),
+    control_label: str = Form(...),
+    analysis_type: str = Form("frequentist"),
+    stream: bool = Form(False),
+    chunksize: int = Form(200_000),
+    bayesian_method: str = Form("quadrature"),
+    seed: int | None = Form(None),
+    allocation: str | None = Form(None) # JSON weights per variant, e.g. {"control": 0.9, "treatment": 0.1}
+):
+    """Analyze many metrics from one upload in a single pass."""
+    try:
+        specs = [MetricSpec.model_validate(m) for m in json.loads(metrics)]
+        a_type = AnalysisType(analysis_type)
+        weights = json.loads(allocation) if allocation else None
+        options = dict(analysis_type=a_type, bayesian_method=bayesian_method, seed=seed, allocation=weights)
+        wanted = {variant_col} | {m.column for m in specs} | {m.covariate_col for m in specs} | {m.denominator_col for m in specs}
+
+        if stream:
+            chunks = await _upload_chunks(file, wanted, {variant_col}, chunksize, dataset_id)
+            result = analyze_scorecard_stream(chunks, specs, variant_col, control_label, **options)
+        else:
+            df = await _upload_frame(file, wanted, {variant_col}, dataset_id)
+            result = analyze_scorecard(df, specs, variant_col, control_label, **options)
 
+        for analysis in result.metrics.values():
+            _sanitize_analysis(analysis)
         return result
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e)) from e
 
+@router.post("/analysis/quantiles", response_model=QuantileAnalysis)
+async def analysis_quantiles(
+    file: UploadFile | None = File(None),
+    dataset_id: str | None = Form(None), # from /datasets; replaces the file
+    metric_col: str = Form(...),
+    variant_col: str = Form(...),
+    control_label: str = Form(...),
+    quantiles: str = Form("0.5,0.95,0.99"),
+    alpha: float = Form(0.05),
+    compression: float = Form(200.0),
+    chunksize: int = Form(200_000),
+    allocation: str | None = Form(None) # JSON weights per variant, e.g. {"control": 0.9, "treatment": 0.1}
+):
+    """Quantile treatment effects (e.g. p95 latency guardrails) from per-variant t-digests."""
+    try:
+        qs = [float(q) for q in quantiles.split(",") if q.strip()]
+        weights = json.loads(allocation) if allocation else None
+        chunks = await _upload_chunks(file, {metric_col, variant_col}, {variant_col}, chunksize, dataset_id)
+        return analyze_quantiles(chunks, metric_col, variant_col, control_label, qs, alpha, compression, weights)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+@router.post("/analysis/batch")
+def analysis_batch(req: BatchAnalysisRequest):
+    """
+    Analyzes many experiments on registered datasets across a process pool.
+
+    Streams one JSON ``BatchResult`` per line (NDJSON) as each experiment
+    finishes, so results arrive in completion order.
+    """
+    try:
+        specs = []
+        for spec in req.experiments:
+            if not spec.dataset_id:
+                raise ValueError(f"{spec.experiment_id}: batch experiments need a dataset_id from /datasets")
+            specs.append(spec.model_copy(update={"path": str(dataset_registry.path(spec.dataset_id))}))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    def lines():
+        for result in analyze_batch(specs, req.n_jobs):
+            if result.analysis is not None:
+                _sanitize_analysis(result.analysis)
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/analysis/sequential", response_model=SequentialResponse)
+async def analysis_sequential(
+    file: UploadFile = File(...), # new batch of observations only
+    metric_col: str = Form(...),
+    variant_col: str = Form(...),
+    control_label: str = Form(...),
+    state: str | None = Form(None), # JSON state returned by the previous call
+    alpha: float = Form(0.05),
+    mixture_sd: float | None = Form(None),
+    chunksize: int = Form(200_000),
+    allocation: str | None = Form(None) # JSON weights per variant; kept in the state once given
+):
+    """Always-valid (mSPRT) analysis that folds a new batch into the previous state."""
+    try:
+        weights = json.loads(allocation) if allocation else None
+        if state:
+            test = SequentialTest.from_dict(json.loads(state))
+            if weights is not None:
+                test.allocation = weights
+        else:
+            test = SequentialTest(
+                metric_col=metric_col,
+                variant_col=variant_col,
+                control_label=control_label,
+                alpha=alpha,
+                mixture_sd=mixture_sd,
+                allocation=weights,
+            )
+
+        for chunk in await _upload_chunks(file, {test.metric_col, test.variant_col}, {test.variant_col}, chunksize):
+            test.update(chunk)
+
+        analysis = _sanitize_analysis(test.analyze())
+        return SequentialResponse(analysis=analysis, state=test.to_dict())
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+@router.post("/analysis/summary", response_model=SummaryAnalysis)
+def analysis_summary(req: SummaryAnalysisRequest):
+    """Analyze per-variant sufficient statistics aggregated upstream (e.g. in the warehouse)."""
+    try:
+        result = analyze_summary_stats(
+            req.variants,
+            metric_type=req.metric_type,
+            control_label=req.control_label,
+            analysis_type=req.analysis_type,
+            bayesian_method=req.bayesian_method,
+            seed=req.seed
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    _sanitize_analysis(result.overall)
+    for seg_result in result.segments.values():
+        _sanitize_analysis(seg_result)
+    return result
+
+async def _run_causal(
+    file: UploadFile | None,
+    dataset_id: str | None,
+    method: str,
+    unit_col: str,
+    time_col: str,
+    outcome_col: str,
+    treatment_col: str | None,
+    post_period_start: int | None,
+    treated_unit: str | None,
+    intervention_time: int | None,
+    backend: str,
+    cohort_col: str | None = None,
+    control_group: str = "never_treated",
+    leads: int = 4,
+    lags: int = 4
+) -> CausalResult:
+    if backend == "duckdb":
+        if method != "did" or not treatment_col or post_period_start is None:
+            raise ValueError("The DuckDB backend supports DiD with treatment_col and post_period_start")
+        with _local_file(file, dataset_id) as path:
+            return did_sql(path, unit_col, time_col, treatment_col, outcome_col, post_period_start)
+
+    df = await _upload_frame(file, {unit_col, time_col, outcome_col, treatment_col, cohort_col}, dataset_id=dataset_id)
+    
+    if method == "did":
+        if not treatment_col or post_period_start is None:
+            raise HTTPException(status_code=400, detail="DiD requires treatment_col and post_period_start")
+        
+        return analyze_observational(
+            df=df,
+            method="did",
+            unit_col=unit_col,
+            time_col=time_col,
+            treatment_col=treatment_col,
+            outcome_col=outcome_col,
+            post_period_start=post_period_start
+        )
+        
+    elif method == "twfe":
+        if not treatment_col:
+            raise HTTPException(status_code=400, detail="TWFE requires treatment_col")
+
+        return analyze_observational(
+            df=df,
+            method="twfe",
+            unit_col=unit_col,
+            time_col=time_col,
+            treatment_col=treatment_col,
+            outcome_col=outcome_col,
+            post_period_start=post_period_start
+        )
+
+    elif method == "staggered":
+        if not cohort_col and not treatment_col:
+            raise HTTPException(status_code=400, detail="Staggered DiD requires cohort_col or treatment_col")
+
+        return analyze_observational(
+            df=df,
+            method="staggered",
+            unit_col=unit_col,
+            time_col=time_col,
+            outcome_col=outcome_col,
+            cohort_col=cohort_col,
+            treatment_col=None if cohort_col else treatment_col,
+            control_group=control_group
+        )
+
+    elif method == "event_study":
+        if not cohort_col and not treatment_col:
+            raise HTTPException(status_code=400, detail="Event study requires cohort_col or treatment_col")
+
+        return analyze_observational(
+            df=df,
+            method="event_study",
+            unit_col=unit_col,
+            time_col=time_col,
+            outcome_col=outcome_col,
+            cohort_col=cohort_col,
+            treatment_col=None if cohort_col else treatment_col,
+            post_period_start=None if cohort_col else post_period_start,
+            leads=leads,
+            lags=lags
+        )
+
+    elif method == "scm":
+        if not treated_unit or intervention_time is None:
+            raise HTTPException(status_code=400, detail="SCM requires treated_unit and intervention_time")
+        
+        return analyze_observational(
+            df=df,
+            method="scm",
+            unit_col=unit_col,
+            time_col=time_col,
+            outcome_col=outcome_col,
+            treated_unit=treated_unit,
+            intervention_time=intervention_time
+        )
+    
+    else:
+         raise HTTPException(status_code=400, detail=f"Unknown method: {method}")
+
 @router.post("/causal/analyze", response_model=CausalResult)
 async def causal_analyze(
-    file: UploadFile = File(...),
-    method: str = Form(...), # "did" or "scm"
+    file: UploadFile | None = File(None),
+    dataset_id: str | None = Form(None), # from /datasets; replaces the file
+    method: str = Form(...), # "did", "twfe", "staggered", "event_study" or "scm"
     unit_col: str = Form(...),
     time_col: str = Form(...),
     outcome_col: str = Form(...),
-    treatment_col: str | None = Form(None), # For DiD
-    post_period_start: int | None = Form(None), # For DiD
+    treatment_col: str | None = Form(None), # For DiD / TWFE
+    post_period_start: int | None = Form(None), # For DiD; optional for TWFE
     treated_unit: str | None = Form(None), # For SCM
     intervention_time: int | None = Form(None), # For SCM
+    cohort_col: str | None = Form(None), # For staggered DiD: first treated period per unit
+    control_group: str = Form("never_treated"), # For staggered DiD, or "not_yet_treated"
+    leads: int = Form(4), # For event study: periods before adoption
+    lags: int = Form(4), # For event study: periods after adoption
+    backend: str = Form("pandas") # "duckdb" aggregates DiD cells out of core
 ):
     try:
-        contents = await file.read()
-        if file.filename and file.filename.endswith('.xlsx'):
-             df = pd.read_excel(io.BytesIO(contents))
-        else:
-             df = pd.read_csv(io.BytesIO(contents))
-        
-        if method == "did":
-            if not treatment_col or post_period_start is None:
-                raise HTTPException(status_code=400, detail="DiD requires treatment_col and post_period_start")
-            
-            return analyze_observational(
-                df=df,
-                method="did",
-                unit_col=unit_col,
-                time_col=time_col,
-                treatment_col=treatment_col,
-                outcome_col=outcome_col,
-                post_period_start=post_period_start
-            )
-            
-        elif method == "scm":
-            if not treated_unit or intervention_time is None:
-                raise HTTPException(status_code=400, detail="SCM requires treated_unit and intervention_time")
-            
-            return analyze_observational(
-                df=df,
-                method="scm",
-                unit_col=unit_col,
-                time_col=time_col,
-                outcome_col=outcome_col,
-                treated_unit=treated_unit,
-                intervention_time=intervention_time
-            )
-        
-        else:
-             raise HTTPException(status_code=400, detail=f"Unknown method: {method}")
-             
+        params = dict(
+            method=method, unit_col=unit_col, time_col=time_col, outcome_col=outcome_col, treatment_col=treatment_col,
+            post_period_start=post_period_start, treated_unit=treated_unit, intervention_time=intervention_time,
+            backend=backend, cohort_col=cohort_col, control_group=control_group, leads=leads, lags=lags
+        )
+        key = result_key("causal", _dataset_key(file, dataset_id), params)
+        cached = result_cache.get(key, CausalResult)
+        if cached is not None:
+            return cached
+
+        result = await _run_causal(file, dataset_id, **params)
+        result_cache.put(key, result)
+        return result
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -187,7 +187,7 @@ export default function AnalysisPage() {
                             <form onSubmit={handleSubmit(onSubmit)} className="space-y-4">
                                 <div className="space-y-2">
                                     <Label>Data File (CSV/Excel)</Label>
-                                    <Input type="file" accept=".csv, .xlsx" onChange={handleFileChange} />
+                                    <Input type="file" accept=".csv, .xlsx, .parquet, .arrow, .feather" onChange={handleFileChange} />
                                 </div>
                                 
                                 <div className="space-y-2">
@@ -210,7 +210,7 @@ export default function ObservationalPage() {
                   <Label>Data File (CSV/Excel)</Label>
                   <Input 
                     type="file" 
-                    accept=".csv, .xlsx"
+                    accept=".csv, .xlsx, .parquet, .arrow, .feather"
                     onChange={handleFileChange}
                   />
                 </div>
@@ -1,14 +1,41 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from itertools import chain
 from typing import Any
 
 import numpy as np
 import pandas as pd
 from pydantic import BaseModel
-from scipy import stats
+from scipy import integrate, stats
 
-from .causal import CausalResult, DifferenceInDifferences, SyntheticControl
-from .schemas import AnalysisType, MetricType
+from .bootstrap import bootstrap_diff_ci
+from .causal import (
+    CausalResult,
+    DifferenceInDifferences,
+    EventStudy,
+    StaggeredDiD,
+    SyntheticControl,
+    TwoWayFixedEffects,
+)
+from .moments import (
+    CoMoments,
+    GramMoments,
+    Moments,
+    VariantStats,
+    accumulate_metric_stats,
+    accumulate_variant_stats,
+    compute_metric_stats,
+    compute_segment_stats,
+    compute_variant_stats,
+    covariate_matrix,
+    variant_stats_from_sums,
+)
+from .profiling import ProfileReport, profiled, span
+from .schemas import AnalysisType, ExperimentInputs, MetricSpec, MetricType, VariantSummary
+from .sketch import TDigest, compute_variant_digests
 
 
 class AnalysisResult(BaseModel):
@@ -24,21 +51,146 @@ class AnalysisResult(BaseModel):
     is_significant: bool = False
     srm_p_value: float | None = None
 
+class SrmPoint(BaseModel):
+    date: str
+    counts: dict[str, int] # cumulative per variant up to and including date
+    p_value: float
+
 class ExperimentAnalysis(BaseModel):
     control_variant: str
     results: list[AnalysisResult]
     srm_warning: bool
     warnings: list[str]
+    cuped_theta: dict[str, float] | None = None # fitted CUPED coefficient per covariate
+    srm_series: list[SrmPoint] | None = None # cumulative daily SRM p-values
+    profile: ProfileReport | None = None # stage timings, when profiling is enabled
 
-def check_srm(df: pd.DataFrame, variant_col: str) -> float:
-    # Chi-square test for SRM
-    counts = df[variant_col].value_counts()
-    # assume equal split expected
-    expected = [len(df) / len(counts)] * len(counts)
-    
+class Scorecard(BaseModel):
+    control_variant: str
+    srm_warning: bool
+    metrics: dict[str, ExperimentAnalysis]
+
+class SummaryAnalysis(BaseModel):
+    overall: ExperimentAnalysis
+    segments: dict[str, ExperimentAnalysis] = {}
+
+class QuantileResult(BaseModel):
+    variant: str
+    quantile: float
+    value: float
+    diff: float | None = None # value - control value
+    ci_lower: float | None = None
+    ci_upper: float | None = None
+    p_value: float | None = None
+    is_significant: bool = False
+
+class QuantileAnalysis(BaseModel):
+    control_variant: str
+    quantiles: list[float]
+    results: list[QuantileResult]
+    srm_warning: bool
+    warnings: list[str]
+
+Allocation = dict[str, float] | ExperimentInputs | None
+
+def expected_split(labels: list[Any], control_label: str | None, allocation: Allocation = None) -> np.ndarray | None:
+    """
+    Expected share of traffic per label, or None for an equal split.
+
+    ``allocation`` is either explicit weights per variant or the design's
+    ``ExperimentInputs``, whose ``allocation_treatment`` is shared equally by
+    every non-control variant.
+    """
+    if allocation is None:
+        return None
+    if isinstance(allocation, ExperimentInputs):
+        n_treat = sum(str(v) != str(control_label) for v in labels)
+        weights = [
+            allocation.allocation_control if str(v) == str(control_label) else allocation.allocation_treatment / max(n_treat, 1)
+            for v in labels
+        ]
+    else:
+        missing = [str(v) for v in labels if str(v) not in allocation]
+        if missing:
+            raise ValueError(f"No allocation given for variants: {missing}")
+        weights = [allocation[str(v)] for v in labels]
+    weights = np.asarray(weights, dtype=float)
+    if np.any(weights <= 0):
+        raise ValueError("Allocation weights must be positive")
+    return weights / weights.sum()
+
+def srm_p_value(counts: np.ndarray, weights: np.ndarray | None = None) -> float:
+    """Chi-square SRM p-value for observed per-variant counts against ``weights`` (equal split by default)."""
+    counts = np.asarray(counts, dtype=float)
+    if weights is None:
+        expected = [counts.sum() / len(counts)] * len(counts)
+    else:
+        expected = counts.sum() * np.asarray(weights, dtype=float) / np.sum(weights)
     chisq, p = stats.chisquare(counts, f_exp=expected)
     return float(p)
 
+def _srm_message(p: float, weights: np.ndarray | None) -> str:
+    split = "equal split" if weights is None else "configured allocation"
+    return f"SRM Detected (p={p:.4f}). Sample ratios are significantly different from {split}."
+
+def check_srm(
+    df: pd.DataFrame,
+    variant_col: str,
+    allocation: Allocation = None,
+    control_label: str | None = None
+) -> float:
+    # Chi-square test for SRM over the labels that occur (unused categories are not arms)
+    codes, labels = pd.factorize(df[variant_col], sort=False)
+    counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+    weights = expected_split(list(labels), control_label, allocation)
+    return srm_p_value(counts, weights)
+
+def daily_variant_counts(df: pd.DataFrame, variant_col: str, timestamp_col: str, freq: str = "D") -> pd.DataFrame:
+    """Rows per period (index) and variant (columns); additive across chunks."""
+    period = pd.to_datetime(df[timestamp_col]).dt.floor(freq)
+    return df.groupby([period, df[variant_col]], sort=True, observed=True).size().unstack(fill_value=0)
+
+def srm_series_from_counts(
+    counts: pd.DataFrame,
+    control_label: str | None = None,
+    allocation: Allocation = None
+) -> list[SrmPoint]:
+    """Cumulative SRM p-value after each period, vectorized over periods."""
+    counts = counts.sort_index().fillna(0).astype("int64")
+    if counts.shape[1] < 2:
+        return []
+    cum = counts.cumsum().to_numpy(dtype=float)
+    weights = expected_split(list(counts.columns), control_label, allocation)
+    if weights is None:
+        weights = np.full(cum.shape[1], 1 / cum.shape[1])
+    expected = cum.sum(axis=1, keepdims=True) * weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chisq = np.where(expected > 0, (cum - expected) ** 2 / expected, 0.0).sum(axis=1)
+    p_values = stats.chi2.sf(chisq, df=cum.shape[1] - 1)
+    labels = [str(v) for v in counts.columns]
+    return [
+        SrmPoint(
+            date=pd.Timestamp(day).date().isoformat(),
+            counts=dict(zip(labels, map(int, row), strict=True)),
+            p_value=float(p)
+        )
+        for day, row, p in zip(counts.index, cum, p_values, strict=True)
+    ]
+
+def srm_time_series(
+    df: pd.DataFrame,
+    variant_col: str,
+    timestamp_col: str,
+    control_label: str | None = None,
+    allocation: Allocation = None
+) -> list[SrmPoint]:
+    """
+    Cumulative per-day SRM p-values from a single groupby-and-cumsum pass.
+
+    An SRM that starts mid-test shows up as the day the p-value collapses.
+    """
+    return srm_series_from_counts(daily_variant_counts(df, variant_col, timestamp_col), control_label, allocation)
+
 def apply_cuped(df: pd.DataFrame, metric_col: str, covariate_col: str) -> pd.Series:
     # theta = cov(Y, X) / var(X)
     # Y_cuped = Y - theta * (X - mean(X))
@@ -64,66 +216,493 @@ def apply_cuped(df: pd.DataFrame, metric_col: str, covariate_col: str) -> pd.Ser
     
     return y - theta * (x - x_mean)
 
+@dataclass
+class CupedFit:
+    """Fitted CUPED / CUPAC regression adjustment, one coefficient per covariate."""
+    covariates: list[str]
+    theta: np.ndarray
+    x_mean: np.ndarray
+
+    def adjust(self, y: np.ndarray, x: np.ndarray) -> np.ndarray:
+        """Row-level adjusted metric y - (x - mean(x)) @ theta for an (n, p) covariate matrix."""
+        return y - (x - self.x_mean) @ self.theta
+
+# Fitted thetas by (cache key, metric, covariates), so re-analyses skip the fit
+_CUPED_CACHE: OrderedDict[tuple, CupedFit] = OrderedDict()
+CUPED_CACHE_SIZE = 128
+
+def _as_gram(paired: CoMoments | GramMoments) -> GramMoments:
+    return GramMoments.from_comoments(paired) if isinstance(paired, CoMoments) else paired
+
+def fit_cuped(paired: CoMoments | GramMoments, covariates: list[str] | None = None) -> CupedFit | None:
+    """
+    Fits the CUPED theta vector from the pooled Gram matrix of the covariates.
+
+    Only the small (p x p) Gram matrix and cross-products are used, so no
+    row-level data is touched. With one covariate this is exactly the theta of
+    ``apply_cuped``. Returns None when CUPED is not applicable.
+    """
+    gram = _as_gram(paired).pooled()
+    n = int(gram.n[0])
+    p = gram.sxx.shape[1]
+    covariates = covariates or [f"covariate_{j}" for j in range(p)]
+    if n < 2 or not np.any(np.diag(gram.sxx[0]) > 0):
+        return None
+    # np.cov uses ddof=1 and np.var ddof=0 in apply_cuped; keep the same ratio
+    theta = np.linalg.lstsq(gram.sxx[0] / n, gram.sxy[0] / (n - 1), rcond=None)[0]
+    return CupedFit(covariates=list(covariates), theta=theta, x_mean=gram.total_x[0] / n)
+
+def cuped_moments(paired: CoMoments | GramMoments, fit: CupedFit | None = None) -> Moments | None:
+    """
+    CUPED-adjusted per-variant moments computed from joint (metric, covariate) moments.
+
+    Mirrors ``apply_cuped`` exactly (same theta, same row set) without touching
+    row-level data. ``fit`` reuses a previously fitted theta. Returns None when
+    CUPED is not applicable.
+    """
+    fit = fit if fit is not None else fit_cuped(paired)
+    if fit is None:
+        return None
+
+    gram = _as_gram(paired)
+    theta = fit.theta
+    total = gram.total_y - (gram.total_x - gram.n[:, None] * fit.x_mean) @ theta
+    m2 = gram.m2_y - 2 * gram.sxy @ theta + np.einsum("kij,i,j->k", gram.sxx, theta, theta)
+    return Moments(n=gram.n, total=total, m2=np.maximum(m2, 0.0))
+
+def _covariate_spec(covariate_col: str | list | None, columns) -> str | list | None:
+    # Keeps the covariates that exist (column names) or are given as per-row values
+    if isinstance(covariate_col, list):
+        kept = [c for c in covariate_col if not isinstance(c, str) or c in columns]
+        return kept or None
+    return covariate_col if covariate_col and covariate_col in columns else None
+
+def _non_numeric_covariate(covariates: str | list | None, df: pd.DataFrame) -> str | None:
+    # First covariate column that cannot be used for CUPED (per-row values are not checked)
+    names = [covariates] if isinstance(covariates, str) else list(covariates or [])
+    for c in names:
+        if isinstance(c, str) and c in df.columns and not pd.api.types.is_numeric_dtype(df[c]):
+            return c
+    return None
+
+def _covariate_names(covariates: str | list) -> list[str]:
+    if isinstance(covariates, str):
+        return [covariates]
+    return [c if isinstance(c, str) else f"covariate_{j}" for j, c in enumerate(covariates)]
+
+def _cached_cuped_fit(
+    variant_stats: VariantStats, covariates: str | list, metric_col: str, cache_key: str | None
+) -> CupedFit | None:
+    names = _covariate_names(covariates)
+    key = (cache_key, metric_col, tuple(names))
+    if cache_key is not None and key in _CUPED_CACHE:
+        _CUPED_CACHE.move_to_end(key)
+        return _CUPED_CACHE[key]
+
+    fit = fit_cuped(variant_stats.paired, names)
+    if cache_key is not None and fit is not None:
+        _CUPED_CACHE[key] = fit
+        if len(_CUPED_CACHE) > CUPED_CACHE_SIZE:
+            _CUPED_CACHE.popitem(last=False)
+    return fit
+
+def ratio_moments(paired: CoMoments) -> Moments:
+    """
+    Delta-method moments of a ratio metric sum(Y) / sum(X) per variant.
+
+    ``paired`` holds the numerator as ``y`` and the denominator as ``x``. The
+    result has mean R = Ybar / Xbar and the variance of the linearized unit-level
+    metric (Y - R * X) / Xbar, so Welch's test and the normal CI on it are the
+    delta-method inference for R.
+    """
+    ratio = paired.total_y / paired.total_x
+    x_mean = paired.mean_x
+    m2 = (paired.m2_y - 2 * ratio * paired.c_xy + ratio ** 2 * paired.m2_x) / x_mean ** 2
+    return Moments(n=paired.n, total=ratio * paired.n, m2=np.maximum(m2, 0.0))
+
+def _ratio_stats(variant_stats: VariantStats) -> VariantStats:
+    # Swap the (numerator, denominator) co-moments for the delta-method ratio moments
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metric = ratio_moments(variant_stats.paired)
+    return VariantStats(labels=variant_stats.labels, n_rows=variant_stats.n_rows, metric=metric)
+
+def _prob_greater_quadrature(dist_t, dist_c) -> float:
+    # P(T > C) = integral of f_T(x) * F_C(x) dx over the bulk of T's support
+    lo, hi = dist_t.ppf([1e-15, 1 - 1e-15])
+    lo, hi = max(lo, dist_t.support()[0]), min(hi, dist_t.support()[1])
+    # break points where F_C changes fastest, so narrow control posteriors are resolved
+    points = [p for p in dist_c.ppf([1e-6, 0.5, 1 - 1e-6]) if lo < p < hi]
+    value, _ = integrate.quad(
+        lambda x: dist_t.pdf(x) * dist_c.cdf(x), lo, hi, points=points or None, limit=200, epsabs=1e-12
+    )
+    return float(min(max(value, 0.0), 1.0))
+
+@profiled("prob_beat_control")
+def prob_beat_control(
+    dist_t,
+    dist_c,
+    method: str = "quadrature",
+    n_samples: int = 10000,
+    rng: np.random.Generator | None = None
+) -> float:
+    """
+    P(T > C) for two independent posteriors given as frozen scipy distributions.
+
+    ``method="quadrature"`` integrates numerically and is deterministic;
+    ``method="monte_carlo"`` draws ``n_samples`` from each posterior using ``rng``.
+    """
+    if method == "quadrature":
+        return _prob_greater_quadrature(dist_t, dist_c)
+    elif method == "monte_carlo":
+        rng = rng if rng is not None else np.random.default_rng()
+        sim_c = dist_c.rvs(size=n_samples, random_state=rng)
+        sim_t = dist_t.rvs(size=n_samples, random_state=rng)
+        return float(np.mean(sim_t > sim_c))
+    else:
+        raise ValueError(f"Unknown Bayesian method: {method}")
+
+@profiled("analyze_experiment")
 def analyze_experiment(
     df: pd.DataFrame,
     metric_col: str,
     variant_col: str,
     metric_type: MetricType,
     control_label: str,
-    covariate_col: str | None = None,
-    analysis_type: AnalysisType = AnalysisType.FREQUENTIST
+    covariate_col: str | list | None = None,
+    analysis_type: AnalysisType = AnalysisType.FREQUENTIST,
+    bayesian_method: str = "quadrature",
+    seed: int | None = None,
+    ci_method: str = "normal",
+    n_boot: int = 1000,
+    n_jobs: int = 1,
+    denominator_col: str | None = None,
+    cuped_cache_key: str | None = None,
+    allocation: Allocation = None,
+    timestamp_col: str | None = None
 ) -> ExperimentAnalysis:
+    """
+    Analyzes a randomized experiment from row-level data. ``df`` is never modified.
+
+    ``covariate_col`` may be one column or a list of pre-period covariates;
+    list entries can also be per-row arrays such as CUPAC model predictions.
+    The CUPED theta vector is solved from the small Gram matrix collected in
+    the same pass, and cached under ``cuped_cache_key`` when one is given.
+
+    For ``MetricType.RATIO`` the metric is sum(metric_col) / sum(denominator_col)
+    with one row per randomization unit, and inference uses the delta method.
+
+    ``ci_method="bootstrap"`` replaces the normal-approximation CIs with Poisson
+    bootstrap percentile CIs (``n_boot`` replicates over ``n_jobs`` processes,
+    seeded with ``seed``); with CUPED the adjusted metric is resampled.
+
+    The SRM check expects the split given by ``allocation`` (see
+    ``expected_split``); with ``timestamp_col`` the result also carries the
+    cumulative daily SRM series.
+    """
+    notes = []
+    options = dict(bayesian_method=bayesian_method, seed=seed, allocation=allocation)
     
+    if metric_type == MetricType.RATIO:
+        if not denominator_col:
+            raise ValueError("Ratio metrics require denominator_col")
+        if ci_method != "normal":
+            raise ValueError("Ratio metrics use delta-method CIs only")
+        if covariate_col:
+            notes.append("CUPED is not applied to ratio metrics")
+        with span("sufficient_stats"):
+            stats_ = _ratio_stats(compute_variant_stats(df, variant_col, metric_col, denominator_col))
+        result = analyze_variant_stats(stats_, metric_type, control_label, analysis_type, notes=notes, **options)
+        if timestamp_col:
+            with span("srm_series"):
+                result.srm_series = srm_time_series(df, variant_col, timestamp_col, control_label, allocation)
+        return result
+
+    # One grouped pass over the frame; everything below works on aggregates
+    covariates = _covariate_spec(covariate_col, df.columns)
+    with span("sufficient_stats"):
+        try:
+            stats_ = compute_variant_stats(df, variant_col, metric_col, covariates)
+        except (TypeError, ValueError) as e:
+            if covariates is None:
+                raise
+            notes.append(f"CUPED failed: {e}")
+            covariates = None
+            stats_ = compute_variant_stats(df, variant_col, metric_col)
+
+    fit = None
+    if covariates is not None:
+        with span("cuped"):
+            fit = _cached_cuped_fit(stats_, covariates, metric_col, cuped_cache_key)
+
+    result = analyze_variant_stats(
+        stats_, metric_type, control_label, analysis_type, notes=notes, cuped_fit=fit, **options
+    )
+
+    if ci_method == "bootstrap" and stats_.labels:
+        values = df[metric_col].to_numpy(dtype="float64", na_value=np.nan)
+        if fit is not None:
+            values = fit.adjust(values, covariate_matrix(df, covariates))
+        codes, _ = pd.factorize(df[variant_col], sort=False)
+        c = stats_.labels.index(control_label) if control_label in stats_.labels else 0
+        with span("bootstrap"):
+            lower, upper = bootstrap_diff_ci(
+                codes, values, len(stats_.labels), c, n_boot=n_boot, seed=seed, n_jobs=n_jobs
+            )
+        for i, res in enumerate(result.results):
+            if i != c:
+                res.ci_lower = float(lower[i])
+                res.ci_upper = float(upper[i])
+    elif ci_method != "normal":
+        raise ValueError(f"Unknown CI method: {ci_method}")
+
+    if timestamp_col:
+        with span("srm_series"):
+            result.srm_series = srm_time_series(df, variant_col, timestamp_col, control_label, allocation)
+    return result
+
+@profiled("analyze_experiment_stream")
+def analyze_experiment_stream(
+    chunks: Iterable[pd.DataFrame],
+    metric_col: str,
+    variant_col: str,
+    metric_type: MetricType,
+    control_label: str,
+    covariate_col: str | list[str] | None = None,
+    analysis_type: AnalysisType = AnalysisType.FREQUENTIST,
+    bayesian_method: str = "quadrature",
+    seed: int | None = None,
+    denominator_col: str | None = None,
+    allocation: Allocation = None,
+    timestamp_col: str | None = None
+) -> ExperimentAnalysis:
+    """
+    Streaming counterpart of ``analyze_experiment`` for data that does not fit in memory.
+
+    Chunks (e.g. from ``pd.read_csv(..., chunksize=...)``) are folded into
+    mergeable per-variant moments; CUPED uses the merged co-moments, so its theta
+    is identical to the in-memory result. Daily counts for the SRM series are
+    summed across chunks in the same pass.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return ExperimentAnalysis(control_variant="", results=[], srm_warning=False, warnings=["No data found"])
+
+    daily: list[pd.DataFrame] = []
+    def tap(chunk: pd.DataFrame) -> pd.DataFrame:
+        if timestamp_col:
+            daily.append(daily_variant_counts(chunk, variant_col, timestamp_col))
+        return chunk
+    chunks = map(tap, chain([first], chunks))
+
+    notes = []
+    options = dict(bayesian_method=bayesian_method, seed=seed, allocation=allocation)
+    if metric_type == MetricType.RATIO:
+        if not denominator_col:
+            raise ValueError("Ratio metrics require denominator_col")
+        stats_ = _ratio_stats(accumulate_variant_stats(chunks, variant_col, metric_col, denominator_col))
+        result = analyze_variant_stats(stats_, metric_type, control_label, analysis_type, **options)
+    else:
+        covariates = _covariate_spec(covariate_col, first.columns)
+        # chunks cannot be re-read after a failed pass, so the dtype is checked on the first one
+        bad = _non_numeric_covariate(covariates, first)
+        if bad is not None:
+            notes.append(f"CUPED failed: covariate {bad} is not numeric")
+            covariates = None
+        stats_ = accumulate_variant_stats(chunks, variant_col, metric_col, covariates)
+        fit = fit_cuped(stats_.paired, _covariate_names(covariates)) if covariates is not None else None
+        result = analyze_variant_stats(
+            stats_, metric_type, control_label, analysis_type, notes=notes, cuped_fit=fit, **options
+        )
+
+    if daily:
+        counts = pd.concat(daily).groupby(level=0).sum()
+        result.srm_series = srm_series_from_counts(counts, control_label, allocation)
+    return result
+
+def _scorecard_inputs(metrics: list[MetricSpec], columns) -> tuple[list[str], list[str | None]]:
+    # Ratio metrics carry their denominator in the covariate slot of the co-moments
+    names = [m.column for m in metrics]
+    if len(set(names)) != len(names):
+        raise ValueError("Each metric column may appear only once in a scorecard")
+    covariates = []
+    for m in metrics:
+        if m.metric_type == MetricType.RATIO:
+            if not m.denominator_col:
+                raise ValueError(f"Ratio metric {m.column} requires denominator_col")
+            covariates.append(m.denominator_col)
+        else:
+            covariates.append(m.covariate_col if m.covariate_col and m.covariate_col in columns else None)
+    return names, covariates
+
+def _scorecard_cuped_notes(
+    df: pd.DataFrame, metrics: list[MetricSpec], names: list[str], covariates: list[str | None]
+) -> dict[str, list[str]]:
+    # Drops non-numeric CUPED covariates in place; ``df`` may be just the first chunk of a stream
+    notes: dict[str, list[str]] = {}
+    for i, cov in enumerate(covariates):
+        if metrics[i].metric_type == MetricType.RATIO:
+            continue
+        if _non_numeric_covariate(cov, df) is not None:
+            notes[names[i]] = [f"CUPED failed: covariate {cov} is not numeric"]
+            covariates[i] = None
+    return notes
+
+def _scorecard_from_stats(
+    metric_stats: list[VariantStats],
+    metrics: list[MetricSpec],
+    control_label: str,
+    analysis_type: AnalysisType,
+    notes: dict[str, list[str]],
+    **options
+) -> Scorecard:
+    metric_stats = [
+        _ratio_stats(vs) if spec.metric_type == MetricType.RATIO else vs
+        for spec, vs in zip(metrics, metric_stats, strict=True)
+    ]
+    analyses = {
+        spec.column: analyze_variant_stats(
+            vs, spec.metric_type, control_label, analysis_type, notes=notes.get(spec.column),
+            cuped_fit=fit_cuped(vs.paired, [spec.covariate_col]) if vs.paired is not None else None, **options
+        )
+        for spec, vs in zip(metrics, metric_stats, strict=True)
+    }
+    first = next(iter(analyses.values()), None)
+    return Scorecard(
+        control_variant=first.control_variant if first else "",
+        srm_warning=first.srm_warning if first else False,
+        metrics=analyses,
+    )
+
+def analyze_scorecard(
+    df: pd.DataFrame,
+    metrics: list[MetricSpec],
+    variant_col: str,
+    control_label: str,
+    analysis_type: AnalysisType = AnalysisType.FREQUENTIST,
+    bayesian_method: str = "quadrature",
+    seed: int | None = None,
+    allocation: Allocation = None
+) -> Scorecard:
+    """
+    Analyzes many metrics against one shared variant partition.
+
+    Per-variant statistics for all metrics come from blocked sparse matrix
+    products (see ``compute_metric_stats``); each metric then gets the same
+    ``ExperimentAnalysis`` as ``analyze_experiment`` would return for it,
+    with the SRM check against ``allocation``.
+    """
+    names, covariates = _scorecard_inputs(metrics, df.columns)
+    notes = _scorecard_cuped_notes(df, metrics, names, covariates)
+    metric_stats = compute_metric_stats(df, variant_col, names, covariates)
+    return _scorecard_from_stats(
+        metric_stats, metrics, control_label, analysis_type, notes,
+        bayesian_method=bayesian_method, seed=seed, allocation=allocation
+    )
+
+def analyze_scorecard_stream(
+    chunks: Iterable[pd.DataFrame],
+    metrics: list[MetricSpec],
+    variant_col: str,
+    control_label: str,
+    analysis_type: AnalysisType = AnalysisType.FREQUENTIST,
+    bayesian_method: str = "quadrature",
+    seed: int | None = None,
+    allocation: Allocation = None
+) -> Scorecard:
+    """Streaming counterpart of ``analyze_scorecard``."""
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return Scorecard(control_variant="", srm_warning=False, metrics={})
+
+    names, covariates = _scorecard_inputs(metrics, first.columns)
+    notes = _scorecard_cuped_notes(first, metrics, names, covariates)
+    metric_stats = accumulate_metric_stats(chain([first], chunks), variant_col, names, covariates)
+    return _scorecard_from_stats(
+        metric_stats, metrics, control_label, analysis_type, notes,
+        bayesian_method=bayesian_method, seed=seed, allocation=allocation
+    )
+
+@profiled("analyze_variant_stats")
+def analyze_variant_stats(
+    variant_stats: VariantStats,
+    metric_type: MetricType,
+    control_label: str,
+    analysis_type: AnalysisType = AnalysisType.FREQUENTIST,
+    notes: list[str] | None = None,
+    bayesian_method: str = "quadrature",
+    seed: int | None = None,
+    cuped_fit: CupedFit | None = None,
+    allocation: Allocation = None
+) -> ExperimentAnalysis:
+    """
+    Runs the SRM check, CUPED and per-variant comparisons from sufficient statistics.
+
+    ``cuped_fit`` reuses a fitted CUPED theta instead of fitting it from
+    ``variant_stats.paired``. ``notes`` are extra warnings reported after the SRM warning. Bayesian
+    probabilities use ``bayesian_method`` (see ``prob_beat_control``); the Monte
+    Carlo path draws from a per-call generator seeded with ``seed``. The SRM
+    check expects the split given by ``allocation`` (equal by default).
+    """
+    variants = variant_stats.labels
+    if len(variants) == 0:
+        return ExperimentAnalysis(control_variant="", results=[], srm_warning=False, warnings=["No data found"])
+
     warnings = []
     
     # SRM Check
-    srm_p = check_srm(df, variant_col)
+    with span("srm"):
+        weights = expected_split(variants, control_label, allocation)
+        srm_p = srm_p_value(variant_stats.n_rows, weights)
     srm_warning = srm_p < 0.001
     if srm_warning:
-        warnings.append(f"SRM Detected (p={srm_p:.4f}). Sample ratios are significantly different from equal split.")
+        warnings.append(_srm_message(srm_p, weights))
+    warnings.extend(notes or [])
 
     # CUPED
-    analysis_metric = metric_col
-    if covariate_col and covariate_col in df.columns:
-        try:
-            df["cuped_metric"] = apply_cuped(df, metric_col, covariate_col)
-            analysis_metric = "cuped_metric"
-        except Exception as e:
-            warnings.append(f"CUPED failed: {e}")
-    
-    # Split by variant
-    variants = df[variant_col].unique()
-    results = []
+    metric = variant_stats.metric
+    cuped_theta = None
+    if variant_stats.paired is not None:
+        with span("cuped"):
+            if cuped_fit is None:
+                cuped_fit = fit_cuped(variant_stats.paired)
+            if cuped_fit is not None:
+                metric = cuped_moments(variant_stats.paired, cuped_fit)
+                cuped_theta = dict(zip(cuped_fit.covariates, map(float, cuped_fit.theta), strict=True))
+
+    n_rows = variant_stats.n_rows
+    means = metric.mean
+    stds = metric.std
     
     # Get Control stats
-    control_df = df[df[variant_col] == control_label]
-    if control_df.empty:
+    if control_label in variants:
+        c = variants.index(control_label)
+    else:
         # Fallback if control label not found, pick first
-        if len(variants) > 0:
-            control_label = variants[0]
-            control_df = df[df[variant_col] == control_label]
-        else:
-            return ExperimentAnalysis(control_variant="", results=[], srm_warning=False, warnings=["No data found"])
+        c = 0
+        control_label = variants[0]
         
-    control_n = len(control_df)
-    control_mean = float(control_df[analysis_metric].mean())
-    control_std = float(control_df[analysis_metric].std())
+    control_n = int(n_rows[c])
+    control_mean = float(means[c])
+    control_std = float(stds[c])
+    rng = np.random.default_rng(seed) if bayesian_method == "monte_carlo" else None
+    results = []
     
-    for v in variants:
-        v_df = df[df[variant_col] == v]
-        n = len(v_df)
-        mean = float(v_df[analysis_metric].mean())
-        std = float(v_df[analysis_metric].std())
+    for i, v in enumerate(variants):
+        n = int(n_rows[i])
+        mean = float(means[i])
+        std = float(stds[i])
         
         res = AnalysisResult(
             variant=str(v),
             sample_size=n,
             mean=mean,
             std_dev=std,
-            srm_p_value=srm_p if v != control_label else None
+            srm_p_value=srm_p if i != c else None
         )
         
-        if v == control_label:
+        if i == c:
             results.append(res)
             continue
             
@@ -134,32 +713,28 @@ def analyze_experiment(
             res.lift = 0.0
         
         if analysis_type == AnalysisType.BAYESIAN:
-            # Simple Bayesian Simulation
             if metric_type == MetricType.BINARY:
                 # Beta-Bernoulli
                 # Prior: Beta(1, 1)
-                alpha_c = 1 + control_df[analysis_metric].sum()
-                beta_c = 1 + control_n - control_df[analysis_metric].sum()
-                alpha_t = 1 + v_df[analysis_metric].sum()
-                beta_t = 1 + n - v_df[analysis_metric].sum()
-                
-                sim_c = np.random.beta(alpha_c, beta_c, 10000)
-                sim_t = np.random.beta(alpha_t, beta_t, 10000)
-                res.prob_beat_control = float(np.mean(sim_t > sim_c))
+                post_c = stats.beta(1 + metric.total[c], 1 + control_n - metric.total[c])
+                post_t = stats.beta(1 + metric.total[i], 1 + n - metric.total[i])
+                res.prob_beat_control = prob_beat_control(post_t, post_c, bayesian_method, rng=rng)
             else:
                 # Normal-Normal with unknown variance (T-distribution approx)
                 if control_std > 0 and std > 0:
-                    sim_c = stats.t.rvs(df=control_n-1, loc=control_mean, scale=control_std/np.sqrt(control_n), size=10000)
-                    sim_t = stats.t.rvs(df=n-1, loc=mean, scale=std/np.sqrt(n), size=10000)
-                    res.prob_beat_control = float(np.mean(sim_t > sim_c))
+                    post_c = stats.t(df=control_n-1, loc=control_mean, scale=control_std/np.sqrt(control_n))
+                    post_t = stats.t(df=n-1, loc=mean, scale=std/np.sqrt(n))
+                    res.prob_beat_control = prob_beat_control(post_t, post_c, bayesian_method, rng=rng)
                 else:
                     res.prob_beat_control = 0.5 # unsure
                 
         else:
             # Frequentist
-            # Welch's t-test
+            # Welch's t-test on the non-missing values of each arm
             try:
-                t_stat, p_val = stats.ttest_ind(v_df[analysis_metric].dropna(), control_df[analysis_metric].dropna(), equal_var=False)
+                t_stat, p_val = stats.ttest_ind_from_stats(
+                    mean, std, metric.n[i], control_mean, control_std, metric.n[c], equal_var=False
+                )
                 res.p_value = float(p_val)
                 res.is_significant = bool(p_val < 0.05)
                 
@@ -174,57 +749,268 @@ def analyze_experiment(
             
         results.append(res)
         
-    return ExperimentAnalysis(control_variant=control_label, results=results, srm_warning=srm_warning, warnings=warnings)
+    return ExperimentAnalysis(
+        control_variant=str(control_label),
+        results=results,
+        srm_warning=srm_warning,
+        warnings=warnings,
+        cuped_theta=cuped_theta
+    )
+
+def _summary_variant_stats(summaries: list[VariantSummary], metric_type: MetricType) -> VariantStats:
+    # Power sums are additive, so segment rows of the same variant are simply summed
+    labels: list[str] = []
+    sums: dict[str, np.ndarray] = {}
+    has_covariate = all(
+        s.sum_x is not None and s.sum_x_sq is not None and s.sum_xy is not None for s in summaries
+    )
+    for s in summaries:
+        sum_sq = s.sum_sq
+        if sum_sq is None:
+            if metric_type != MetricType.BINARY:
+                raise ValueError(f"sum_sq is required for continuous metrics (variant {s.variant})")
+            sum_sq = s.sum # y^2 == y for 0/1 outcomes
+        row = np.array([
+            s.n,
+            s.sum,
+            sum_sq,
+            s.n_rows if s.n_rows is not None else s.n,
+            s.sum_x or 0.0,
+            s.sum_x_sq or 0.0,
+            s.sum_xy or 0.0,
+        ], dtype=float)
+        if s.variant not in sums:
+            labels.append(s.variant)
+            sums[s.variant] = row
+        else:
+            sums[s.variant] += row
+
+    if metric_type == MetricType.RATIO and not has_covariate:
+        raise ValueError("Ratio metrics require sum_x, sum_x_sq and sum_xy for the denominator")
+
+    table = np.array([sums[v] for v in labels])
+    stats_ = variant_stats_from_sums(
+        labels,
+        n=table[:, 0],
+        total=table[:, 1],
+        total_sq=table[:, 2],
+        n_rows=table[:, 3],
+        total_x=table[:, 4] if has_covariate else None,
+        total_x_sq=table[:, 5] if has_covariate else None,
+        total_xy=table[:, 6] if has_covariate else None,
+    )
+    return _ratio_stats(stats_) if metric_type == MetricType.RATIO else stats_
+
+def analyze_summary_stats(
+    summaries: list[VariantSummary],
+    metric_type: MetricType,
+    control_label: str,
+    analysis_type: AnalysisType = AnalysisType.FREQUENTIST,
+    bayesian_method: str = "quadrature",
+    seed: int | None = None
+) -> SummaryAnalysis:
+    """
+    Analyzes pre-aggregated per-variant (and optionally per-segment) statistics.
+
+    Gives the same results as ``analyze_experiment`` on the underlying rows.
+    When rows carry a ``segment`` the overall analysis sums across segments and
+    each segment is also analyzed on its own.
+    """
+    options = dict(bayesian_method=bayesian_method, seed=seed)
+    overall = analyze_variant_stats(
+        _summary_variant_stats(summaries, metric_type), metric_type, control_label, analysis_type, **options
+    )
+
+    by_segment: dict[str, list[VariantSummary]] = {}
+    for s in summaries:
+        if s.segment is not None:
+            by_segment.setdefault(s.segment, []).append(s)
+
+    segments = {
+        seg: analyze_variant_stats(
+            _summary_variant_stats(rows, metric_type), metric_type, control_label, analysis_type, **options
+        )
+        for seg, rows in by_segment.items()
+    }
+    return SummaryAnalysis(overall=overall, segments=segments)
+
+def _quantile_se(digest: TDigest, q: float, z: float) -> float:
+    # Distribution-free order-statistic interval: the rank of the q-quantile is
+    # Binomial(n, q), so its (1 - alpha) bounds map back through the sketch.
+    n = digest.count
+    half = z * np.sqrt(q * (1 - q) / n)
+    lower, upper = digest.quantile([max(q - half, 0.0), min(q + half, 1.0)])
+    return float((upper - lower) / (2 * z))
+
+def analyze_variant_digests(
+    labels: list[Any],
+    digests: list[TDigest],
+    n_rows: np.ndarray,
+    control_label: str,
+    quantiles: list[float],
+    alpha: float = 0.05,
+    allocation: Allocation = None
+) -> QuantileAnalysis:
+    """
+    Quantile treatment effects (variant - control) from per-variant sketches.
+
+    The standard error of each quantile is read off the sketch from the
+    binomial rank interval around q, and the difference uses the normal
+    approximation with independent arms. The SRM check expects the split
+    given by ``allocation`` (equal by default).
+    """
+    if len(labels) == 0:
+        return QuantileAnalysis(control_variant="", quantiles=quantiles, results=[], srm_warning=False, warnings=["No data found"])
+
+    warnings = []
+    weights = expected_split(labels, control_label, allocation)
+    srm_p = srm_p_value(n_rows, weights)
+    srm_warning = srm_p < 0.001
+    if srm_warning:
+        warnings.append(_srm_message(srm_p, weights))
+
+    c = labels.index(control_label) if control_label in labels else 0
+    z = float(stats.norm.ppf(1 - alpha / 2))
+    values = np.array([d.quantile(quantiles) if d.count else np.full(len(quantiles), np.nan) for d in digests])
+
+    results = []
+    for i, v in enumerate(labels):
+        if digests[i].count < 2 and i != c:
+            warnings.append(f"Not enough data for quantiles of {v}")
+        for j, q in enumerate(quantiles):
+            res = QuantileResult(variant=str(v), quantile=q, value=float(values[i, j]))
+            if i != c and digests[i].count >= 2 and digests[c].count >= 2:
+                diff = float(values[i, j] - values[c, j])
+                se = float(np.hypot(_quantile_se(digests[i], q, z), _quantile_se(digests[c], q, z)))
+                res.diff = diff
+                res.ci_lower = diff - z * se
+                res.ci_upper = diff + z * se
+                if se > 0:
+                    res.p_value = float(2 * stats.norm.sf(abs(diff) / se))
+                else:
+                    res.p_value = 1.0 if diff == 0 else 0.0
+                res.is_significant = bool(res.p_value < alpha)
+            results.append(res)
+
+    return QuantileAnalysis(
+        control_variant=str(labels[c]),
+        quantiles=quantiles,
+        results=results,
+        srm_warning=srm_warning,
+        warnings=warnings
+    )
+
+@profiled("analyze_quantiles")
+def analyze_quantiles(
+    chunks: pd.DataFrame | Iterable[pd.DataFrame],
+    metric_col: str,
+    variant_col: str,
+    control_label: str,
+    quantiles: list[float] | None = None,
+    alpha: float = 0.05,
+    compression: float = 200.0,
+    allocation: Allocation = None
+) -> QuantileAnalysis:
+    """
+    Compares variant quantiles (e.g. p50/p95/p99 latency) against control.
+
+    Accepts a frame or an iterable of chunks; each variant is folded into a
+    mergeable t-digest in one pass, so no full sort of the data is needed.
+    ``quantiles`` defaults to p50, p95 and p99.
+    """
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    quantiles = [float(q) for q in (quantiles or [0.5, 0.95, 0.99])]
+    if any(not 0 < q < 1 for q in quantiles):
+        raise ValueError("Quantiles must be strictly between 0 and 1")
+    labels, digests, n_rows = compute_variant_digests(chunks, variant_col, metric_col, compression)
+    return analyze_variant_digests(labels, digests, n_rows, control_label, quantiles, alpha, allocation)
+
+def adjust_p_values(p_values: np.ndarray, method: str = "bh") -> np.ndarray:
+    """
+    Multiple-testing adjusted p-values.
+
+    ``method`` is "bh" (Benjamini-Hochberg FDR), "holm" (Holm-Bonferroni FWER)
+    or "none".
+    """
+    p = np.asarray(p_values, dtype=float)
+    m = len(p)
+    if method == "none" or m == 0:
+        return p.copy()
+
+    order = np.argsort(p)
+    ranked = p[order]
+    if method == "bh":
+        adjusted = ranked * m / np.arange(1, m + 1)
+        adjusted = np.minimum.accumulate(adjusted[::-1])[::-1]
+    elif method == "holm":
+        adjusted = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    else:
+        raise ValueError(f"Unknown p-value adjustment: {method}")
+
+    out = np.empty(m)
+    out[order] = np.minimum(adjusted, 1.0)
+    return out
 
+@profiled("auto_drill_down")
 def auto_drill_down(
     df: pd.DataFrame,
     metric_col: str,
     variant_col: str,
     control_label: str,
     segment_cols: list[str],
-    metric_type: MetricType = MetricType.CONTINUOUS
+    metric_type: MetricType = MetricType.CONTINUOUS,
+    alpha: float = 0.05,
+    p_adjust: str = "bh"
 ) -> list[dict[str, Any]]:
     """
     Automatically checks segments if the overall result is not satisfactory.
+
+    All (segment, variant) Welch tests are computed at once from grouped
+    sufficient statistics, and significance is judged on p-values adjusted with
+    ``p_adjust`` across every segment tested.
     """
-    insights = []
+    tests = []
     
-    # Iterate over segments
-    for seg_col in segment_cols:
-        if seg_col not in df.columns:
+    # One (segment, variant) aggregation per segment column
+    cols = [c for c in segment_cols if c in df.columns]
+    for seg_col, seg in compute_segment_stats(df, cols, variant_col, metric_col).items():
+        if not seg.variants:
             continue
-            
-        segments = df[seg_col].unique()
-        for seg_val in segments:
-            seg_df = df[df[seg_col] == seg_val]
-            if len(seg_df) < 10: # skip small segments
-                continue
-                
-            try:
-                # We reuse analyze_experiment for the segment
-                res = analyze_experiment(
-                    seg_df, metric_col, variant_col, metric_type, control_label
-                )
-                
-                # Check for significant results in segment
-                for r in res.results:
-                    if r.variant != control_label:
-                        # Check if significant or if direction is different from main (e.g. Simpson's paradox)
-                        if r.is_significant:
-                             insights.append({
-                                 "segment_col": seg_col,
-                                 "segment_value": str(seg_val),
-                                 "variant": r.variant,
-                                 "lift": r.lift,
-                                 "p_value": r.p_value,
-                                 "message": f"Significant effect found in {seg_col}={seg_val} (Lift: {r.lift:.2%})"
-                             })
-                         
-            except Exception:
-                continue
+        c = seg.variants.index(control_label) if control_label in seg.variants else 0
+        
+        mean, std, n = seg.metric.mean, seg.metric.std, seg.metric.n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            _, p = stats.ttest_ind_from_stats(
+                mean, std, n, mean[:, [c]], std[:, [c]], n[:, [c]], equal_var=False
+            )
+            control_mean = mean[:, [c]]
+            lift = np.where(control_mean != 0, (mean - control_mean) / np.abs(control_mean), 0.0)
+        
+        # skip small segments, the control arm and cells without a valid test
+        testable = (seg.n_rows.sum(axis=1) >= 10)[:, None] & ~np.isnan(p)
+        testable[:, c] = False
+        for si, vi in zip(*np.nonzero(testable), strict=True):
+            tests.append((seg_col, seg.segments[si], seg.variants[vi], float(lift[si, vi]), float(p[si, vi])))
+    
+    adjusted = adjust_p_values(np.array([t[4] for t in tests]), p_adjust)
+    
+    insights = []
+    for (seg_col, seg_val, variant, lift_v, p_val), p_adj in zip(tests, adjusted, strict=True):
+        if p_adj < alpha:
+            insights.append({
+                "segment_col": seg_col,
+                "segment_value": str(seg_val),
+                "variant": str(variant),
+                "lift": lift_v,
+                "p_value": p_val,
+                "p_value_adjusted": float(p_adj),
+                "message": f"Significant effect found in {seg_col}={seg_val} (Lift: {lift_v:.2%})"
+            })
                 
     return insights
 
+@profiled("analyze_observational")
 def analyze_observational(
     df: pd.DataFrame,
     method: str,
@@ -236,5 +1022,16 @@ def analyze_observational(
     elif method == "scm":
         model = SyntheticControl()
         return model.fit(df, **kwargs)
+    elif method == "twfe":
+        model = TwoWayFixedEffects()
+        return model.fit(df, **kwargs)
+    elif method == "staggered":
+        options = {k: kwargs.pop(k) for k in ("control_group", "n_boot", "seed", "n_jobs") if k in kwargs}
+        model = StaggeredDiD(**options)
+        return model.fit(df, **kwargs)
+    elif method == "event_study":
+        options = {k: kwargs.pop(k) for k in ("leads", "lags", "reference") if k in kwargs}
+        model = EventStudy(**options)
+        return model.fit(df, **kwargs)
     else:
         raise ValueError(f"Unknown method: {method}")
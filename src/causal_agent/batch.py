@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pydantic import BaseModel
+
+from .analysis import ExperimentAnalysis, analyze_experiment
+from .ingest import compact_dtypes, file_format, read_table
+from .schemas import BatchExperiment
+
+
+class BatchResult(BaseModel):
+    experiment_id: str
+    analysis: ExperimentAnalysis | None = None
+    error: str | None = None
+    seconds: float
+
+
+def run_experiment(spec: BatchExperiment) -> BatchResult:
+    """Loads the columns ``spec`` needs from its file and runs ``analyze_experiment``; errors are returned, not raised."""
+    start = time.perf_counter()
+    try:
+        if not spec.path:
+            raise ValueError("Batch experiments need a path (resolve dataset_id first)")
+        covariates = [spec.covariate_col] if isinstance(spec.covariate_col, str) else list(spec.covariate_col or [])
+        columns = [spec.variant_col, spec.metric_col, spec.denominator_col, spec.timestamp_col, *covariates]
+        with open(spec.path, "rb") as source:
+            df = read_table(source, file_format(spec.path), columns, categorical=[spec.variant_col])
+        df, _ = compact_dtypes(df)
+        analysis = analyze_experiment(
+            df,
+            spec.metric_col,
+            spec.variant_col,
+            spec.metric_type,
+            spec.control_label,
+            covariate_col=spec.covariate_col,
+            analysis_type=spec.analysis_type,
+            bayesian_method=spec.bayesian_method,
+            seed=spec.seed,
+            denominator_col=spec.denominator_col,
+            allocation=spec.allocation,
+            timestamp_col=spec.timestamp_col,
+        )
+        return BatchResult(experiment_id=spec.experiment_id, analysis=analysis, seconds=time.perf_counter() - start)
+    except Exception as e:
+        return BatchResult(experiment_id=spec.experiment_id, error=str(e), seconds=time.perf_counter() - start)
+
+
+def analyze_batch(specs: Iterable[BatchExperiment], n_jobs: int | None = None) -> Iterator[BatchResult]:
+    """
+    Runs many experiments across a process pool, yielding each result as it finishes.
+
+    Results arrive in completion order, not input order; match them up by
+    ``experiment_id``. A failing experiment yields a result with ``error`` set
+    and does not stop the batch. ``n_jobs=1`` runs in-process, in order.
+    """
+    specs = list(specs)
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(1, len(specs)))
+    if n_jobs == 1:
+        for spec in specs:
+            yield run_experiment(spec)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [pool.submit(run_experiment, spec) for spec in specs]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # the consumer may stop early (e.g. a dropped HTTP client)
+            for future in futures:
+                future.cancel()
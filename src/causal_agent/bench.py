@@ -0,0 +1,267 @@
+"""
+Benchmark suite for the statistics and causal engines.
+
+    python -m causal_agent.bench --size 10k 1m --save baseline.json
+    python -m causal_agent.bench --size 10k 1m --compare baseline.json
+
+Every case builds its synthetic data from a fixed seed (not timed), then
+records the best wall time over ``--repeat`` runs and the peak memory
+allocated by one extra traced run (``tracemalloc``, which also sees numpy
+buffers). ``--compare`` exits non-zero when a case is slower or uses more
+memory than the baseline by more than ``--threshold``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .analysis import analyze_experiment, auto_drill_down
+from .causal import DifferenceInDifferences, HTELearner, SyntheticControl
+from .power import simulate_power_two_proportion
+from .schemas import MetricType
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# A default 100-tree forest on millions of rows takes hours; the HTE case is
+# capped so the suite stays runnable and still tracks the learner's cost.
+HTE_MAX_ROWS = 50_000
+
+
+@dataclass
+class Case:
+    name: str
+    params: dict[str, Any]
+    setup: Callable[[int, np.random.Generator], tuple[Callable[[], Any], dict[str, Any]]]
+
+
+@dataclass
+class BenchResult:
+    case: str
+    size: str
+    seconds: float
+    peak_mb: float
+    info: dict[str, Any] = field(default_factory=dict) # actual shape of the generated data
+
+    @property
+    def key(self) -> str:
+        return f"{self.case}@{self.size}"
+
+
+def experiment_frame(n: int, n_variants: int, n_segments: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Revenue-like metric with a pre-period covariate, ``n_variants`` arms and ``n_segments`` segment columns."""
+    variant = rng.integers(0, n_variants, n)
+    pre = rng.gamma(2.0, 5.0, n)
+    df = pd.DataFrame({
+        "variant": pd.Categorical.from_codes(variant, [f"v{i}" for i in range(n_variants)]),
+        "pre_revenue": pre,
+        "revenue": 0.8 * pre + rng.normal(0, 5, n) + 0.2 * variant,
+    })
+    for j in range(n_segments):
+        levels = 5 * (j + 1)
+        df[f"segment_{j}"] = pd.Categorical.from_codes(rng.integers(0, levels, n), [f"s{k}" for k in range(levels)])
+    return df
+
+
+def panel_frame(n: int, n_units: int, rng: np.random.Generator) -> tuple[pd.DataFrame, int]:
+    """Balanced panel of about ``n`` rows with unit and time effects; the first unit is treated halfway through."""
+    periods = max(4, n // n_units)
+    unit = np.repeat(np.arange(n_units), periods)
+    time_ = np.tile(np.arange(periods), n_units)
+    factor = rng.normal(0, 1, periods).cumsum()
+    loading = rng.uniform(0.5, 1.5, n_units)
+    outcome = 10 + loading[unit] * factor[time_] + rng.normal(0, 0.5, len(unit))
+    treated = (unit < max(1, n_units // 2)).astype(np.int8)
+    outcome += 2.0 * treated * (time_ >= periods // 2)
+    df = pd.DataFrame({"unit": unit, "time": time_, "treated": treated, "outcome": outcome})
+    return df, periods
+
+
+def _experiment(n_variants: int, cuped: bool):
+    def setup(n, rng):
+        df = experiment_frame(n, n_variants, 0, rng)
+        covariate = "pre_revenue" if cuped else None
+        return (
+            lambda: analyze_experiment(df, "revenue", "variant", MetricType.CONTINUOUS, "v0", covariate_col=covariate),
+            {"rows": n},
+        )
+    return setup
+
+
+def _drill_down(n_segments: int):
+    def setup(n, rng):
+        df = experiment_frame(n, 2, n_segments, rng)
+        cols = [f"segment_{j}" for j in range(n_segments)]
+        return lambda: auto_drill_down(df, "revenue", "variant", "v0", cols), {"rows": n}
+    return setup
+
+
+def _did(n_units: int):
+    def setup(n, rng):
+        df, periods = panel_frame(n, n_units, rng)
+        return (
+            lambda: DifferenceInDifferences().fit(df, "unit", "time", "treated", "outcome", periods // 2),
+            {"rows": len(df), "units": n_units, "periods": periods},
+        )
+    return setup
+
+
+def _synthetic_control(n_donors: int):
+    def setup(n, rng):
+        df, periods = panel_frame(n, n_donors + 1, rng)
+        return (
+            lambda: SyntheticControl().fit(df, "unit", "time", "outcome", 0, periods // 2),
+            {"rows": len(df), "donors": n_donors, "periods": periods},
+        )
+    return setup
+
+
+def _hte(n_features: int):
+    def setup(n, rng):
+        rows = min(n, HTE_MAX_ROWS)
+        x = rng.normal(size=(rows, n_features))
+        treatment = rng.integers(0, 2, rows)
+        df = pd.DataFrame(x, columns=[f"x{j}" for j in range(n_features)])
+        df["treatment"] = treatment
+        df["outcome"] = x[:, 0] + treatment * (1 + x[:, 1]) + rng.normal(0, 1, rows)
+        return (
+            lambda: HTELearner().fit_predict(df, list(df.columns[:n_features]), "treatment", "outcome"),
+            {"rows": rows, "features": n_features},
+        )
+    return setup
+
+
+def _power(iters: int):
+    def setup(n, rng):
+        # n is the total number of simulated Bernoulli draws
+        n_per_group = max(10, n // (2 * iters))
+        return (
+            lambda: simulate_power_two_proportion(n_per_group, 0.1, 0.01, iters=iters, seed=0),
+            {"n_per_group": n_per_group, "iters": iters},
+        )
+    return setup
+
+
+CASES = [
+    Case("analyze_experiment", {"variants": 2}, _experiment(2, cuped=False)),
+    Case("analyze_experiment", {"variants": 5}, _experiment(5, cuped=False)),
+    Case("analyze_experiment", {"variants": 2, "cuped": True}, _experiment(2, cuped=True)),
+    Case("auto_drill_down", {"segment_cols": 1}, _drill_down(1)),
+    Case("auto_drill_down", {"segment_cols": 4}, _drill_down(4)),
+    Case("DifferenceInDifferences.fit", {"units": 100}, _did(100)),
+    Case("DifferenceInDifferences.fit", {"units": 10_000}, _did(10_000)),
+    Case("SyntheticControl.fit", {"donors": 20}, _synthetic_control(20)),
+    Case("SyntheticControl.fit", {"donors": 200}, _synthetic_control(200)),
+    Case("HTELearner.fit_predict", {"features": 5}, _hte(5)),
+    Case("simulate_power_two_proportion", {"iters": 200}, _power(200)),
+]
+
+
+def case_name(case: Case) -> str:
+    return case.name + "[" + ",".join(f"{k}={v}" for k, v in case.params.items()) + "]"
+
+
+def run_case(case: Case, size: str, repeat: int = 3, seed: int = 0) -> BenchResult:
+    fn, info = case.setup(SIZES[size], np.random.default_rng(seed))
+    timings = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    # separate traced run: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return BenchResult(case=case_name(case), size=size, seconds=min(timings), peak_mb=peak / 2**20, info=info)
+
+
+def run_suite(
+    sizes: list[str], pattern: str | None = None, repeat: int = 3, seed: int = 0
+) -> list[BenchResult]:
+    results = []
+    for size in sizes:
+        for case in CASES:
+            if pattern and pattern not in case_name(case):
+                continue
+            result = run_case(case, size, repeat, seed)
+            print(f"{result.key:<70} {result.seconds:>10.3f}s {result.peak_mb:>10.1f}MB", flush=True)
+            results.append(result)
+    return results
+
+
+def save_results(results: list[BenchResult], path: str | Path) -> None:
+    Path(path).write_text(json.dumps([asdict(r) for r in results], indent=2), encoding="utf-8")
+
+
+def load_results(path: str | Path) -> list[BenchResult]:
+    return [BenchResult(**r) for r in json.loads(Path(path).read_text(encoding="utf-8"))]
+
+
+def compare(
+    results: list[BenchResult], baseline: list[BenchResult], threshold: float = 1.25
+) -> list[dict[str, Any]]:
+    """
+    Current vs baseline per case; ``regressed`` when time or peak memory grew by more than ``threshold``x.
+    Cases absent from the baseline are skipped.
+    """
+    base = {r.key: r for r in baseline}
+    rows = []
+    for r in results:
+        b = base.get(r.key)
+        if b is None:
+            continue
+        time_ratio = r.seconds / b.seconds if b.seconds > 0 else float("inf")
+        mem_ratio = r.peak_mb / b.peak_mb if b.peak_mb > 0 else 1.0
+        rows.append({
+            "case": r.key,
+            "seconds": r.seconds,
+            "baseline_seconds": b.seconds,
+            "time_ratio": time_ratio,
+            "peak_mb": r.peak_mb,
+            "baseline_peak_mb": b.peak_mb,
+            "memory_ratio": mem_ratio,
+            "regressed": time_ratio > threshold or mem_ratio > threshold,
+        })
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the statistics and causal engines.")
+    parser.add_argument("--size", nargs="+", choices=list(SIZES), default=["10k"])
+    parser.add_argument("--case", default=None, help="Only run cases whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default=None, help="Write results as JSON (e.g. a new baseline)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.size, args.case, args.repeat, args.seed)
+    if args.save:
+        save_results(results, args.save)
+    if not args.compare:
+        return 0
+
+    rows = compare(results, load_results(args.compare), args.threshold)
+    print()
+    for row in rows:
+        flag = "REGRESSED" if row["regressed"] else "ok"
+        print(f"{row['case']:<70} time x{row['time_ratio']:.2f}  memory x{row['memory_ratio']:.2f}  {flag}")
+    return 1 if any(row["regressed"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _bootstrap_task(
+    codes: np.ndarray,
+    values: np.ndarray,
+    k: int,
+    n_reps: int,
+    seed: np.random.SeedSequence,
+    block_size: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    # One stream over the rows for n_reps replicates; returns per-group
+    # sum of weights and weighted sum, both shaped (k, n_reps).
+    rng = np.random.default_rng(seed)
+    weight_sum = np.zeros((k, n_reps))
+    weighted_total = np.zeros((k, n_reps))
+    for start in range(0, len(values), block_size):
+        c = codes[start:start + block_size]
+        y = values[start:start + block_size]
+        group = sparse.csr_matrix((np.ones(len(c)), (c, np.arange(len(c)))), shape=(k, len(c)))
+        w = rng.poisson(1.0, size=(len(c), n_reps)).astype(float)
+        weight_sum += group @ w
+        weighted_total += group @ (w * y[:, None])
+    return weight_sum, weighted_total
+
+
+def _quantile_task(
+    codes: np.ndarray,
+    values: np.ndarray,
+    k: int,
+    n_reps: int,
+    seed: np.random.SeedSequence,
+    block_size: int,
+    q: float,
+) -> np.ndarray:
+    # Rows are sorted by (group, value). The first pass totals each group's
+    # weights, and the second replays the same weight stream to find the row
+    # where the running weight reaches q * total. Returns (k, n_reps).
+    starts = np.searchsorted(codes, np.arange(k))
+    ends = np.searchsorted(codes, np.arange(k), side="right")
+
+    def blocks():
+        rng = np.random.default_rng(seed)
+        for start in range(0, len(values), block_size):
+            c = codes[start:start + block_size]
+            group = sparse.csr_matrix((np.ones(len(c)), (c, np.arange(len(c)))), shape=(k, len(c)))
+            yield start, c, group, rng.poisson(1.0, size=(len(c), n_reps)).astype(float)
+
+    target = np.zeros((k, n_reps))
+    for _, _, group, w in blocks():
+        target += group @ w
+    target *= q
+
+    running = np.zeros((k, n_reps))
+    position = np.full((k, n_reps), -1)
+    for start, c, group, w in blocks():
+        # running weight per row: within-block cumsum, restarted at each group's first row in the block
+        cum = np.cumsum(w, axis=0)
+        first = np.searchsorted(c, c)
+        offset = np.where(first[:, None] > 0, cum[first - 1], 0.0)
+        reached = (cum - offset + running[c]) >= target[c]
+        # weights are non-negative, so within a group the rows that reach the target come last
+        below = group @ (~reached).astype(float)
+        present = np.unique(c)
+        block_start = np.maximum(starts[present], start)
+        block_end = np.minimum(ends[present], start + len(c))
+        hit = (below[present] < (block_end - block_start)[:, None]) & (position[present] < 0)
+        row = block_start[:, None] + below[present].astype(int)
+        position[present] = np.where(hit, row, position[present])
+        running += group @ w
+
+    out = np.full((k, n_reps), np.nan)
+    found = (position >= 0) & (target > 0)
+    out[found] = values[position[found]]
+    return out
+
+
+# Per-process copy of the rows, set once by the pool initializer
+_worker_data: dict[str, Any] = {}
+
+
+def _init_worker(codes: np.ndarray, values: np.ndarray, k: int, block_size: int, q: float | None) -> None:
+    _worker_data.update(codes=codes, values=values, k=k, block_size=block_size, q=q)
+
+
+def _worker_task(n_reps: int, seed: np.random.SeedSequence):
+    d = _worker_data
+    if d["q"] is None:
+        return _bootstrap_task(d["codes"], d["values"], d["k"], n_reps, seed, d["block_size"])
+    return _quantile_task(d["codes"], d["values"], d["k"], n_reps, seed, d["block_size"], d["q"])
+
+
+def _run_replicates(
+    codes: np.ndarray,
+    values: np.ndarray,
+    k: int,
+    q: float | None,
+    n_boot: int,
+    seed: int | None,
+    n_jobs: int,
+    block_size: int,
+    reps_per_task: int,
+) -> list:
+    # Splits n_boot into tasks with spawned seeds; results do not depend on n_jobs
+    reps = [min(reps_per_task, n_boot - i) for i in range(0, n_boot, reps_per_task)]
+    seeds = np.random.SeedSequence(seed).spawn(len(reps))
+    if n_jobs > 1 and len(reps) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(n_jobs, len(reps)), initializer=_init_worker, initargs=(codes, values, k, block_size, q)
+        ) as pool:
+            return list(pool.map(_worker_task, reps, seeds))
+    if q is None:
+        return [_bootstrap_task(codes, values, k, r, s, block_size) for r, s in zip(reps, seeds, strict=True)]
+    return [_quantile_task(codes, values, k, r, s, block_size, q) for r, s in zip(reps, seeds, strict=True)]
+
+
+def poisson_bootstrap(
+    codes: np.ndarray,
+    values: np.ndarray,
+    k: int,
+    n_boot: int = 1000,
+    seed: int | None = None,
+    n_jobs: int = 1,
+    block_size: int = 8192,
+    reps_per_task: int = 100,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Poisson(1) bootstrap of per-group sums.
+
+    Each row gets an independent Poisson(1) weight per replicate, drawn in
+    blocks of ``block_size`` rows, so the data is processed in a single
+    streaming pass and memory is O(block_size * reps_per_task). Replicates are
+    split into tasks with independent ``SeedSequence.spawn`` streams and run on
+    a process pool when ``n_jobs > 1``; results do not depend on ``n_jobs``.
+    The rows are sent to each worker once, and a task carries only its seed
+    and replicate count.
+
+    Returns (weight_sum, weighted_total), both shaped (k, n_boot).
+    """
+    parts = _run_replicates(codes, values, k, None, n_boot, seed, n_jobs, block_size, reps_per_task)
+    weight_sum = np.concatenate([p[0] for p in parts], axis=1)
+    weighted_total = np.concatenate([p[1] for p in parts], axis=1)
+    return weight_sum, weighted_total
+
+
+def poisson_bootstrap_quantile(
+    codes: np.ndarray,
+    values: np.ndarray,
+    k: int,
+    q: float = 0.5,
+    n_boot: int = 1000,
+    seed: int | None = None,
+    n_jobs: int = 1,
+    block_size: int = 8192,
+    reps_per_task: int = 100,
+) -> np.ndarray:
+    """
+    Poisson(1) bootstrap of the per-group weighted q-quantile (the median by default).
+
+    The rows are sorted by group and value once. Each task then makes two
+    blocked passes over them with the same weight stream: the first totals the
+    weights, and the second finds the first row whose running weight reaches
+    ``q`` of the total. Memory stays O(block_size * reps_per_task), and tasks
+    are parallelised as in ``poisson_bootstrap``. Returns a (k, n_boot) array,
+    NaN where a group drew no weight.
+    """
+    if not 0 < q < 1:
+        raise ValueError("q must be strictly between 0 and 1")
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    parts = _run_replicates(codes, values, k, q, n_boot, seed, n_jobs, block_size, reps_per_task)
+    return np.concatenate(parts, axis=1)
+
+
+def bootstrap_diff_ci(
+    codes: np.ndarray,
+    values: np.ndarray,
+    k: int,
+    control_index: int,
+    alpha: float = 0.05,
+    quantile: float | None = None,
+    **kwargs
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Percentile CIs for the difference of each group vs the control group.
+
+    The statistic is the mean, or the ``quantile`` (e.g. 0.5 for the median)
+    when given. Missing values and unassigned rows (code < 0) are ignored.
+    ``kwargs`` are passed to ``poisson_bootstrap`` or
+    ``poisson_bootstrap_quantile``. Returns (lower, upper) arrays of length k.
+    """
+    keep = (codes >= 0) & ~np.isnan(values)
+    if quantile is None:
+        weight_sum, weighted_total = poisson_bootstrap(codes[keep], values[keep], k, **kwargs)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            estimates = weighted_total / weight_sum
+    else:
+        estimates = poisson_bootstrap_quantile(codes[keep], values[keep], k, quantile, **kwargs)
+    diffs = estimates - estimates[control_index]
+    lower, upper = np.nanpercentile(diffs, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=1)
+    return lower, upper
+
+
+def _diff_ci_by_label(
+    df: pd.DataFrame, metric_col: str, variant_col: str, control_label: str, **kwargs
+) -> dict[str, tuple[float, float]]:
+    codes, labels = pd.factorize(df[variant_col], sort=False)
+    labels = list(labels)
+    if control_label not in labels:
+        raise ValueError(f"Control variant {control_label} not found")
+    c = labels.index(control_label)
+    values = df[metric_col].to_numpy(dtype="float64", na_value=np.nan)
+    lower, upper = bootstrap_diff_ci(codes, values, len(labels), c, **kwargs)
+    return {str(v): (float(lower[i]), float(upper[i])) for i, v in enumerate(labels) if i != c}
+
+
+def bootstrap_mean_diff_ci(
+    df: pd.DataFrame,
+    metric_col: str,
+    variant_col: str,
+    control_label: str,
+    alpha: float = 0.05,
+    **kwargs
+) -> dict[str, tuple[float, float]]:
+    """Poisson-bootstrap CI of mean(variant) - mean(control) for every non-control variant."""
+    return _diff_ci_by_label(df, metric_col, variant_col, control_label, alpha=alpha, **kwargs)
+
+
+def bootstrap_quantile_diff_ci(
+    df: pd.DataFrame,
+    metric_col: str,
+    variant_col: str,
+    control_label: str,
+    q: float = 0.5,
+    alpha: float = 0.05,
+    **kwargs
+) -> dict[str, tuple[float, float]]:
+    """Poisson-bootstrap CI of quantile_q(variant) - quantile_q(control) (the median by default)."""
+    return _diff_ci_by_label(df, metric_col, variant_col, control_label, alpha=alpha, quantile=q, **kwargs)
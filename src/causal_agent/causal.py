@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any
 
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel
+from scipy import sparse, stats
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.linear_model import Lasso, LinearRegression, Ridge
 
+from .profiling import profiled, span
+
 
 class CausalResult(BaseModel):
     effect: float
@@ -16,14 +21,104 @@ class CausalResult(BaseModel):
     method: str
     details: dict[str, Any] = {}
 
+def _t_inference(effect: float, se: float, dof: int, alpha: float) -> tuple[float | None, float | None, float | None]:
+    # (ci_lower, ci_upper, p_value) from a t(dof) reference distribution
+    if not np.isfinite(se) or dof < 1:
+        return None, None, None
+    crit = float(stats.t.ppf(1 - alpha / 2, dof))
+    p_value = float(2 * stats.t.sf(abs(effect) / se, dof)) if se > 0 else None
+    return effect - crit * se, effect + crit * se, p_value
+
+
+def did_from_cells(
+    cluster: np.ndarray,
+    treated: np.ndarray,
+    post: np.ndarray,
+    n: np.ndarray,
+    total: np.ndarray,
+    alpha: float = 0.05
+) -> CausalResult:
+    """
+    2x2 Difference-in-Differences from (cluster, treated, post) cell counts and sums.
+
+    The saturated OLS Y ~ Treat + Post + Treat*Post only depends on these
+    aggregates: X'X and X'y are sums over cells, and each cluster's score is
+    the sum of x_cell times its residual total. The variance is the CR1
+    cluster-robust sandwich with t(G - 1) inference, as in Stata's
+    ``vce(cluster)``.
+    """
+    n = np.asarray(n, dtype=float)
+    total = np.asarray(total, dtype=float)
+    treated = np.asarray(treated, dtype=float)
+    post = np.asarray(post, dtype=float)
+    x = np.column_stack([np.ones_like(n), treated, post, treated * post])
+
+    cell_n = np.bincount((2 * treated + post).astype(np.int64), weights=n, minlength=4)
+    if (cell_n == 0).any():
+        raise ValueError("DiD needs treated and control observations both before and after post_period_start")
+
+    xtx = x.T @ (x * n[:, None])
+    beta = np.linalg.solve(xtx, x.T @ total)
+
+    # per-cluster scores sum_i x_i u_i, from the residual total of each cell
+    resid = total - n * (x @ beta)
+    _, g = np.unique(cluster, return_inverse=True)
+    n_clusters = int(g.max()) + 1
+    scores = np.zeros((n_clusters, 4))
+    np.add.at(scores, g, x * resid[:, None])
+
+    n_obs, k = n.sum(), x.shape[1]
+    bread = np.linalg.inv(xtx)
+    effect = float(beta[3])
+    se = None
+    ci_lower = ci_upper = p_value = None
+    if n_clusters > 1 and n_obs > k:
+        correction = n_clusters / (n_clusters - 1) * (n_obs - 1) / (n_obs - k)
+        vcov = correction * bread @ (scores.T @ scores) @ bread
+        se = float(np.sqrt(max(vcov[3, 3], 0.0)))
+        ci_lower, ci_upper, p_value = _t_inference(effect, se, n_clusters - 1, alpha)
+
+    summary = []
+    for t_, p_ in [(0, False), (0, True), (1, False), (1, True)]:
+        in_cell = (treated == t_) & (post == p_) & (n > 0)
+        summary.append({
+            "treated": t_,
+            "post": p_,
+            "n": int(n[in_cell].sum()),
+            "units": int(np.unique(cluster[in_cell]).size),
+            "mean": float(total[in_cell].sum() / n[in_cell].sum()),
+        })
+
+    return CausalResult(
+        effect=effect,
+        ci_lower=ci_lower,
+        ci_upper=ci_upper,
+        p_value=p_value,
+        method="Difference-in-Differences (OLS)",
+        details={
+            "coefficients": {
+                "treatment": float(beta[1]),
+                "post": float(beta[2]),
+                "interaction": effect,
+                "intercept": float(beta[0])
+            },
+            "se": se,
+            "se_type": "cluster-robust (CR1) by unit",
+            "n_clusters": n_clusters,
+            "cells": summary,
+        }
+    )
+
+
 class DifferenceInDifferences:
     """
     Implements Difference-in-Differences (DiD) logic.
     Assumes parallel trends assumption holds.
     """
-    def __init__(self):
-        self.model = LinearRegression()
+    def __init__(self, alpha: float = 0.05):
+        self.alpha = alpha
 
+    @profiled("DifferenceInDifferences.fit")
     def fit(self, df: pd.DataFrame, 
             unit_col: str, 
             time_col: str, 
@@ -33,64 +128,719 @@ class DifferenceInDifferences:
         """
         Fits a standard DiD model: Y = alpha + beta*Treat + gamma*Post + delta*(Treat*Post) + epsilon
         delta is the DiD estimator.
+
+        Rows are collapsed to unit x (treated, post) cells in one bincount pass
+        (``df`` is not copied), then solved in closed form by ``did_from_cells``
+        with standard errors clustered by ``unit_col``. Rows with a missing
+        outcome are ignored.
         """
-        data = df.copy()
-        
-        # Create Post dummy
-        data['Post'] = (data[time_col] >= post_period_start).astype(int)
-        
-        # Create Interaction term
-        data['Treat_Post'] = data[treatment_col] * data['Post']
-        
-        # X = [Treat, Post, Treat_Post]
-        X = data[[treatment_col, 'Post', 'Treat_Post']]
-        y = data[outcome_col]
-        
-        self.model.fit(X, y)
-        
-        # The coefficient for Treat_Post is the effect
-        effect = self.model.coef_[2]
-        
-        # Simple standard error approximation (assuming i.i.d errors, which is naive for panel data but okay for MVP)
-        # Ideally we would use clustered standard errors
-        
+        with span("aggregate"):
+            units, _ = pd.factorize(df[unit_col])
+            treat = df[treatment_col].to_numpy(dtype=float, na_value=np.nan)
+            if not np.isin(treat, (0.0, 1.0)).all():
+                raise ValueError(f"{treatment_col} must be a 0/1 indicator")
+            y = df[outcome_col].to_numpy(dtype=float, na_value=np.nan)
+            cell = units * 4 + treat.astype(np.int64) * 2 + (df[time_col] >= post_period_start).to_numpy()
+            keep = ~np.isnan(y) & (units >= 0)
+            n_units = int(units.max()) + 1 if len(units) else 0
+            n = np.bincount(cell[keep], minlength=4 * n_units)
+            total = np.bincount(cell[keep], weights=y[keep], minlength=4 * n_units)
+
+        with span("solve"):
+            ids = np.flatnonzero(n)
+            return did_from_cells(ids // 4, (ids // 2) % 2, ids % 2, n[ids], total[ids], self.alpha)
+
+def demean(
+    values: np.ndarray,
+    factors: list[np.ndarray],
+    tol: float = 1e-10,
+    max_iter: int = 1000
+) -> tuple[np.ndarray, int, bool]:
+    """
+    Within-transformation of ``values`` (n x k) by several fixed effects.
+
+    ``factors`` are integer codes (e.g. from ``pd.factorize``). Group means
+    are swept out of each factor in turn (alternating projections) until the
+    largest mean removed is below ``tol`` times the data scale, so each
+    iteration is a few bincount passes and no dummy matrix is built. Balanced
+    panels converge after one sweep; unbalanced ones take a few more. Returns
+    the demeaned copy, the iterations used and whether it converged.
+    """
+    x = np.array(values, dtype=float, copy=True)
+    if x.ndim == 1:
+        x = x[:, None]
+    sizes = [np.bincount(codes) for codes in factors]
+    scale = max(float(np.abs(x).max(initial=0.0)), 1.0)
+    for iteration in range(1, max_iter + 1):
+        largest = 0.0
+        for codes, size in zip(factors, sizes, strict=True):
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = np.column_stack([
+                    np.bincount(codes, weights=x[:, j], minlength=len(size)) for j in range(x.shape[1])
+                ]) / size[:, None]
+            means = np.nan_to_num(means)
+            x -= means[codes]
+            largest = max(largest, float(np.abs(means).max(initial=0.0)))
+        if largest < tol * scale:
+            return x, iteration, True
+    return x, max_iter, False
+
+
+def clustered_ols(
+    x: np.ndarray, y: np.ndarray, cluster: np.ndarray, absorbed: int = 0
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    OLS of ``y`` on ``x`` with a CR1 cluster-robust covariance.
+
+    ``absorbed`` is the number of fixed effects swept out beforehand that are
+    not nested in the clusters (they count against the residual degrees of
+    freedom). Returns (beta, vcov, n_clusters).
+    """
+    xtx = x.T @ x
+    beta = np.linalg.solve(xtx, x.T @ y)
+    resid = y - x @ beta
+    _, g = np.unique(cluster, return_inverse=True)
+    n_clusters = int(g.max()) + 1
+    scores = np.zeros((n_clusters, x.shape[1]))
+    np.add.at(scores, g, x * resid[:, None])
+    n_obs, k = len(y), x.shape[1] + absorbed
+    bread = np.linalg.inv(xtx)
+    vcov = np.full_like(xtx, np.nan)
+    if n_clusters > 1 and n_obs > k:
+        vcov = n_clusters / (n_clusters - 1) * (n_obs - 1) / (n_obs - k) * bread @ (scores.T @ scores) @ bread
+    return beta, vcov, n_clusters
+
+
+class TwoWayFixedEffects:
+    """
+    Two-way fixed-effects DiD: Y_it = a_i + l_t + delta * D_it + e_it.
+
+    Unit and time effects are removed with ``demean`` instead of dummy
+    columns, so memory and time are linear in rows and unbalanced panels are
+    handled. Standard errors are clustered by unit.
+    """
+    def __init__(self, alpha: float = 0.05, tol: float = 1e-10, max_iter: int = 1000):
+        self.alpha = alpha
+        self.tol = tol
+        self.max_iter = max_iter
+
+    @profiled("TwoWayFixedEffects.fit")
+    def fit(self, df: pd.DataFrame,
+            unit_col: str,
+            time_col: str,
+            treatment_col: str,
+            outcome_col: str,
+            post_period_start: Any | None = None) -> CausalResult:
+        """
+        Estimates delta. With ``post_period_start`` D_it is treatment_col * (time >= start);
+        otherwise ``treatment_col`` is taken as the time-varying treatment indicator.
+        Rows with a missing outcome or treatment are ignored.
+        """
+        with span("prepare"):
+            d = df[treatment_col].to_numpy(dtype=float, na_value=np.nan)
+            if post_period_start is not None:
+                d = d * (df[time_col] >= post_period_start).to_numpy()
+            y = df[outcome_col].to_numpy(dtype=float, na_value=np.nan)
+            units, _ = pd.factorize(df[unit_col])
+            periods, _ = pd.factorize(df[time_col])
+            keep = ~np.isnan(y) & ~np.isnan(d) & (units >= 0) & (periods >= 0)
+            if not keep.all():
+                d, y, units, periods = d[keep], y[keep], units[keep], periods[keep]
+            # re-code so every level is observed
+            units = np.unique(units, return_inverse=True)[1]
+            periods = np.unique(periods, return_inverse=True)[1]
+
+        with span("demean"):
+            within, iterations, converged = demean(
+                np.column_stack([y, d]), [units, periods], self.tol, self.max_iter
+            )
+        if not np.any(np.abs(within[:, 1]) > 1e-12):
+            raise ValueError("The treatment has no variation left after removing unit and time effects")
+
+        with span("solve"):
+            n_periods = int(periods.max()) + 1
+            # unit effects are nested in the unit clusters, time effects are not
+            beta, vcov, n_clusters = clustered_ols(within[:, 1:], within[:, 0], units, absorbed=n_periods)
+
+        effect = float(beta[0])
+        se = float(np.sqrt(vcov[0, 0]))
+        ci_lower, ci_upper, p_value = _t_inference(effect, se, n_clusters - 1, self.alpha)
         return CausalResult(
             effect=effect,
-            method="Difference-in-Differences (OLS)",
+            ci_lower=ci_lower,
+            ci_upper=ci_upper,
+            p_value=p_value,
+            method="Two-Way Fixed Effects DiD",
             details={
-                "coefficients": {
-                    "treatment": self.model.coef_[0],
-                    "post": self.model.coef_[1],
-                    "interaction": self.model.coef_[2],
-                    "intercept": self.model.intercept_
-                }
+                "se": se if np.isfinite(se) else None,
+                "se_type": "cluster-robust (CR1) by unit",
+                "n_clusters": n_clusters,
+                "n_obs": int(len(y)),
+                "n_units": int(units.max()) + 1,
+                "n_periods": n_periods,
+                "balanced": bool(len(y) == (int(units.max()) + 1) * n_periods),
+                "iterations": iterations,
+                "converged": converged,
+            }
+        )
+
+def _cohort_task(
+    units: np.ndarray,
+    periods: np.ndarray,
+    y: np.ndarray,
+    n_periods: int,
+    n_boot: int,
+    seed: np.random.SeedSequence,
+    block_units: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Per-period outcome sums and observation counts of one cohort, shaped
+    # (n_boot + 1, n_periods): row 0 unweighted, then one row per Poisson(1)
+    # bootstrap replicate drawn per unit (so within-unit correlation is kept).
+    rng = np.random.default_rng(seed)
+    totals = np.zeros((n_boot + 1, n_periods))
+    counts = np.zeros((n_boot + 1, n_periods))
+    if len(units) == 0:
+        return totals, counts
+    n_units = int(units.max()) + 1
+    order = np.argsort(units, kind="stable")
+    units, periods, y = units[order], periods[order], y[order]
+    bounds = np.searchsorted(units, np.arange(0, n_units + block_units, block_units))
+    for b, start in enumerate(range(0, n_units, block_units)):
+        rows = slice(bounds[b], bounds[b + 1])
+        u = units[rows] - start
+        size = min(block_units, n_units - start)
+        wide_y = np.zeros((size, n_periods))
+        wide_n = np.zeros((size, n_periods))
+        np.add.at(wide_y, (u, periods[rows]), y[rows])
+        np.add.at(wide_n, (u, periods[rows]), 1.0)
+        w = np.vstack([np.ones(size), rng.poisson(1.0, size=(n_boot, size))])
+        totals += w @ wide_y
+        counts += w @ wide_n
+    return totals, counts
+
+
+def adoption_periods(
+    df: pd.DataFrame,
+    unit_col: str,
+    time_col: str,
+    cohort_col: str | None = None,
+    treatment_col: str | None = None,
+    post_period_start: Any | None = None
+) -> pd.Series:
+    """
+    First treated period of each row's unit (NaN when never treated).
+
+    Taken from ``cohort_col`` (0 or inf also mean never treated), else
+    ``post_period_start`` for units with ``treatment_col`` == 1, else the
+    first period where the 0/1 ``treatment_col`` is 1.
+    """
+    if cohort_col is not None:
+        cohort = df[cohort_col]
+        if pd.api.types.is_numeric_dtype(cohort):
+            cohort = cohort.where(cohort.ne(0) & np.isfinite(cohort.astype(float)))
+        return cohort
+    if treatment_col is None:
+        raise ValueError("Provide cohort_col or treatment_col")
+    treated = df[treatment_col].astype(float) == 1
+    if post_period_start is not None:
+        ever = treated.groupby(df[unit_col]).transform("max").astype(bool)
+        return pd.Series(post_period_start, index=df.index).where(ever)
+    return df[time_col].where(treated).groupby(df[unit_col]).transform("min")
+
+
+class StaggeredDiD:
+    """
+    Staggered-adoption DiD in the style of Callaway & Sant'Anna (2021).
+
+    ATT(g, t) = [E(Y_t) - E(Y_base)]_cohort g - [E(Y_t) - E(Y_base)]_controls
+    for every adoption cohort g and period t, where base is the period before
+    g (t - 1 for pre-periods, giving placebo estimates). Controls are the
+    never-treated units or, with ``control_group="not_yet_treated"``, units
+    whose cohort starts after max(t, g).
+
+    Every cell is computed from per-cohort period sums and counts (a
+    repeated-cross-section form, so unbalanced panels are fine). The cohort
+    aggregates, together with a unit-level Poisson bootstrap of them, are
+    built on a process pool when ``n_jobs > 1``; cells and their event-time
+    and overall aggregations are then vectorized over cohorts, periods and
+    replicates.
+    """
+    def __init__(
+        self,
+        control_group: str = "never_treated",
+        n_boot: int = 199,
+        alpha: float = 0.05,
+        seed: int | None = 0,
+        n_jobs: int = 1,
+        block_units: int = 4096,
+    ):
+        if control_group not in ("never_treated", "not_yet_treated"):
+            raise ValueError(f"Unknown control_group: {control_group}")
+        self.control_group = control_group
+        self.n_boot = n_boot
+        self.alpha = alpha
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.block_units = block_units
+
+    @profiled("StaggeredDiD.fit")
+    def fit(self, df: pd.DataFrame,
+            unit_col: str,
+            time_col: str,
+            outcome_col: str,
+            cohort_col: str | None = None,
+            treatment_col: str | None = None) -> CausalResult:
+        """
+        ``cohort_col`` holds each unit's first treated period (0, NaN or inf when
+        never treated); alternatively ``treatment_col`` is a 0/1 indicator whose
+        first 1 per unit defines the cohort. Event time is counted in observed
+        periods. The overall effect averages the post-treatment cells weighted by
+        cohort size; SEs are bootstrap standard deviations.
+        """
+        with span("prepare"):
+            cohort = adoption_periods(df, unit_col, time_col, cohort_col, treatment_col)
+            period_codes, period_values = pd.factorize(df[time_col], sort=True)
+            units, _ = pd.factorize(df[unit_col])
+            y = df[outcome_col].to_numpy(dtype=float, na_value=np.nan)
+            keep = ~np.isnan(y) & (units >= 0) & (period_codes >= 0)
+            cohort_codes, cohort_values = pd.factorize(cohort, sort=True)
+            if pd.api.types.is_integer_dtype(period_values.dtype) and pd.api.types.is_float_dtype(cohort_values.dtype):
+                cohort_values = cohort_values.astype(period_values.dtype) # e.g. derived from treatment_col
+            never = cohort_codes < 0
+            n_periods = len(period_values)
+
+            # cohort position on the period axis; cohorts treated from the first period have no pre-period
+            starts = np.searchsorted(np.asarray(period_values), np.asarray(cohort_values))
+            dropped = [v for v, s in zip(cohort_values, starts, strict=True) if s == 0]
+            usable = np.flatnonzero(starts > 0)
+            if len(usable) == 0:
+                raise ValueError("No treated cohort with a pre-treatment period")
+            if self.control_group == "never_treated" and not (never & keep).any():
+                raise ValueError("No never-treated units; use control_group='not_yet_treated'")
+
+            # groups: usable cohorts in adoption order, then the never-treated
+            group = np.full(len(y), -1)
+            group[np.isin(cohort_codes, usable)] = np.searchsorted(usable, cohort_codes[np.isin(cohort_codes, usable)])
+            group[never] = len(usable)
+            keep &= group >= 0
+            group, units, periods, y = group[keep], units[keep], period_codes[keep], y[keep]
+
+        with span("cohort_aggregates"):
+            order = np.argsort(group, kind="stable")
+            group, units, periods, y = group[order], units[order], periods[order], y[order]
+            bounds = np.searchsorted(group, np.arange(len(usable) + 2))
+            seeds = np.random.SeedSequence(self.seed).spawn(len(usable) + 1)
+            args = []
+            for k in range(len(usable) + 1):
+                rows = slice(bounds[k], bounds[k + 1])
+                local = np.unique(units[rows], return_inverse=True)[1]
+                args.append((local, periods[rows], y[rows], n_periods, self.n_boot, seeds[k], self.block_units))
+            sizes = np.array([a[0].max() + 1 if len(a[0]) else 0 for a in args[:-1]], dtype=float)
+
+            if self.n_jobs > 1:
+                with ProcessPoolExecutor(max_workers=min(self.n_jobs, len(args))) as pool:
+                    parts = list(pool.map(_cohort_task, *zip(*args, strict=True)))
+            else:
+                parts = [_cohort_task(*a) for a in args]
+            totals = np.stack([p[0] for p in parts], axis=1) # (B + 1, groups, periods)
+            counts = np.stack([p[1] for p in parts], axis=1)
+
+        with span("group_time"):
+            result = self._group_time(totals, counts, starts[usable], sizes)
+
+        gt, event, overall = result
+        cohort_labels = [_plain(v) for v in cohort_values[usable]]
+        period_labels = [_plain(v) for v in period_values]
+        cells = [
+            {
+                "cohort": cohort_labels[k],
+                "period": period_labels[j],
+                "event_time": e,
+                "att": a,
+                "se": _finite(s),
+                "n_treated": int(sizes[k]),
+            }
+            for k, j, e, a, s in zip(*(x.tolist() for x in gt), strict=True)
+        ]
+        effect, se = overall
+        z = float(stats.norm.ppf(1 - self.alpha / 2))
+        has_se = np.isfinite(se) and se > 0
+        return CausalResult(
+            effect=effect,
+            ci_lower=effect - z * se if has_se else None,
+            ci_upper=effect + z * se if has_se else None,
+            p_value=float(2 * stats.norm.sf(abs(effect) / se)) if has_se else None,
+            method="Staggered DiD (Callaway-Sant'Anna)",
+            details={
+                "control_group": self.control_group,
+                "se": _finite(se),
+                "n_boot": self.n_boot,
+                "cohorts": {str(c): int(n) for c, n in zip(cohort_labels, sizes, strict=True)},
+                "dropped_cohorts": [_plain(v) for v in dropped],
+                "event_study": [
+                    {"event_time": int(e), "att": float(a), "se": _finite(s),
+                     "ci_lower": _finite(a - z * s), "ci_upper": _finite(a + z * s)}
+                    for e, a, s in zip(*event, strict=True)
+                ],
+                "group_time": cells,
             }
         )
 
+    def _group_time(self, totals: np.ndarray, counts: np.ndarray, starts: np.ndarray, sizes: np.ndarray):
+        # totals / counts: (B + 1, cohorts + never-treated, periods); row 0 is the point estimate
+        n_cohorts, n_periods = len(starts), totals.shape[2]
+
+        # every (cohort, period) cell with a base period: the period before
+        # adoption after it, the previous period before it (placebos)
+        k, j = np.meshgrid(np.arange(n_cohorts), np.arange(1, n_periods), indexing="ij")
+        k, j = k.ravel(), j.ravel()
+        base = np.where(j >= starts[k], starts[k] - 1, j - 1)
+
+        if self.control_group == "never_treated":
+            control_totals, control_counts = totals[:, -1:], counts[:, -1:]
+            first = np.zeros_like(k)
+        else:
+            # never-treated plus cohorts adopting after max(t, g): suffix sums over the adoption order
+            control_totals = np.cumsum(totals[:, ::-1], axis=1)[:, ::-1]
+            control_counts = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+            first = np.searchsorted(starts, np.maximum(j, starts[k]), side="right")
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = totals / counts
+            control_means = control_totals / control_counts
+            att = (means[:, k, j] - means[:, k, base]) - (control_means[:, first, j] - control_means[:, first, base])
+
+        valid = np.isfinite(att[0])
+        k, j, att = k[valid], j[valid], att[:, valid]
+        event = j - starts[k]
+        finite = np.isfinite(att)
+        att = np.where(finite, att, 0.0)
+
+        # event-time and overall effects: cohort-size weighted means of the cells, per replicate
+        times, slot = np.unique(event, return_inverse=True)
+        post = (event >= 0).astype(float)
+        onehot = sparse.csr_matrix((np.ones(len(slot)), (np.arange(len(slot)), slot)), shape=(len(slot), len(times)))
+        weights = sizes[k] * finite
+        with np.errstate(invalid="ignore", divide="ignore"):
+            by_event = np.asarray(((weights * att) @ onehot) / (weights @ onehot))
+            overall = (weights * att) @ post / (weights @ post)
+        if not np.isfinite(overall[0]):
+            raise ValueError("No post-treatment cells to aggregate")
+
+        def sd(x: np.ndarray) -> np.ndarray:
+            # bootstrap standard deviation over the replicates (rows 1..B)
+            if x.shape[0] < 3:
+                return np.full(x.shape[1:], np.nan)
+            return np.nanstd(x[1:], axis=0, ddof=1)
+
+        cell_se = sd(np.where(finite, att, np.nan))
+        return (
+            (k, j, event, att[0], cell_se),
+            (times, by_event[0], sd(by_event)),
+            (float(overall[0]), float(sd(overall[:, None])[0])),
+        )
+
+
+def _finite(x: float) -> float | None:
+    return float(x) if np.isfinite(x) else None
+
+
+def _plain(value: Any) -> Any:
+    # numpy / pandas scalars to JSON-friendly Python values
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if hasattr(value, "item") else value
+
+
+class EventStudy:
+    """
+    Dynamic TWFE event study: Y_it = a_i + l_t + sum_k beta_k 1[t - g_i = k] + e_it.
+
+    Relative time is counted in observed periods from each unit's adoption
+    period (see ``adoption_periods``); the ``reference`` period is omitted and
+    periods beyond ``leads`` / ``lags`` are binned into the endpoints. All
+    indicators are built in one vectorized pass, demeaned together with the
+    outcome and fitted in a single solve with unit-clustered SEs.
+    """
+    def __init__(self, leads: int = 4, lags: int = 4, reference: int = -1, alpha: float = 0.05,
+                 tol: float = 1e-10, max_iter: int = 1000):
+        if not -leads <= reference <= lags:
+            raise ValueError("reference must lie within [-leads, lags]")
+        self.leads = leads
+        self.lags = lags
+        self.reference = reference
+        self.alpha = alpha
+        self.tol = tol
+        self.max_iter = max_iter
+
+    @profiled("EventStudy.fit")
+    def fit(self, df: pd.DataFrame,
+            unit_col: str,
+            time_col: str,
+            outcome_col: str,
+            cohort_col: str | None = None,
+            treatment_col: str | None = None,
+            post_period_start: Any | None = None) -> CausalResult:
+        """
+        The effect is the mean of the lag coefficients (k >= 0); ``details['coefficients']``
+        holds the full path for plotting, with the reference period at 0, and
+        ``details['pre_trend_p_value']`` the joint F-test that all leads are zero.
+        """
+        with span("indicators"):
+            cohort = adoption_periods(df, unit_col, time_col, cohort_col, treatment_col, post_period_start)
+            periods, period_values = pd.factorize(df[time_col], sort=True)
+            cohort_codes, cohort_values = pd.factorize(cohort, sort=True)
+            starts = np.searchsorted(np.asarray(period_values), np.asarray(cohort_values))
+            units, _ = pd.factorize(df[unit_col])
+            y = df[outcome_col].to_numpy(dtype=float, na_value=np.nan)
+            keep = ~np.isnan(y) & (units >= 0) & (periods >= 0)
+
+            event_times = np.array([k for k in range(-self.leads, self.lags + 1) if k != self.reference])
+            y, units, periods, cohort_codes = y[keep], units[keep], periods[keep], cohort_codes[keep]
+            units = np.unique(units, return_inverse=True)[1]
+
+            # outcome in column 0, then one indicator per event time, filled in one scatter
+            treated = np.flatnonzero(cohort_codes >= 0)
+            rel = np.clip(periods[treated] - starts[cohort_codes[treated]], -self.leads, self.lags)
+            column = np.searchsorted(event_times, rel)
+            hit = event_times[np.minimum(column, len(event_times) - 1)] == rel # the reference period has no column
+            design = np.zeros((len(y), len(event_times) + 1))
+            design[:, 0] = y
+            design[treated[hit], column[hit] + 1] = 1.0
+            periods = np.unique(periods, return_inverse=True)[1]
+
+            present = np.concatenate([[True], design[:, 1:].any(axis=0)])
+            if not present[1:].any():
+                raise ValueError("No treated observations inside the event window")
+            if not present.all():
+                design, event_times = design[:, present], event_times[present[1:]]
+
+        with span("demean"):
+            within, iterations, converged = demean(design, [units, periods], self.tol, self.max_iter)
+            del design
+
+        with span("solve"):
+            n_periods = int(periods.max()) + 1
+            beta, vcov, n_clusters = clustered_ols(within[:, 1:], within[:, 0], units, absorbed=n_periods)
+
+        dof = n_clusters - 1
+        path = []
+        for k, b, v in zip(event_times.tolist(), beta, np.diag(vcov), strict=True):
+            se = float(np.sqrt(v))
+            ci_lower, ci_upper, p_value = _t_inference(float(b), se, dof, self.alpha)
+            path.append({"event_time": k, "coef": float(b), "se": _finite(se), "ci_lower": ci_lower,
+                         "ci_upper": ci_upper, "p_value": p_value})
+        path.append({"event_time": self.reference, "coef": 0.0, "se": None, "ci_lower": None,
+                     "ci_upper": None, "p_value": None})
+        path.sort(key=lambda row: row["event_time"])
+
+        pre_trend_p = None
+        lead = event_times < 0
+        if lead.any() and np.isfinite(vcov).all() and dof > 0:
+            b, v = beta[lead], vcov[np.ix_(lead, lead)]
+            f = float(b @ np.linalg.pinv(v) @ b) / lead.sum()
+            pre_trend_p = float(stats.f.sf(f, lead.sum(), dof))
+
+        post = (event_times >= 0).astype(float)
+        if not post.any():
+            raise ValueError("No post-treatment periods inside the event window")
+        post /= post.sum()
+        effect = float(post @ beta)
+        se = float(np.sqrt(post @ vcov @ post))
+        ci_lower, ci_upper, p_value = _t_inference(effect, se, dof, self.alpha)
+        return CausalResult(
+            effect=effect,
+            ci_lower=ci_lower,
+            ci_upper=ci_upper,
+            p_value=p_value,
+            method="Event Study (TWFE)",
+            details={
+                "coefficients": path,
+                "reference": self.reference,
+                "pre_trend_p_value": pre_trend_p,
+                "se": _finite(se),
+                "se_type": "cluster-robust (CR1) by unit",
+                "n_clusters": n_clusters,
+                "n_obs": int(len(y)),
+                "iterations": iterations,
+                "converged": converged,
+            }
+        )
+
+
+def project_simplex(v: np.ndarray) -> np.ndarray:
+    """Euclidean projection onto {w >= 0, sum(w) = 1} (sort-based, O(n log n))."""
+    u = np.sort(v)[::-1]
+    css = np.cumsum(u) - 1.0
+    rho = np.flatnonzero(u * np.arange(1, len(v) + 1) > css)[-1]
+    return np.maximum(v - css[rho] / (rho + 1.0), 0.0)
+
+
+def _active_set_polish(
+    x: np.ndarray, y: np.ndarray, w: np.ndarray, threshold: float, max_steps: int
+) -> tuple[np.ndarray, int, bool]:
+    # Primal active-set method started from a feasible w: solve the equality
+    # constrained least squares on the support through the small Gram block,
+    # step back to feasibility when a weight turns negative, and add the donor
+    # with the most negative reduced gradient until the KKT conditions hold.
+    w = w.copy()
+    support = np.flatnonzero(w > 0)
+    if len(support) > x.shape[0]:
+        # more donors than periods makes the KKT system singular: start from the largest weights
+        support = np.sort(support[np.argsort(w[support])[-x.shape[0]:]])
+        w = np.where(np.isin(np.arange(len(w)), support), w, 0.0)
+        w /= w.sum()
+    blocked = np.zeros(len(w), dtype=bool) # entering donors rejected at a degenerate (zero-length) step
+    gap = np.inf
+    for step in range(1, max_steps + 1):
+        xs = x[:, support]
+        k = len(support)
+        kkt = np.zeros((k + 1, k + 1))
+        kkt[:k, :k] = xs.T @ xs
+        kkt[:k, k] = kkt[k, :k] = 1.0
+        rhs = np.append(xs.T @ y, 1.0)
+        v = np.linalg.lstsq(kkt, rhs, rcond=None)[0][:k]
+
+        if (v < 0).any():
+            current = w[support]
+            falling = v < 0
+            alpha = np.min(current[falling] / (current[falling] - v[falling]))
+            if alpha <= 0:
+                # the donor just added would leave at once: drop it and try another
+                blocked[support[falling & (current <= 0)]] = True
+                support = support[~(falling & (current <= 0))]
+                continue
+            w[support] = current + alpha * (v - current)
+            w[w < 1e-15] = 0.0
+            w /= w.sum()
+            support = np.flatnonzero(w > 0)
+            blocked[:] = False
+            continue
+
+        w = np.zeros_like(w)
+        w[support] = v
+        g = x.T @ (x @ w - y)
+        gap = g @ w - g.min()
+        if gap <= threshold:
+            return w, step, True
+        candidates = np.setdiff1d(np.flatnonzero(~blocked), support)
+        if not len(candidates) or g[candidates].min() >= g @ w:
+            # no donor can lower the objective: optimal up to rounding unless some were blocked
+            return w, step, not blocked.any()
+        support = np.sort(np.append(support, candidates[np.argmin(g[candidates])]))
+    return w, max_steps, bool(gap <= threshold)
+
+
+def simplex_least_squares(
+    x: np.ndarray,
+    y: np.ndarray,
+    w0: np.ndarray | None = None,
+    tol: float = 1e-9,
+    max_iter: int = 1000,
+    check_every: int = 10
+) -> tuple[np.ndarray, int, bool]:
+    """
+    min ||y - x w||^2 subject to w >= 0, sum(w) = 1.
+
+    Accelerated projected gradient (FISTA with adaptive restart) finds the
+    approximate support: the gradient is taken through the Gram matrix x'x
+    when there are fewer donors than pre-periods and through x otherwise, so
+    an iteration costs O(min(T, J) * J), with the step size from the largest
+    eigenvalue of the smaller Gram matrix. Once the support stops changing
+    (or after ``max_iter`` iterations) a primal active-set method finishes
+    exactly, solving KKT systems of at most about T + 1 donors. Projection and the active set
+    keep weights exactly zero, so the solution is sparse. ``w0`` warm-starts
+    the solver.
+
+    With many donors the minimizer is usually not unique, so convergence is
+    judged on the objective: the Frank-Wolfe duality gap (an upper bound on
+    the distance to the optimum) must fall below ``tol * |y|^2``.
+    Returns (weights, iterations, converged), counting both phases.
+    """
+    n_periods, n_donors = x.shape
+    use_gram = n_donors <= n_periods
+    gram = x.T @ x if use_gram else x @ x.T
+    lipschitz = float(np.linalg.eigvalsh(gram)[-1]) if gram.size else 0.0
+    if lipschitz <= 0:
+        return np.full(n_donors, 1.0 / n_donors), 0, True
+    xty = x.T @ y
+
+    def gradient(w: np.ndarray) -> np.ndarray:
+        return gram @ w - xty if use_gram else x.T @ (x @ w) - xty
+
+    threshold = tol * max(float(y @ y), 1.0)
+    w = project_simplex(np.asarray(w0, dtype=float)) if w0 is not None else np.full(n_donors, 1.0 / n_donors)
+    z, t = w.copy(), 1.0
+    support = None
+    iteration = 0
+    while iteration < max_iter:
+        iteration += 1
+        w_next = project_simplex(z - gradient(z) / lipschitz)
+        step = w_next - w
+        if iteration % check_every == 0 or not step.any():
+            g = gradient(w_next)
+            if g @ w_next - g.min() <= threshold:
+                return w_next, iteration, True
+            previous, support = support, w_next > 0
+            if previous is not None and (previous == support).all() and support.sum() <= n_periods:
+                # the support has settled: the active set finishes faster than projected gradient
+                w = w_next
+                break
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        if np.dot(z - w_next, step) > 0:
+            # momentum is pointing uphill: restart from the current iterate
+            z, t_next = w_next.copy(), 1.0
+        else:
+            z = w_next + (t - 1) / t_next * step
+        w, t = w_next, t_next
+
+    w, steps, converged = _active_set_polish(x, y, w, threshold, max_steps=2 * n_donors)
+    return w, iteration + steps, converged
+
+
 class SyntheticControl:
     """
-    Implements Synthetic Control Method (SCM) using Lasso/Ridge/LinearRegression 
-    to construct a synthetic counterfactual.
+    Implements the Synthetic Control Method (SCM).
+
+    The default ``method="simplex"`` fits convex donor weights (non-negative,
+    summing to one) with ``simplex_least_squares``; ``"ridge"``, ``"lasso"``
+    and ``"ols"`` fit an unconstrained linear regression instead.
     """
-    def __init__(self, method: str = "ridge"):
+    def __init__(self, method: str = "simplex", tol: float = 1e-9, max_iter: int = 1000):
+        self.method = method
+        self.tol = tol
+        self.max_iter = max_iter
+        self.weights_: pd.Series | None = None # last simplex fit, reused by warm_start
         if method == "lasso":
             self.model = Lasso(alpha=0.1)
         elif method == "ols":
             self.model = LinearRegression()
+        elif method == "simplex":
+            self.model = None
         else:
             self.model = Ridge(alpha=1.0)
-            
+
+    @profiled("SyntheticControl.fit")
     def fit(self, df: pd.DataFrame,
             unit_col: str,
             time_col: str,
             outcome_col: str,
             treated_unit: str,
-            intervention_time: Any) -> CausalResult:
+            intervention_time: Any,
+            warm_start: bool = False,
+            initial_weights: dict[Any, float] | None = None) -> CausalResult:
         """
         Constructs a synthetic control for the treated unit using other units.
+
+        With ``method="simplex"`` the solver starts from ``initial_weights``
+        (donor -> weight) or, with ``warm_start``, from the previous fit's
+        weights, e.g. when refitting on a shifted window; donors without a
+        starting weight start at zero. ``details['weights']`` only lists
+        donors with a non-zero weight.
         """
         # Pivot data to wide format: Index=Time, Columns=Units, Values=Outcome
-        pivoted = df.pivot(index=time_col, columns=unit_col, values=outcome_col)
+        with span("pivot"):
+            pivoted = df.pivot(index=time_col, columns=unit_col, values=outcome_col)
         
         # Split into pre-intervention and post-intervention
         pre_period = pivoted.index < intervention_time
@@ -102,25 +852,63 @@ class SyntheticControl:
         # Training data (Pre-intervention)
         X_train = pivoted.loc[pre_period].drop(columns=[treated_unit])
         y_train = pivoted.loc[pre_period, treated_unit]
-        
-        # Fit model to learn weights of control units
-        self.model.fit(X_train, y_train)
-        
-        # Predict counterfactual for the treated unit (Post-intervention)
         X_post = pivoted.loc[post_period].drop(columns=[treated_unit])
         y_post_actual = pivoted.loc[post_period, treated_unit]
-        y_post_synthetic = self.model.predict(X_post)
-        
-        # Average Treatment Effect on the Treated (ATT)
-        att = (y_post_actual - y_post_synthetic).mean()
-        
+
+        if self.model is not None:
+            # Fit model to learn weights of control units
+            with span("fit_weights"):
+                self.model.fit(X_train, y_train)
+
+            # Predict counterfactual for the treated unit (Post-intervention)
+            y_post_synthetic = self.model.predict(X_post)
+            att = (y_post_actual - y_post_synthetic).mean()
+            return CausalResult(
+                effect=att,
+                method="Synthetic Control Method",
+                details={
+                    "weights": dict(zip(X_train.columns, self.model.coef_, strict=False)),
+                    "actual_post": y_post_actual.tolist(),
+                    "synthetic_post": y_post_synthetic.tolist()
+                }
+            )
+
+        # Donors need a complete pre-period; the treated unit's missing periods are skipped
+        donors = X_train.columns[X_train.notna().all(axis=0).to_numpy()]
+        rows = y_train.notna().to_numpy()
+        if len(donors) == 0 or not rows.any():
+            raise ValueError("No donor with a complete pre-intervention series")
+        x = X_train.loc[rows, donors].to_numpy(dtype=float)
+        y = y_train.to_numpy(dtype=float)[rows]
+
+        start = initial_weights
+        if start is None and warm_start and self.weights_ is not None:
+            start = self.weights_.to_dict()
+        w0 = None
+        if start is not None:
+            w0 = pd.Series(start, dtype=float).reindex(donors).fillna(0.0).to_numpy()
+            if w0.sum() <= 0:
+                w0 = None
+
+        with span("fit_weights"):
+            w, iterations, converged = simplex_least_squares(x, y, w0, self.tol, self.max_iter)
+        weights = pd.Series(w, index=donors)
+        self.weights_ = weights
+
+        y_post_synthetic = X_post[donors].to_numpy(dtype=float) @ w
+        att = float(np.nanmean(y_post_actual.to_numpy(dtype=float) - y_post_synthetic))
+        pre_rmspe = float(np.sqrt(np.mean((y - x @ w) ** 2)))
         return CausalResult(
             effect=att,
             method="Synthetic Control Method",
             details={
-                "weights": dict(zip(X_train.columns, self.model.coef_, strict=False)),
+                "weights": {_plain(k): float(v) for k, v in weights[weights > 0].sort_values(ascending=False).items()},
                 "actual_post": y_post_actual.tolist(),
-                "synthetic_post": y_post_synthetic.tolist()
+                "synthetic_post": y_post_synthetic.tolist(),
+                "pre_rmspe": pre_rmspe,
+                "n_donors": int(len(donors)),
+                "iterations": iterations,
+                "converged": converged,
             }
         )
 
@@ -136,6 +924,7 @@ class HTELearner:
         self.m0 = model_class()
         self.m1 = model_class()
         
+    @profiled("HTELearner.fit_predict")
     def fit_predict(self, df: pd.DataFrame,
                    feature_cols: list[str],
                    treatment_col: str,
@@ -148,11 +937,14 @@ class HTELearner:
             raise ValueError("Both treatment and control groups must be present")
             
         # Train models
-        self.m0.fit(control_df[feature_cols], control_df[outcome_col])
-        self.m1.fit(treated_df[feature_cols], treated_df[outcome_col])
+        with span("fit_control"):
+            self.m0.fit(control_df[feature_cols], control_df[outcome_col])
+        with span("fit_treated"):
+            self.m1.fit(treated_df[feature_cols], treated_df[outcome_col])
         
         # Predict CATE for all units
-        cate_pred = self.m1.predict(df[feature_cols]) - self.m0.predict(df[feature_cols])
+        with span("predict"):
+            cate_pred = self.m1.predict(df[feature_cols]) - self.m0.predict(df[feature_cols])
         
         result_df = df.copy()
         result_df['cate'] = cate_pred
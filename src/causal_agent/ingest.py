@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from typing import IO
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import BaseModel
+
+from .profiling import profiled
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc", ".arrows")
+
+
+def file_format(filename: str | None) -> str:
+    """One of "parquet", "arrow", "xlsx" or "csv" (the default), from the file extension."""
+    name = (filename or "").lower()
+    if name.endswith(PARQUET_SUFFIXES):
+        return "parquet"
+    if name.endswith(ARROW_SUFFIXES):
+        return "arrow"
+    if name.endswith(".xlsx"):
+        return "xlsx"
+    return "csv"
+
+
+def _wanted(columns: Iterable[str | None] | None) -> list[str] | None:
+    # Keeps the caller's order, drops unset optional columns and duplicates
+    if columns is None:
+        return None
+    return list(dict.fromkeys(c for c in columns if c))
+
+
+def _present(available: list[str], wanted: list[str] | None) -> list[str] | None:
+    # Absent optional columns (e.g. a covariate) are skipped, as with CSV usecols
+    return wanted if wanted is None else [c for c in wanted if c in available]
+
+
+def _arrow_batches(source: IO[bytes]) -> tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+    # Arrow IPC file (Feather v2) or, failing that, the streaming format
+    source.seek(0)
+    try:
+        reader = pa.ipc.open_file(source)
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        return reader.schema, iter(reader)
+
+
+def _is_text(t: pa.DataType) -> bool:
+    return pa.types.is_string(t) or pa.types.is_large_string(t) or pa.types.is_string_view(t)
+
+
+def _as_dictionary(col: pa.Array | pa.ChunkedArray) -> pa.Array | pa.ChunkedArray:
+    # Labels are compared with form values, so they are always strings, as when parsing CSV
+    if pa.types.is_dictionary(col.type):
+        if _is_text(col.type.value_type):
+            return col
+        col = col.cast(col.type.value_type)
+    if not _is_text(col.type):
+        col = col.cast(pa.string())
+    return col.dictionary_encode()
+
+
+def _to_pandas(table: pa.Table | pa.RecordBatch, categorical: list[str]) -> pd.DataFrame:
+    # Dictionary-encoded columns come out as pandas categoricals
+    if categorical:
+        arrays = [
+            _as_dictionary(col) if name in categorical else col
+            for name, col in zip(table.column_names, table.columns, strict=True)
+        ]
+        table = pa.Table.from_arrays(arrays, names=table.column_names)
+    return table.to_pandas()
+
+
+@profiled("read_table")
+def read_table(
+    source: IO[bytes],
+    fmt: str,
+    columns: Iterable[str | None] | None = None,
+    categorical: Iterable[str | None] = (),
+    nrows: int | None = None,
+) -> pd.DataFrame:
+    """
+    Reads an uploaded CSV, XLSX, Parquet or Arrow IPC file into a frame.
+
+    Only ``columns`` are read (all when None). Parquet and CSV project columns
+    while parsing; Arrow IPC selects them from the record batches. Columns in
+    ``categorical`` (variant, segment) are read dictionary-encoded and become
+    pandas categoricals. ``nrows`` limits the rows read, e.g. for previews.
+    """
+    wanted = _wanted(columns)
+    cats = [c for c in _wanted(categorical) or [] if wanted is None or c in wanted]
+
+    if fmt == "parquet":
+        source.seek(0)
+        pf = pq.ParquetFile(source, read_dictionary=cats)
+        wanted = _present(pf.schema_arrow.names, wanted)
+        if nrows is not None:
+            batch = next(pf.iter_batches(batch_size=max(1, nrows), columns=wanted), None)
+            table = pa.Table.from_batches([batch]) if batch is not None else pf.schema_arrow.empty_table()
+            return _to_pandas(table.slice(0, nrows), cats)
+        return _to_pandas(pf.read(columns=wanted), cats)
+
+    if fmt == "arrow":
+        schema, batches = _arrow_batches(source)
+        wanted = _present(schema.names, wanted) or schema.names
+        selected = []
+        for batch in batches:
+            selected.append(batch.select(wanted))
+            if nrows is not None and sum(b.num_rows for b in selected) >= nrows:
+                break
+        table = pa.Table.from_batches(selected, schema=pa.schema([schema.field(c) for c in wanted]))
+        return _to_pandas(table.slice(0, nrows) if nrows is not None else table, cats)
+
+    source.seek(0)
+    usecols = (lambda c: c in wanted) if wanted is not None else None
+    if fmt == "xlsx":
+        df = pd.read_excel(source, usecols=usecols, nrows=nrows)
+        for c in cats:
+            if c in df.columns:
+                df[c] = df[c].astype("string").astype("category")
+        return df
+    return pd.read_csv(source, usecols=usecols, nrows=nrows, dtype={c: "category" for c in cats})
+
+
+def iter_table_chunks(
+    source: IO[bytes],
+    fmt: str,
+    columns: Iterable[str | None] | None = None,
+    categorical: Iterable[str | None] = (),
+    chunksize: int = 200_000,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields ``read_table`` results in chunks of about ``chunksize`` rows.
+
+    Parquet is read batch by batch and Arrow IPC record batch by record batch,
+    so memory is bounded by the chunk size rather than the file. XLSX has no
+    streaming reader and is yielded as a single chunk.
+    """
+    wanted = _wanted(columns)
+    cats = [c for c in _wanted(categorical) or [] if wanted is None or c in wanted]
+    chunksize = max(1, chunksize)
+
+    if fmt == "parquet":
+        source.seek(0)
+        pf = pq.ParquetFile(source, read_dictionary=cats)
+        wanted = _present(pf.schema_arrow.names, wanted)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=wanted):
+            yield _to_pandas(batch, cats)
+    elif fmt == "arrow":
+        schema, batches = _arrow_batches(source)
+        wanted = _present(schema.names, wanted) or schema.names
+        for batch in batches:
+            batch = batch.select(wanted)
+            for start in range(0, batch.num_rows, chunksize):
+                yield _to_pandas(batch.slice(start, chunksize), cats)
+    elif fmt == "xlsx":
+        yield read_table(source, fmt, wanted, cats)
+    else:
+        source.seek(0)
+        usecols = (lambda c: c in wanted) if wanted is not None else None
+        yield from pd.read_csv(source, usecols=usecols, chunksize=chunksize, dtype={c: "category" for c in cats})
+
+
+
+class CompactionReport(BaseModel):
+    bytes_before: int
+    bytes_after: int
+    bytes_saved: int
+    changes: dict[str, str] # column -> "old dtype -> new dtype"
+
+
+def _compact_column(s: pd.Series, max_category_ratio: float) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(s.dtype):
+        return s
+    if pd.api.types.is_object_dtype(s.dtype) or pd.api.types.is_string_dtype(s.dtype):
+        if s.nunique(dropna=True) <= max(1, max_category_ratio * len(s)):
+            return s.astype("category")
+        return s
+    if not pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_extension_array_dtype(s.dtype):
+        return s
+
+    values = s.to_numpy()
+    if pd.api.types.is_integer_dtype(s.dtype):
+        # signed only, so differences (e.g. relative event time) cannot wrap around
+        return pd.to_numeric(s, downcast="integer")
+    # float: 0/1 flags become int8, other values float32 when the round trip is exact
+    finite = values[~np.isnan(values)]
+    if len(finite) == len(values) and np.isin(finite, (0.0, 1.0)).all():
+        return s.astype("int8")
+    if s.dtype == np.float64:
+        narrow = values.astype(np.float32)
+        with np.errstate(over="ignore", invalid="ignore"):
+            exact = (narrow.astype(np.float64) == values) | np.isnan(values)
+        if exact.all():
+            return s.astype("float32")
+    return s
+
+
+def compact_dtypes(df: pd.DataFrame, max_category_ratio: float = 0.5) -> tuple[pd.DataFrame, CompactionReport]:
+    """
+    Shrinks a freshly parsed frame without changing any value.
+
+    Strings with at most ``max_category_ratio * len(df)`` distinct values become
+    categoricals, integers are downcast to the smallest signed type, 0/1 float
+    columns (binary metrics) become int8 and other floats become float32 when
+    that is lossless. Returns the compacted frame and a memory report.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    out = df.copy(deep=False)
+    changes = {}
+    for col in df.columns:
+        compacted = _compact_column(df[col], max_category_ratio)
+        if compacted.dtype != df[col].dtype:
+            out[col] = compacted
+            changes[str(col)] = f"{df[col].dtype} -> {compacted.dtype}"
+    after = int(out.memory_usage(deep=True).sum())
+    return out, CompactionReport(bytes_before=before, bytes_after=after, bytes_saved=before - after, changes=changes)
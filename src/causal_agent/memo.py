@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Protocol, TypeVar
+
+from pydantic import BaseModel
+
+Model = TypeVar("Model", bound=BaseModel)
+
+
+class ResultStore(Protocol):
+    """Optional second tier behind ``ResultCache`` (e.g. a SQL table)."""
+
+    def load(self, key: str) -> str | None: ...
+
+    def save(self, key: str, payload: str) -> None: ...
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    store_hits: int # misses in memory answered by the persistent store
+    evictions: int
+    entries: int
+    bytes: int
+    max_bytes: int
+
+
+def normalize_params(params: Any) -> Any:
+    """Canonical form of request parameters: unset values dropped, enums by value, strings stripped."""
+    if isinstance(params, dict):
+        return {str(k): normalize_params(v) for k, v in sorted(params.items(), key=lambda kv: str(kv[0])) if v is not None}
+    if isinstance(params, (list, tuple)):
+        return [normalize_params(v) for v in params]
+    if isinstance(params, Enum):
+        return params.value
+    if isinstance(params, str):
+        return params.strip()
+    return params
+
+
+def result_key(kind: str, dataset_hash: str, params: dict[str, Any]) -> str:
+    """Cache key for ``kind`` (e.g. "experiment", "did") of one dataset with the given parameters."""
+    payload = json.dumps(
+        {"kind": kind, "dataset": dataset_hash, "params": normalize_params(params)}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    LRU cache of serialized analysis results, bounded by ``max_bytes``.
+
+    Results are stored as JSON, so cached objects are never shared or mutated
+    between requests. With a ``store`` every result is also persisted and
+    memory misses fall back to it.
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20, store: ResultStore | None = None):
+        self.max_bytes = max_bytes
+        self.store = store
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+        self.evictions = 0
+
+    def _insert(self, key: str, payload: str) -> None:
+        # caller holds the lock
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key))
+        if len(payload) > self.max_bytes:
+            return
+        self._entries[key] = payload
+        self._bytes += len(payload)
+        while self._bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= len(old)
+            self.evictions += 1
+
+    def get(self, key: str, model: type[Model]) -> Model | None:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return model.model_validate_json(payload)
+
+        payload = self.store.load(key) if self.store is not None else None
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.store_hits += 1
+            self._insert(key, payload)
+        return model.model_validate_json(payload)
+
+    def put(self, key: str, result: BaseModel) -> None:
+        payload = result.model_dump_json()
+        with self._lock:
+            self._insert(key, payload)
+        if self.store is not None:
+            self.store.save(key, payload)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                store_hits=self.store_hits,
+                evictions=self.evictions,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+            )
+
+    def clear(self) -> None:
+        """Empties the in-memory tier (the store is left as is)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
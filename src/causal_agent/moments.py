@@ -0,0 +1,571 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, fields
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _safe_div(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    # Element-wise num / den with NaN where den == 0 (empty groups).
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    out = np.full(np.broadcast(num, den).shape, np.nan)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+def _expand(obj, index: np.ndarray, k: int):
+    # Scatters a per-group dataclass of arrays into k slots (missing groups are empty)
+    values = {}
+    for f in fields(obj):
+        arr = getattr(obj, f.name)
+        out = np.zeros((k,) + arr.shape[1:], dtype=arr.dtype)
+        out[index] = arr
+        values[f.name] = out
+    return type(obj)(**values)
+
+
+@dataclass
+class Moments:
+    """
+    Per-group count, sum and centred second moment of one column.
+
+    All fields are arrays aligned with the owning group labels. Centred second
+    moments (rather than raw sums of squares) keep the variance numerically
+    stable, and groups or chunks combine exactly via Chan's parallel formula.
+    """
+    n: np.ndarray
+    total: np.ndarray
+    m2: np.ndarray
+
+    @property
+    def mean(self) -> np.ndarray:
+        return _safe_div(self.total, self.n)
+
+    @property
+    def var(self) -> np.ndarray:
+        # Sample variance (ddof=1), NaN for groups with fewer than two values
+        return _safe_div(self.m2, np.where(self.n > 1, self.n - 1, 0))
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.var)
+
+    def merge(self, other: Moments) -> Moments:
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        cross = np.nan_to_num(delta * delta * _safe_div(self.n * other.n, n))
+        return Moments(
+            n=n,
+            total=self.total + other.total,
+            m2=self.m2 + other.m2 + cross,
+        )
+
+    def pooled(self) -> Moments:
+        """Collapses all groups into a single-element Moments."""
+        n = self.n.sum()
+        total = self.total.sum()
+        mean = total / n if n else np.nan
+        between = np.nansum(self.n * (self.mean - mean) ** 2)
+        return Moments(
+            n=np.array([n]),
+            total=np.array([total]),
+            m2=np.array([self.m2.sum() + between]),
+        )
+
+
+@dataclass
+class CoMoments:
+    """
+    Per-group joint moments of a metric ``y`` and a covariate ``x``.
+
+    Only rows where both values are present contribute, which is the row set
+    CUPED operates on.
+    """
+    n: np.ndarray
+    total_y: np.ndarray
+    total_x: np.ndarray
+    m2_y: np.ndarray
+    m2_x: np.ndarray
+    c_xy: np.ndarray
+
+    @property
+    def mean_y(self) -> np.ndarray:
+        return _safe_div(self.total_y, self.n)
+
+    @property
+    def mean_x(self) -> np.ndarray:
+        return _safe_div(self.total_x, self.n)
+
+    def merge(self, other: CoMoments) -> CoMoments:
+        n = self.n + other.n
+        w = _safe_div(self.n * other.n, n)
+        dy = other.mean_y - self.mean_y
+        dx = other.mean_x - self.mean_x
+        return CoMoments(
+            n=n,
+            total_y=self.total_y + other.total_y,
+            total_x=self.total_x + other.total_x,
+            m2_y=self.m2_y + other.m2_y + np.nan_to_num(dy * dy * w),
+            m2_x=self.m2_x + other.m2_x + np.nan_to_num(dx * dx * w),
+            c_xy=self.c_xy + other.c_xy + np.nan_to_num(dx * dy * w),
+        )
+
+    def pooled(self) -> CoMoments:
+        n = self.n.sum()
+        my = self.total_y.sum() / n if n else np.nan
+        mx = self.total_x.sum() / n if n else np.nan
+        dy = self.mean_y - my
+        dx = self.mean_x - mx
+        return CoMoments(
+            n=np.array([n]),
+            total_y=np.array([self.total_y.sum()]),
+            total_x=np.array([self.total_x.sum()]),
+            m2_y=np.array([self.m2_y.sum() + np.nansum(self.n * dy * dy)]),
+            m2_x=np.array([self.m2_x.sum() + np.nansum(self.n * dx * dx)]),
+            c_xy=np.array([self.c_xy.sum() + np.nansum(self.n * dx * dy)]),
+        )
+
+
+@dataclass
+class GramMoments:
+    """
+    Per-group joint moments of a metric ``y`` and p covariates ``x``.
+
+    ``total_x`` is (groups, p), ``sxx`` the centred Gram matrices (groups, p, p)
+    and ``sxy`` the centred cross-products (groups, p). This is the
+    multi-covariate generalisation of ``CoMoments``; only rows where the metric
+    and every covariate are present contribute.
+    """
+    n: np.ndarray
+    total_y: np.ndarray
+    total_x: np.ndarray
+    m2_y: np.ndarray
+    sxx: np.ndarray
+    sxy: np.ndarray
+
+    @classmethod
+    def from_comoments(cls, c: CoMoments) -> GramMoments:
+        return cls(
+            n=c.n,
+            total_y=c.total_y,
+            total_x=c.total_x[:, None],
+            m2_y=c.m2_y,
+            sxx=c.m2_x[:, None, None],
+            sxy=c.c_xy[:, None],
+        )
+
+    @property
+    def mean_y(self) -> np.ndarray:
+        return _safe_div(self.total_y, self.n)
+
+    @property
+    def mean_x(self) -> np.ndarray:
+        return _safe_div(self.total_x, self.n[:, None])
+
+    def merge(self, other: GramMoments) -> GramMoments:
+        n = self.n + other.n
+        w = _safe_div(self.n * other.n, n)
+        dy = np.nan_to_num(other.mean_y - self.mean_y)
+        dx = np.nan_to_num(other.mean_x - self.mean_x)
+        return GramMoments(
+            n=n,
+            total_y=self.total_y + other.total_y,
+            total_x=self.total_x + other.total_x,
+            m2_y=self.m2_y + other.m2_y + np.nan_to_num(dy * dy * w),
+            sxx=self.sxx + other.sxx + np.nan_to_num(dx[:, :, None] * dx[:, None, :] * w[:, None, None]),
+            sxy=self.sxy + other.sxy + np.nan_to_num(dx * (dy * w)[:, None]),
+        )
+
+    def pooled(self) -> GramMoments:
+        n = self.n.sum()
+        my = self.total_y.sum() / n if n else np.nan
+        mx = self.total_x.sum(axis=0) / n if n else np.full(self.total_x.shape[1], np.nan)
+        dy = np.nan_to_num(self.mean_y - my)
+        dx = np.nan_to_num(self.mean_x - mx)
+        return GramMoments(
+            n=np.array([n]),
+            total_y=np.array([self.total_y.sum()]),
+            total_x=self.total_x.sum(axis=0)[None, :],
+            m2_y=np.array([self.m2_y.sum() + np.sum(self.n * dy * dy)]),
+            sxx=(self.sxx.sum(axis=0) + np.einsum("k,ki,kj->ij", self.n, dx, dx))[None],
+            sxy=(self.sxy.sum(axis=0) + np.einsum("k,ki,k->i", self.n, dx, dy))[None],
+        )
+
+
+@dataclass
+class VariantStats:
+    """
+    Sufficient statistics for one metric, grouped by variant.
+
+    ``n_rows`` counts every row assigned to a variant (used for SRM and sample
+    size), ``metric`` covers the non-missing metric values and ``paired`` the
+    rows where both metric and covariate(s) are present (``GramMoments`` when
+    several covariates are used).
+    """
+    labels: list[Any]
+    n_rows: np.ndarray
+    metric: Moments
+    paired: CoMoments | GramMoments | None = None
+
+    def merge(self, other: VariantStats) -> VariantStats:
+        """Combines statistics from two disjoint row sets (e.g. consecutive chunks)."""
+        if (self.paired is None) != (other.paired is None):
+            raise ValueError("Cannot merge statistics with and without a covariate")
+
+        labels = list(self.labels)
+        position = {label: i for i, label in enumerate(labels)}
+        for label in other.labels:
+            if label not in position:
+                position[label] = len(labels)
+                labels.append(label)
+        k = len(labels)
+        ours = np.arange(len(self.labels))
+        theirs = np.array([position[label] for label in other.labels], dtype=int)
+
+        n_rows = np.zeros(k, dtype=np.int64)
+        n_rows[ours] += self.n_rows
+        n_rows[theirs] += other.n_rows
+        metric = _expand(self.metric, ours, k).merge(_expand(other.metric, theirs, k))
+        paired = None
+        if self.paired is not None:
+            paired = _expand(self.paired, ours, k).merge(_expand(other.paired, theirs, k))
+        return VariantStats(labels=labels, n_rows=n_rows, metric=metric, paired=paired)
+
+    def reorder(self, labels: list[Any]) -> VariantStats:
+        """The same statistics with variants in the order of ``labels`` (a permutation of ``self.labels``)."""
+        position = {label: i for i, label in enumerate(labels)}
+        index = np.array([position[label] for label in self.labels], dtype=int)
+        k = len(labels)
+        n_rows = np.zeros(k, dtype=np.int64)
+        n_rows[index] = self.n_rows
+        paired = _expand(self.paired, index, k) if self.paired is not None else None
+        return VariantStats(labels=list(labels), n_rows=n_rows, metric=_expand(self.metric, index, k), paired=paired)
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-friendly representation (labels are stored as strings)."""
+        def arrays(obj):
+            return {f.name: getattr(obj, f.name).tolist() for f in fields(obj)}
+
+        return {
+            "labels": [str(label) for label in self.labels],
+            "n_rows": self.n_rows.tolist(),
+            "metric": arrays(self.metric),
+            "paired": arrays(self.paired) if self.paired is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> VariantStats:
+        def arrays(kind, values):
+            return kind(**{
+                name: np.asarray(v, dtype=np.int64 if name == "n" else float) for name, v in values.items()
+            })
+
+        return cls(
+            labels=list(data["labels"]),
+            n_rows=np.asarray(data["n_rows"], dtype=np.int64),
+            metric=arrays(Moments, data["metric"]),
+            paired=(
+                arrays(GramMoments if "sxx" in data["paired"] else CoMoments, data["paired"])
+                if data.get("paired") else None
+            ),
+        )
+
+
+@dataclass
+class SegmentStats:
+    """
+    Per-(segment, variant) statistics for one segment column.
+
+    ``n_rows`` and the ``metric`` arrays are shaped (segments, variants).
+    """
+    segments: list[Any]
+    variants: list[Any]
+    n_rows: np.ndarray
+    metric: Moments
+
+
+def _group_moments(codes: np.ndarray, values: np.ndarray, k: int) -> Moments:
+    n = np.bincount(codes, minlength=k)
+    total = np.bincount(codes, weights=values, minlength=k)
+    dev = values - _safe_div(total, n)[codes]
+    m2 = np.bincount(codes, weights=dev * dev, minlength=k)
+    return Moments(n=n, total=total, m2=m2)
+
+
+def _group_comoments(codes: np.ndarray, y: np.ndarray, x: np.ndarray, k: int) -> CoMoments:
+    n = np.bincount(codes, minlength=k)
+    total_y = np.bincount(codes, weights=y, minlength=k)
+    total_x = np.bincount(codes, weights=x, minlength=k)
+    dy = y - _safe_div(total_y, n)[codes]
+    dx = x - _safe_div(total_x, n)[codes]
+    return CoMoments(
+        n=n,
+        total_y=total_y,
+        total_x=total_x,
+        m2_y=np.bincount(codes, weights=dy * dy, minlength=k),
+        m2_x=np.bincount(codes, weights=dx * dx, minlength=k),
+        c_xy=np.bincount(codes, weights=dx * dy, minlength=k),
+    )
+
+
+def _group_gram(codes: np.ndarray, y: np.ndarray, x: np.ndarray, k: int) -> GramMoments:
+    n = np.bincount(codes, minlength=k)
+    total_y = np.bincount(codes, weights=y, minlength=k)
+    total_x = np.column_stack([np.bincount(codes, weights=x[:, j], minlength=k) for j in range(x.shape[1])])
+    dy = y - _safe_div(total_y, n)[codes]
+    dx = x - _safe_div(total_x, n[:, None])[codes]
+    # p(p+1)/2 bincounts over pairs of covariates; p is small
+    p = x.shape[1]
+    sxx = np.zeros((k, p, p))
+    for i in range(p):
+        for j in range(i, p):
+            sxx[:, i, j] = sxx[:, j, i] = np.bincount(codes, weights=dx[:, i] * dx[:, j], minlength=k)
+    sxy = np.column_stack([np.bincount(codes, weights=dx[:, j] * dy, minlength=k) for j in range(p)])
+    return GramMoments(
+        n=n,
+        total_y=total_y,
+        total_x=total_x,
+        m2_y=np.bincount(codes, weights=dy * dy, minlength=k),
+        sxx=sxx,
+        sxy=sxy,
+    )
+
+
+def _as_float(series: pd.Series) -> np.ndarray:
+    return series.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _covariate_values(df: pd.DataFrame, covariate) -> np.ndarray:
+    # A column name, or precomputed values such as CUPAC model predictions
+    if isinstance(covariate, str):
+        return _as_float(df[covariate])
+    values = np.asarray(covariate, dtype=float)
+    if values.shape != (len(df),):
+        raise ValueError("Covariate values must have one entry per row")
+    return values
+
+
+def covariate_matrix(df: pd.DataFrame, covariates: str | list) -> np.ndarray:
+    """(rows, p) float matrix of one or several covariates (names or per-row values)."""
+    covariates = covariates if isinstance(covariates, list) else [covariates]
+    return np.column_stack([_covariate_values(df, c) for c in covariates])
+
+
+def compute_variant_stats(
+    df: pd.DataFrame,
+    variant_col: str,
+    metric_col: str,
+    covariate_col: str | list | None = None,
+) -> VariantStats:
+    """
+    Computes per-variant sufficient statistics in a single grouped pass.
+
+    Variants are factorized once and every statistic is accumulated with
+    ``np.bincount``, so the cost is O(N) regardless of the number of arms and
+    no per-variant copy of the frame is made. Labels keep first-appearance
+    order; rows with a missing variant are ignored.
+
+    ``covariate_col`` may be a list of covariates (column names or per-row
+    arrays), in which case ``paired`` holds ``GramMoments``.
+    """
+    codes, uniques = pd.factorize(df[variant_col], sort=False)
+    k = len(uniques)
+    assigned = codes >= 0
+
+    y = _as_float(df[metric_col])
+    n_rows = np.bincount(codes[assigned], minlength=k)
+
+    has_y = assigned & ~np.isnan(y)
+    metric = _group_moments(codes[has_y], y[has_y], k)
+
+    paired = None
+    if isinstance(covariate_col, list):
+        x = covariate_matrix(df, covariate_col)
+        both = has_y & ~np.isnan(x).any(axis=1)
+        paired = _group_gram(codes[both], y[both], x[both], k)
+    elif covariate_col is not None:
+        x = _as_float(df[covariate_col])
+        both = has_y & ~np.isnan(x)
+        paired = _group_comoments(codes[both], y[both], x[both], k)
+
+    return VariantStats(labels=list(uniques), n_rows=n_rows, metric=metric, paired=paired)
+
+
+def compute_metric_stats(
+    df: pd.DataFrame,
+    variant_col: str,
+    metric_cols: list[str],
+    covariate_cols: list[str | None] | None = None,
+    block_size: int = 16,
+) -> list[VariantStats]:
+    """
+    Computes ``VariantStats`` for many metrics over one shared variant partition.
+
+    Variants are factorized once into a sparse (variants x rows) indicator
+    matrix G; per-variant counts, sums and centred second moments for a block
+    of metric columns are then ``G @ values`` matrix products. Metrics are
+    processed ``block_size`` columns at a time to bound temporary memory.
+    ``covariate_cols`` optionally gives one CUPED covariate per metric.
+    """
+    codes, uniques = pd.factorize(df[variant_col], sort=False)
+    k = len(uniques)
+    rows = np.flatnonzero(codes >= 0)
+    group = sparse.csr_matrix((np.ones(len(rows)), (codes[rows], rows)), shape=(k, len(df)))
+    n_rows = np.bincount(codes[rows], minlength=k)
+    covariate_cols = covariate_cols or [None] * len(metric_cols)
+
+    def block_moments(values: np.ndarray, present: np.ndarray):
+        n = np.rint(group @ present.astype(float)).astype(np.int64)
+        total = group @ np.where(present, values, 0.0)
+        return n, total
+
+    out: list[VariantStats] = []
+    for start in range(0, len(metric_cols), block_size):
+        cols = metric_cols[start:start + block_size]
+        covs = covariate_cols[start:start + block_size]
+
+        y = np.column_stack([_as_float(df[c]) for c in cols])
+        has_y = ~np.isnan(y)
+        n, total = block_moments(y, has_y)
+        dev = np.where(has_y, y - _safe_div(total, n)[codes], 0.0)
+        m2 = group @ (dev * dev)
+
+        paired: dict[int, CoMoments] = {}
+        with_cov = [j for j, cov in enumerate(covs) if cov is not None]
+        if with_cov:
+            x = np.column_stack([_as_float(df[covs[j]]) for j in with_cov])
+            yp = y[:, with_cov]
+            both = has_y[:, with_cov] & ~np.isnan(x)
+            n_p, total_y = block_moments(yp, both)
+            _, total_x = block_moments(x, both)
+            dy = np.where(both, yp - _safe_div(total_y, n_p)[codes], 0.0)
+            dx = np.where(both, x - _safe_div(total_x, n_p)[codes], 0.0)
+            m2_y, m2_x, c_xy = group @ (dy * dy), group @ (dx * dx), group @ (dx * dy)
+            for i, j in enumerate(with_cov):
+                paired[j] = CoMoments(
+                    n=n_p[:, i], total_y=total_y[:, i], total_x=total_x[:, i],
+                    m2_y=m2_y[:, i], m2_x=m2_x[:, i], c_xy=c_xy[:, i],
+                )
+
+        for j in range(len(cols)):
+            out.append(VariantStats(
+                labels=list(uniques),
+                n_rows=n_rows,
+                metric=Moments(n=n[:, j], total=total[:, j], m2=m2[:, j]),
+                paired=paired.get(j),
+            ))
+    return out
+
+
+def compute_segment_stats(
+    df: pd.DataFrame,
+    segment_cols: list[str],
+    variant_col: str,
+    metric_col: str,
+) -> dict[str, SegmentStats]:
+    """
+    Computes (segment, variant) statistics for several segment columns.
+
+    Variants and the metric are converted once; each segment column then costs
+    one factorize plus bincounts over the combined (segment, variant) code.
+    """
+    var_codes, variants = pd.factorize(df[variant_col], sort=False)
+    v = len(variants)
+    y = _as_float(df[metric_col])
+    has_y = ~np.isnan(y)
+
+    out = {}
+    for seg_col in segment_cols:
+        seg_codes, segments = pd.factorize(df[seg_col], sort=False)
+        s = len(segments)
+        keep = (seg_codes >= 0) & (var_codes >= 0)
+        codes = seg_codes * v + var_codes
+        n_rows = np.bincount(codes[keep], minlength=s * v).reshape(s, v)
+        both = keep & has_y
+        flat = _group_moments(codes[both], y[both], s * v)
+        metric = Moments(
+            n=flat.n.reshape(s, v),
+            total=flat.total.reshape(s, v),
+            m2=flat.m2.reshape(s, v),
+        )
+        out[seg_col] = SegmentStats(segments=list(segments), variants=list(variants), n_rows=n_rows, metric=metric)
+    return out
+
+
+def accumulate_variant_stats(
+    chunks: Iterable[pd.DataFrame],
+    variant_col: str,
+    metric_col: str,
+    covariate_col: str | None = None,
+) -> VariantStats:
+    """
+    Folds an iterable of row chunks into one ``VariantStats``.
+
+    Each chunk is reduced to per-variant moments and merged into the running
+    total, so memory is bounded by the chunk size plus O(variants).
+    """
+    result = None
+    for chunk in chunks:
+        part = compute_variant_stats(chunk, variant_col, metric_col, covariate_col)
+        result = part if result is None else result.merge(part)
+    if result is None:
+        empty = Moments(n=np.zeros(0, dtype=np.int64), total=np.zeros(0), m2=np.zeros(0))
+        result = VariantStats(labels=[], n_rows=np.zeros(0, dtype=np.int64), metric=empty)
+    return result
+
+
+def accumulate_metric_stats(
+    chunks: Iterable[pd.DataFrame],
+    variant_col: str,
+    metric_cols: list[str],
+    covariate_cols: list[str | None] | None = None,
+) -> list[VariantStats]:
+    """Chunked counterpart of ``compute_metric_stats`` (one merged result per metric)."""
+    result = None
+    for chunk in chunks:
+        parts = compute_metric_stats(chunk, variant_col, metric_cols, covariate_cols)
+        result = parts if result is None else [a.merge(b) for a, b in zip(result, parts, strict=True)]
+    return result or []
+
+
+def variant_stats_from_sums(
+    labels: list[Any],
+    n: np.ndarray,
+    total: np.ndarray,
+    total_sq: np.ndarray,
+    n_rows: np.ndarray | None = None,
+    total_x: np.ndarray | None = None,
+    total_x_sq: np.ndarray | None = None,
+    total_xy: np.ndarray | None = None,
+) -> VariantStats:
+    """
+    Builds ``VariantStats`` from raw power sums (count, sum, sum of squares).
+
+    This is the shape warehouses usually aggregate to. Covariate sums are
+    optional and, when given, are assumed to cover the same ``n`` rows.
+    """
+    n = np.asarray(n, dtype=np.int64)
+    total = np.asarray(total, dtype=float)
+    total_sq = np.asarray(total_sq, dtype=float)
+    m2 = np.maximum(np.nan_to_num(total_sq - _safe_div(total * total, n)), 0.0)
+    metric = Moments(n=n, total=total, m2=m2)
+
+    paired = None
+    if total_x is not None and total_x_sq is not None and total_xy is not None:
+        total_x = np.asarray(total_x, dtype=float)
+        paired = CoMoments(
+            n=n,
+            total_y=total,
+            total_x=total_x,
+            m2_y=m2,
+            m2_x=np.maximum(np.nan_to_num(np.asarray(total_x_sq, dtype=float) - _safe_div(total_x * total_x, n)), 0.0),
+            c_xy=np.nan_to_num(np.asarray(total_xy, dtype=float) - _safe_div(total_x * total, n)),
+        )
+
+    n_rows = n.copy() if n_rows is None else np.asarray(n_rows, dtype=np.int64)
+    return VariantStats(labels=list(labels), n_rows=n_rows, metric=metric, paired=paired)
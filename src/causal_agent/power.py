@@ -4,6 +4,7 @@ import math
 
 from scipy.stats import norm
 
+from .profiling import profiled
 from .schemas import MetricType, PowerRequest, PowerResult
 
 
@@ -13,6 +14,7 @@ def _clamp(p: float) -> float:
     return min(max(p, eps), 1.0 - eps)
 
 
+@profiled("calculate_sample_size")
 def calculate_sample_size(req: PowerRequest) -> PowerResult:
     """Calculate required sample size per group with support for Continuous metrics and CUPED."""
     
@@ -21,7 +23,8 @@ def calculate_sample_size(req: PowerRequest) -> PowerResult:
     z_beta = float(norm.ppf(req.power))
     
     # Variance calculation
-    if req.metric_type == MetricType.CONTINUOUS:
+    # Ratio metrics plan like continuous ones, with the delta-method (linearized) std_dev
+    if req.metric_type != MetricType.BINARY:
         if req.std_dev is None:
             # Fallback or error if std_dev is missing for continuous
             # For now, let's assume std_dev = baseline_rate (mean) as a rough heuristic if not provided,
@@ -99,6 +102,7 @@ def ztest_n_per_group(*, baseline_rate: float, mde_abs: float, alpha: float = 0.
     return two_proportion_sample_size(req)
 
 
+@profiled("simulate_power_two_proportion")
 def simulate_power_two_proportion(n_per_group: int, baseline_rate: float, mde_abs: float, alpha: float = 0.05, iters: int = 1000, seed: int | None = None, two_sided: bool = True) -> float:
     """Monte-carlo simulate empirical power for two-proportion z-test.
 
@@ -0,0 +1,208 @@
+"""
+Opt-in profiling for the analysis, causal and power engines.
+
+Stages are recorded only inside ``profile()`` (or with the
+``CAUSAL_AGENT_PROFILE`` environment variable set); otherwise ``span`` and
+``profiled`` only cost a context-variable (and environment) lookup.
+
+    with profile(attach=True) as prof:
+        result = analyze_experiment(df, ...)
+    prof.report()   # also on result.profile / CausalResult.details["profile"]
+
+``CAUSAL_AGENT_PROFILE=1`` profiles every top-level call and attaches the
+report; a comma-separated value may add ``cprofile`` and/or ``memory``.
+"""
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+
+ENV_VAR = "CAUSAL_AGENT_PROFILE"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class StageTiming(BaseModel):
+    name: str # nested stages are joined with "/"
+    seconds: float
+    calls: int
+    peak_mb: float | None = None # with memory=True: peak allocated above the stage's starting point
+
+
+class ProfileReport(BaseModel):
+    total_seconds: float
+    stages: list[StageTiming]
+    cprofile: str | None = None # top functions by cumulative time
+
+
+@dataclass
+class _Frame:
+    name: str
+    start: float
+    mem_start: int = 0
+    mem_peak: int = 0
+
+
+@dataclass
+class Profiler:
+    cprofile: bool = False
+    memory: bool = False
+    attach: bool = False
+    stages: dict[str, StageTiming] = field(default_factory=dict)
+    _stack: list[_Frame] = field(default_factory=list)
+    _profile: cProfile.Profile | None = None
+    _started_tracemalloc: bool = False
+    _start: float = 0.0
+    _total: float | None = None
+
+    def _fold_peak(self) -> None:
+        # tracemalloc keeps a single peak, so fold it into every open frame before resetting it
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._stack:
+            frame.mem_peak = max(frame.mem_peak, peak)
+        tracemalloc.reset_peak()
+
+    def _enter(self, name: str) -> None:
+        frame = _Frame(name=name, start=time.perf_counter())
+        if self.memory:
+            self._fold_peak()
+            frame.mem_start = frame.mem_peak = tracemalloc.get_traced_memory()[0]
+        self._stack.append(frame)
+
+    def _exit(self) -> None:
+        if self.memory:
+            self._fold_peak()
+        path = "/".join(f.name for f in self._stack)
+        frame = self._stack.pop()
+        elapsed = time.perf_counter() - frame.start
+        peak = (frame.mem_peak - frame.mem_start) / 2**20 if self.memory else None
+        stage = self.stages.get(path)
+        if stage is None:
+            self.stages[path] = StageTiming(name=path, seconds=elapsed, calls=1, peak_mb=peak)
+        else:
+            stage.seconds += elapsed
+            stage.calls += 1
+            if peak is not None:
+                stage.peak_mb = max(stage.peak_mb or 0.0, peak)
+
+    def start(self) -> None:
+        self._start = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self) -> None:
+        if self._profile is not None:
+            self._profile.disable()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self._total = time.perf_counter() - self._start
+
+    def report(self, top: int = 25) -> ProfileReport:
+        cprofile_text = None
+        if self._profile is not None:
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(top)
+            cprofile_text = out.getvalue()
+        total = self._total if self._total is not None else time.perf_counter() - self._start
+        stages = [s.model_copy() for s in self.stages.values()]
+        return ProfileReport(total_seconds=total, stages=stages, cprofile=cprofile_text)
+
+
+_active: ContextVar[Profiler | None] = ContextVar("causal_agent_profiler", default=None)
+
+
+@contextmanager
+def profile(cprofile: bool = False, memory: bool = False, attach: bool = False) -> Iterator[Profiler]:
+    """
+    Records named stages of every profiled call made inside the block.
+
+    ``cprofile`` adds a cProfile listing and ``memory`` per-stage tracemalloc
+    peaks (both slow the code down). With ``attach`` each top-level result
+    carries the report collected so far.
+    """
+    prof = Profiler(cprofile=cprofile, memory=memory, attach=attach)
+    token = _active.set(prof)
+    prof.start()
+    try:
+        yield prof
+    finally:
+        prof.stop()
+        _active.reset(token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times the block as stage ``name`` when profiling is active."""
+    prof = _active.get()
+    if prof is None:
+        yield
+        return
+    prof._enter(name)
+    try:
+        yield
+    finally:
+        prof._exit()
+
+
+def _env_options() -> dict[str, bool] | None:
+    value = os.environ.get(ENV_VAR, "").strip().lower()
+    if value in ("", "0", "false", "no", "off"):
+        return None
+    flags = {v.strip() for v in value.split(",")}
+    return {"cprofile": "cprofile" in flags, "memory": "memory" in flags}
+
+
+def attach_report(result: Any, report: ProfileReport) -> Any:
+    """Stores ``report`` on ``ExperimentAnalysis.profile``, ``CausalResult.details`` or ``DataFrame.attrs``."""
+    if isinstance(getattr(result, "details", None), dict):
+        result.details["profile"] = report.model_dump()
+    elif isinstance(result, BaseModel) and "profile" in type(result).model_fields:
+        result.profile = report
+    elif isinstance(getattr(result, "attrs", None), dict):
+        result.attrs["profile"] = report.model_dump()
+    return result
+
+
+def profiled(name: str) -> Callable[[F], F]:
+    """
+    Decorator recording the call as stage ``name``.
+
+    Outside ``profile()`` the call runs unprofiled unless ``CAUSAL_AGENT_PROFILE``
+    is set, in which case it is profiled on its own and the report attached.
+    """
+    def decorator(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            prof = _active.get()
+            if prof is None:
+                options = _env_options()
+                if options is None:
+                    return fn(*args, **kwargs)
+                with profile(attach=True, **options):
+                    return wrapper(*args, **kwargs)
+
+            top_level = not prof._stack
+            with span(name):
+                result = fn(*args, **kwargs)
+            if prof.attach and top_level:
+                attach_report(result, prof.report())
+            return result
+        return wrapper  # type: ignore[return-value]
+    return decorator
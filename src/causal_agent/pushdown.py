@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .analysis import (
+    Allocation,
+    ExperimentAnalysis,
+    _ratio_stats,
+    analyze_variant_stats,
+    expected_split,
+    fit_cuped,
+    srm_p_value,
+    srm_series_from_counts,
+)
+from .causal import CausalResult, did_from_cells
+from .ingest import file_format, iter_table_chunks
+from .moments import CoMoments, GramMoments, Moments, VariantStats
+from .schemas import AnalysisType, MetricType
+
+SOURCE = "source_data"
+
+
+def _ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _connect(path: str | Path):
+    """In-memory DuckDB connection with the file exposed as the ``source_data`` view."""
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("The DuckDB backend needs the optional 'duckdb' package") from e
+
+    path = str(path)
+    con = duckdb.connect()
+    literal = "'" + path.replace("'", "''") + "'"
+    fmt = file_format(path)
+    if fmt == "parquet":
+        con.execute(f"CREATE VIEW {SOURCE} AS SELECT * FROM read_parquet({literal})")
+    elif fmt == "csv":
+        con.execute(f"CREATE VIEW {SOURCE} AS SELECT * FROM read_csv({literal})")
+    elif fmt == "arrow":
+        # Arrow IPC (e.g. the dataset registry cache) is scanned lazily through pyarrow
+        import pyarrow.dataset as ds
+        con.register(SOURCE, ds.dataset(path, format="ipc"))
+    else:
+        raise ValueError(f"The DuckDB backend reads CSV, Parquet or Arrow files, not {fmt}")
+    return con
+
+
+def _columns(con) -> list[str]:
+    return [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {SOURCE}").fetchall()]
+
+
+def _num(name: str) -> str:
+    # NaN is treated as missing, as in the pandas path
+    return f"NULLIF(CAST({_ident(name)} AS DOUBLE), 'NaN'::DOUBLE)"
+
+
+def _variant_stats_query(variant_col: str, metric_col: str, covariates: list[str]) -> str:
+    xs = [f"x{j}" for j in range(len(covariates))]
+    select = [f"CAST({_ident(variant_col)} AS VARCHAR) AS v", f"{_num(metric_col)} AS y"]
+    select += [f"{_num(c)} AS {x}" for c, x in zip(covariates, xs, strict=True)]
+
+    aggregates = [
+        "count(*) AS n_rows",
+        "count(y) AS n",
+        "coalesce(sum(y), 0) AS total",
+        "coalesce(var_pop(y) * count(y), 0) AS m2",
+    ]
+    if xs:
+        both = "FILTER (WHERE " + " AND ".join(["y IS NOT NULL"] + [f"{x} IS NOT NULL" for x in xs]) + ")"
+        pn = f"count(*) {both}"
+        aggregates += [
+            f"{pn} AS p_n",
+            f"coalesce(sum(y) {both}, 0) AS p_total_y",
+            f"coalesce(var_pop(y) {both} * {pn}, 0) AS p_m2_y",
+        ]
+        for i, xi in enumerate(xs):
+            aggregates.append(f"coalesce(sum({xi}) {both}, 0) AS p_total_x{i}")
+            aggregates.append(f"coalesce(covar_pop({xi}, y) {both} * {pn}, 0) AS p_sxy{i}")
+            for j in range(i, len(xs)):
+                aggregates.append(f"coalesce(covar_pop({xi}, {xs[j]}) {both} * {pn}, 0) AS p_sxx{i}_{j}")
+
+    return (
+        f"WITH src AS (SELECT {', '.join(select)} FROM {SOURCE} WHERE {_ident(variant_col)} IS NOT NULL) "
+        f"SELECT v, {', '.join(aggregates)} FROM src GROUP BY v ORDER BY v"
+    )
+
+
+def sql_variant_stats(
+    path: str | Path,
+    variant_col: str,
+    metric_col: str,
+    covariate_col: str | list[str] | None = None,
+) -> VariantStats:
+    """
+    ``compute_variant_stats`` evaluated inside DuckDB over a CSV, Parquet or Arrow file.
+
+    Only the per-variant aggregate result is fetched, so the file is never
+    loaded into pandas. Labels are strings in order of first appearance, as
+    in the pandas path. Covariates missing from the file are skipped, as in
+    ``analyze_experiment``.
+    """
+    con = _connect(path)
+    try:
+        return _sql_variant_stats(con, path, variant_col, metric_col, covariate_col)
+    finally:
+        con.close()
+
+
+def _appearance_order(path: str | Path, variant_col: str, labels: list[str], chunksize: int = 200_000) -> list[str]:
+    # GROUP BY loses the row order, so the variant column alone is read in chunks
+    # until every label has been seen (normally within the first chunk).
+    remaining = set(labels)
+    order = []
+    with open(path, "rb") as source:
+        for chunk in iter_table_chunks(source, file_format(str(path)), [variant_col], [variant_col], chunksize):
+            for label in pd.unique(chunk[variant_col].dropna()):
+                if str(label) in remaining:
+                    order.append(str(label))
+                    remaining.discard(str(label))
+            if not remaining:
+                break
+    return order + sorted(remaining)
+
+
+def _sql_variant_stats(
+    con, path: str | Path, variant_col: str, metric_col: str, covariate_col: str | list[str] | None
+) -> VariantStats:
+    columns = _columns(con)
+    names = [covariate_col] if isinstance(covariate_col, str) else list(covariate_col or [])
+    covariates = [c for c in names if c in columns]
+    agg = con.execute(_variant_stats_query(variant_col, metric_col, covariates)).fetchdf()
+
+    def col(name: str, dtype=float) -> np.ndarray:
+        return agg[name].to_numpy(dtype=dtype)
+
+    metric = Moments(n=col("n", np.int64), total=col("total"), m2=col("m2"))
+    paired = None
+    p = len(covariates)
+    if p:
+        total_x = np.column_stack([col(f"p_total_x{i}") for i in range(p)])
+        sxx = np.zeros((len(agg), p, p))
+        for i in range(p):
+            for j in range(i, p):
+                sxx[:, i, j] = sxx[:, j, i] = col(f"p_sxx{i}_{j}")
+        gram = GramMoments(
+            n=col("p_n", np.int64),
+            total_y=col("p_total_y"),
+            total_x=total_x,
+            m2_y=col("p_m2_y"),
+            sxx=sxx,
+            sxy=np.column_stack([col(f"p_sxy{i}") for i in range(p)]),
+        )
+        paired = gram
+        if isinstance(covariate_col, str):
+            paired = CoMoments(
+                n=gram.n, total_y=gram.total_y, total_x=total_x[:, 0], m2_y=gram.m2_y,
+                m2_x=sxx[:, 0, 0], c_xy=gram.sxy[:, 0],
+            )
+    stats_ = VariantStats(labels=agg["v"].tolist(), n_rows=col("n_rows", np.int64), metric=metric, paired=paired)
+    return stats_.reorder(_appearance_order(path, variant_col, stats_.labels))
+
+
+def _sql_daily_counts(con, variant_col: str, timestamp_col: str) -> pd.DataFrame:
+    counts = con.execute(
+        f"SELECT date_trunc('day', CAST({_ident(timestamp_col)} AS TIMESTAMP)) AS day, "
+        f"CAST({_ident(variant_col)} AS VARCHAR) AS v, count(*) AS n FROM {SOURCE} "
+        f"WHERE {_ident(variant_col)} IS NOT NULL AND {_ident(timestamp_col)} IS NOT NULL GROUP BY ALL"
+    ).fetchdf()
+    return counts.pivot(index="day", columns="v", values="n").fillna(0)
+
+
+def analyze_experiment_sql(
+    path: str | Path,
+    metric_col: str,
+    variant_col: str,
+    metric_type: MetricType,
+    control_label: str,
+    covariate_col: str | list[str] | None = None,
+    analysis_type: AnalysisType = AnalysisType.FREQUENTIST,
+    bayesian_method: str = "quadrature",
+    seed: int | None = None,
+    denominator_col: str | None = None,
+    allocation: Allocation = None,
+    timestamp_col: str | None = None
+) -> ExperimentAnalysis:
+    """
+    DuckDB counterpart of ``analyze_experiment`` for files larger than memory.
+
+    The sufficient statistics (and the daily SRM counts) are compiled into
+    SQL and aggregated out of core; the result model is rebuilt from the small
+    aggregate with the same code as the pandas path.
+    """
+    con = _connect(path)
+    try:
+        options = dict(bayesian_method=bayesian_method, seed=seed, allocation=allocation)
+        if metric_type == MetricType.RATIO:
+            if not denominator_col:
+                raise ValueError("Ratio metrics require denominator_col")
+            stats_ = _ratio_stats(_sql_variant_stats(con, path, variant_col, metric_col, denominator_col))
+            result = analyze_variant_stats(stats_, metric_type, control_label, analysis_type, **options)
+        else:
+            stats_ = _sql_variant_stats(con, path, variant_col, metric_col, covariate_col)
+            fit = None
+            if stats_.paired is not None:
+                names = [covariate_col] if isinstance(covariate_col, str) else [c for c in covariate_col if c in _columns(con)]
+                fit = fit_cuped(stats_.paired, names)
+            result = analyze_variant_stats(stats_, metric_type, control_label, analysis_type, cuped_fit=fit, **options)
+
+        if timestamp_col:
+            counts = _sql_daily_counts(con, variant_col, timestamp_col)
+            result.srm_series = srm_series_from_counts(counts, control_label, allocation)
+        return result
+    finally:
+        con.close()
+
+
+def check_srm_sql(
+    path: str | Path,
+    variant_col: str,
+    allocation: Allocation = None,
+    control_label: str | None = None
+) -> float:
+    """``check_srm`` evaluated inside DuckDB."""
+    con = _connect(path)
+    try:
+        counts = con.execute(
+            f"SELECT CAST({_ident(variant_col)} AS VARCHAR) AS v, count(*) AS n FROM {SOURCE} "
+            f"WHERE {_ident(variant_col)} IS NOT NULL GROUP BY v ORDER BY v"
+        ).fetchdf()
+    finally:
+        con.close()
+    weights = expected_split(counts["v"].tolist(), control_label, allocation)
+    return srm_p_value(counts["n"].to_numpy(), weights)
+
+
+def did_sql(
+    path: str | Path,
+    unit_col: str,
+    time_col: str,
+    treatment_col: str,
+    outcome_col: str,
+    post_period_start: Any
+) -> CausalResult:
+    """
+    2x2 Difference-in-Differences from unit x (treated, post) cell aggregates.
+
+    Only one row per unit and cell leaves DuckDB; the estimate and its
+    unit-clustered standard error come from ``did_from_cells``.
+    """
+    con = _connect(path)
+    try:
+        cells = con.execute(
+            f"SELECT {_ident(unit_col)} AS unit, CAST({_ident(treatment_col)} AS DOUBLE) AS treat, "
+            f"{_ident(time_col)} >= ? AS post, count(*) AS n, sum({_num(outcome_col)}) AS total "
+            f"FROM {SOURCE} WHERE {_num(outcome_col)} IS NOT NULL AND {_ident(unit_col)} IS NOT NULL GROUP BY ALL",
+            [post_period_start],
+        ).fetchdf()
+    finally:
+        con.close()
+
+    if set(cells["treat"]) - {0.0, 1.0}:
+        raise ValueError(f"{treatment_col} must be a 0/1 indicator")
+    cluster, _ = pd.factorize(cells["unit"])
+    return did_from_cells(
+        cluster,
+        cells["treat"].to_numpy(),
+        cells["post"].to_numpy(dtype=float),
+        cells["n"].to_numpy(dtype=float),
+        cells["total"].to_numpy(dtype=float),
+    )
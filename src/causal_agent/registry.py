@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import IO
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pydantic import BaseModel
+
+from .ingest import CompactionReport, compact_dtypes, file_format, iter_table_chunks, read_table
+
+
+class DatasetInfo(BaseModel):
+    dataset_id: str
+    filename: str | None
+    n_rows: int
+    columns: list[str]
+    size_bytes: int
+    compaction: CompactionReport | None = None # in-memory savings from dtype compaction
+
+
+def content_hash(source: IO[bytes], block_size: int = 1 << 20) -> str:
+    """SHA-256 of the stream contents, read in blocks; the stream is rewound."""
+    digest = hashlib.sha256()
+    source.seek(0)
+    for block in iter(lambda: source.read(block_size), b""):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+class DatasetRegistry:
+    """
+    Upload-once cache of parsed datasets keyed by content hash.
+
+    Each dataset is dtype-compacted (see ``compact_dtypes``) and stored as an
+    uncompressed Arrow IPC (Feather v2) file read back through a memory map,
+    so later analyses skip parsing and only touch the pages of the columns
+    they select. Files are evicted least recently used first once the cache
+    exceeds ``max_bytes``.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int = 2 << 30):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _data_path(self, dataset_id: str) -> Path:
+        if not dataset_id.isalnum():
+            raise ValueError(f"Invalid dataset_id: {dataset_id}")
+        return self.root / f"{dataset_id}.arrow"
+
+    def _meta_path(self, dataset_id: str) -> Path:
+        return self.root / f"{dataset_id}.json"
+
+    def _touch(self, path: Path) -> None:
+        # mtime doubles as the LRU clock
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def register(self, source: IO[bytes], filename: str | None = None) -> DatasetInfo:
+        """Parses ``source`` once and caches it; re-uploads of the same bytes return the cached entry."""
+        dataset_id = content_hash(source)[:32]
+        path = self._data_path(dataset_id)
+        if path.exists() and self._meta_path(dataset_id).exists():
+            self._touch(path)
+            return self.info(dataset_id)
+
+        df, report = compact_dtypes(read_table(source, file_format(filename)))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        # uncompressed so the file can be memory-mapped without decoding
+        feather.write_feather(table, tmp, compression="uncompressed")
+        info = DatasetInfo(
+            dataset_id=dataset_id,
+            filename=filename,
+            n_rows=table.num_rows,
+            columns=[str(c) for c in table.column_names],
+            size_bytes=tmp.stat().st_size,
+            compaction=report,
+        )
+        self._meta_path(dataset_id).write_text(info.model_dump_json())
+        os.replace(tmp, path)
+        self.evict(keep=dataset_id)
+        return info
+
+    def info(self, dataset_id: str) -> DatasetInfo:
+        meta = self._meta_path(dataset_id)
+        if not self._data_path(dataset_id).exists() or not meta.exists():
+            raise ValueError(f"Unknown dataset_id: {dataset_id}")
+        return DatasetInfo.model_validate(json.loads(meta.read_text()))
+
+    def path(self, dataset_id: str) -> Path:
+        """Location of the cached Arrow IPC file (e.g. for the DuckDB backend)."""
+        path = self._data_path(dataset_id)
+        if not path.exists():
+            raise ValueError(f"Unknown dataset_id: {dataset_id}")
+        self._touch(path)
+        return path
+
+    def _open(self, dataset_id: str) -> pa.MemoryMappedFile:
+        return pa.memory_map(str(self.path(dataset_id)))
+
+    def read(
+        self,
+        dataset_id: str,
+        columns: Iterable[str | None] | None = None,
+        categorical: Iterable[str | None] = (),
+    ) -> pd.DataFrame:
+        """The cached dataset restricted to ``columns``, read through a memory map."""
+        with self._open(dataset_id) as source:
+            return read_table(source, "arrow", columns, categorical)
+
+    def iter_chunks(
+        self,
+        dataset_id: str,
+        columns: Iterable[str | None] | None = None,
+        categorical: Iterable[str | None] = (),
+        chunksize: int = 200_000,
+    ) -> Iterator[pd.DataFrame]:
+        with self._open(dataset_id) as source:
+            yield from iter_table_chunks(source, "arrow", columns, categorical, chunksize)
+
+    def evict(self, keep: str | None = None) -> list[str]:
+        """Deletes least recently used datasets until the cache fits in ``max_bytes``."""
+        with self._lock:
+            files = sorted(self.root.glob("*.arrow"), key=lambda p: p.stat().st_mtime)
+            total = sum(p.stat().st_size for p in files)
+            evicted = []
+            for path in files:
+                if total <= self.max_bytes:
+                    break
+                if path.stem == keep:
+                    continue
+                total -= path.stat().st_size
+                path.unlink(missing_ok=True)
+                self._meta_path(path.stem).unlink(missing_ok=True)
+                evicted.append(path.stem)
+            return evicted
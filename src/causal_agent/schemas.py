@@ -8,11 +8,19 @@ from pydantic import BaseModel, Field, model_validator
 class MetricType(str, Enum):
     BINARY = "binary"
     CONTINUOUS = "continuous"
+    RATIO = "ratio" # sum(numerator) / sum(denominator) per randomization unit
 
 class AnalysisType(str, Enum):
     FREQUENTIST = "frequentist"
     BAYESIAN = "bayesian"
 
+class MetricSpec(BaseModel):
+    """One metric of a multi-metric scorecard."""
+    column: str
+    metric_type: MetricType = MetricType.CONTINUOUS
+    covariate_col: str | None = Field(None, description="Pre-period covariate for CUPED")
+    denominator_col: str | None = Field(None, description="Denominator column for ratio metrics")
+
 class PowerRequest(BaseModel):
     baseline_rate: float = Field(..., description="Baseline conversion rate p0 (or mean for continuous)")
     mde_abs: float = Field(..., gt=0.0, description="Minimum detectable effect (absolute)")
@@ -88,3 +96,48 @@ class ExperimentInputs(BaseModel):
 class ExperimentSpec(BaseModel):
     inputs: ExperimentInputs
     plan: ExperimentPlan
+
+
+class VariantSummary(BaseModel):
+    """Pre-aggregated sufficient statistics for one variant (optionally within one segment)."""
+    variant: str
+    segment: str | None = Field(None, description="Segment value these aggregates belong to, if any")
+    n: int = Field(..., ge=0, description="Number of non-missing metric values")
+    sum: float = Field(..., description="Sum of the metric")
+    sum_sq: float | None = Field(None, description="Sum of squared metric values (optional for binary metrics)")
+    n_rows: int | None = Field(None, ge=0, description="Units assigned, if different from n (used for SRM)")
+    sum_x: float | None = Field(None, description="Sum of the CUPED covariate (or ratio denominator) over the same units")
+    sum_x_sq: float | None = None
+    sum_xy: float | None = None
+
+
+class SummaryAnalysisRequest(BaseModel):
+    metric_type: MetricType = MetricType.BINARY
+    analysis_type: AnalysisType = AnalysisType.FREQUENTIST
+    control_label: str
+    bayesian_method: str = Field("quadrature", description="quadrature or monte_carlo")
+    seed: int | None = Field(None, description="Seed for the Monte Carlo path")
+    variants: list[VariantSummary] = Field(..., min_length=1)
+
+
+class BatchExperiment(BaseModel):
+    """One experiment of a batch analysis; the data is a local file or a registered dataset."""
+    experiment_id: str
+    path: str | None = Field(None, description="CSV, XLSX, Parquet or Arrow file on the worker's disk")
+    dataset_id: str | None = Field(None, description="Dataset registered through /datasets")
+    metric_col: str
+    variant_col: str
+    metric_type: MetricType = MetricType.CONTINUOUS
+    control_label: str
+    covariate_col: str | list[str] | None = None
+    denominator_col: str | None = None
+    analysis_type: AnalysisType = AnalysisType.FREQUENTIST
+    bayesian_method: str = "quadrature"
+    seed: int | None = None
+    allocation: dict[str, float] | None = None
+    timestamp_col: str | None = None
+
+
+class BatchAnalysisRequest(BaseModel):
+    experiments: list[BatchExperiment]
+    n_jobs: int | None = Field(None, ge=1, description="Worker processes (default: CPU count)")
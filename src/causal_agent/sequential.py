@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .analysis import (
+    Allocation,
+    AnalysisResult,
+    ExperimentAnalysis,
+    _srm_message,
+    expected_split,
+    srm_p_value,
+)
+from .moments import VariantStats, compute_variant_stats
+from .schemas import ExperimentInputs
+
+
+def msprt_log_lr(diff: np.ndarray, var: np.ndarray, tau2: float) -> np.ndarray:
+    """
+    Log mixture likelihood ratio of the mSPRT with a N(0, tau2) mixture over the effect.
+
+    ``diff`` is the estimated difference in means and ``var`` its variance.
+    """
+    return 0.5 * np.log(var / (var + tau2)) + diff ** 2 * tau2 / (2 * var * (var + tau2))
+
+
+def confidence_radius(var: np.ndarray, tau2: float, alpha: float) -> np.ndarray:
+    """Half-width of the (1 - alpha) mSPRT confidence sequence around the estimate."""
+    return np.sqrt(var * (var + tau2) / tau2 * (2 * np.log(1 / alpha) + np.log((var + tau2) / var)))
+
+
+@dataclass
+class SequentialTest:
+    """
+    Always-valid (mSPRT) comparison of every variant against control.
+
+    The state is the per-variant moments plus, per variant, the running minimum
+    p-value and the intersected confidence sequence. ``update`` folds a new batch
+    of rows in O(batch) and ``analyze`` can be called after any batch without
+    inflating the false-positive rate or rescanning history.
+
+    ``mixture_sd`` is the prior scale of plausible effects (e.g. the MDE). When
+    not given it is fixed to 0.1 pooled standard deviations at the first look
+    where that is positive; earlier looks report no sequential p-values.
+    The SRM check expects the split given by ``allocation`` (equal by default).
+    """
+    metric_col: str
+    variant_col: str
+    control_label: str
+    alpha: float = 0.05
+    mixture_sd: float | None = None
+    allocation: Allocation = None
+    stats: VariantStats | None = None
+    looks: int = 0
+    running: dict[str, dict[str, float]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.mixture_sd is not None and not (np.isfinite(self.mixture_sd) and self.mixture_sd > 0):
+            raise ValueError(f"mixture_sd must be a positive finite number, got {self.mixture_sd}")
+
+    def update(self, batch: pd.DataFrame) -> SequentialTest:
+        return self.update_stats(compute_variant_stats(batch, self.variant_col, self.metric_col))
+
+    def update_stats(self, part: VariantStats) -> SequentialTest:
+        self.stats = part if self.stats is None else self.stats.merge(part)
+        return self
+
+    def analyze(self) -> ExperimentAnalysis:
+        if self.stats is None or len(self.stats.labels) == 0:
+            return ExperimentAnalysis(control_variant="", results=[], srm_warning=False, warnings=["No data found"])
+
+        labels = self.stats.labels
+        metric = self.stats.metric
+        means, variances = metric.mean, metric.var
+        c = labels.index(self.control_label) if self.control_label in labels else 0
+
+        if self.mixture_sd is None:
+            # a tiny or constant first batch has no usable variance yet: wait rather than freeze NaN or 0
+            pooled_sd = float(np.sqrt(metric.pooled().var[0]))
+            if np.isfinite(pooled_sd) and pooled_sd > 0:
+                self.mixture_sd = 0.1 * pooled_sd
+        tau2 = self.mixture_sd ** 2 if self.mixture_sd is not None else 0.0
+        self.looks += 1
+
+        warnings = []
+        weights = expected_split(labels, self.control_label, self.allocation)
+        srm_p = srm_p_value(self.stats.n_rows, weights)
+        srm_warning = srm_p < 0.001
+        if srm_warning:
+            warnings.append(_srm_message(srm_p, weights))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diff = means - means[c]
+            var = variances / metric.n + variances[c] / metric.n[c]
+            p_now = np.minimum(1.0, np.exp(-msprt_log_lr(diff, var, tau2)))
+            radius = confidence_radius(var, tau2, self.alpha)
+
+        results = []
+        for i, v in enumerate(labels):
+            res = AnalysisResult(
+                variant=str(v),
+                sample_size=int(self.stats.n_rows[i]),
+                mean=float(means[i]),
+                std_dev=float(np.sqrt(variances[i])),
+                srm_p_value=srm_p if i != c else None
+            )
+            if i != c:
+                if means[c] != 0:
+                    res.lift = float(diff[i] / abs(means[c]))
+                else:
+                    res.lift = 0.0
+
+                if tau2 > 0 and np.isfinite(var[i]) and var[i] > 0:
+                    # running minimum / intersection keep the guarantees across looks
+                    state = self.running.setdefault(str(v), {"p_value": 1.0, "ci_lower": -np.inf, "ci_upper": np.inf})
+                    state["p_value"] = min(state["p_value"], float(p_now[i]))
+                    state["ci_lower"] = max(state["ci_lower"], float(diff[i] - radius[i]))
+                    state["ci_upper"] = min(state["ci_upper"], float(diff[i] + radius[i]))
+                    res.p_value = state["p_value"]
+                    res.ci_lower = state["ci_lower"]
+                    res.ci_upper = state["ci_upper"]
+                    res.is_significant = bool(res.p_value < self.alpha)
+                else:
+                    warnings.append(f"Not enough data for a sequential test of {v}")
+            results.append(res)
+
+        return ExperimentAnalysis(control_variant=str(labels[c]), results=results, srm_warning=srm_warning, warnings=warnings)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "metric_col": self.metric_col,
+            "variant_col": self.variant_col,
+            "control_label": self.control_label,
+            "alpha": self.alpha,
+            "mixture_sd": self.mixture_sd,
+            "allocation": (
+                self.allocation.model_dump(mode="json") if isinstance(self.allocation, ExperimentInputs) else self.allocation
+            ),
+            "stats": self.stats.to_dict() if self.stats is not None else None,
+            "looks": self.looks,
+            "running": self.running,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> SequentialTest:
+        data = dict(data)
+        stats = data.pop("stats", None)
+        allocation = data.get("allocation")
+        if isinstance(allocation, dict) and "allocation_control" in allocation:
+            data["allocation"] = ExperimentInputs.model_validate(allocation)
+        return cls(**data, stats=VariantStats.from_dict(stats) if stats else None)
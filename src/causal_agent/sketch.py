@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class TDigest:
+    """
+    Mergeable t-digest quantile sketch.
+
+    Values are summarised by weighted centroids whose size follows the k1 scale
+    function, so clusters are tiny in the tails and p95/p99 stay accurate. Both
+    ``update`` and ``merge`` are a sort plus a vectorized re-clustering of the
+    combined centroids, which keeps memory at O(compression) per digest.
+    """
+    compression: float = 200.0
+    means: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    weights: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    min: float = np.inf
+    max: float = -np.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _absorb(self, means: np.ndarray, weights: np.ndarray) -> TDigest:
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        if len(means) == 0:
+            return self
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q_mid = (np.cumsum(weights) - weights / 2) / total
+        # k1 scale function, one unit of k per cluster (about ``compression`` centroids)
+        k = self.compression / np.pi * np.arcsin(2 * q_mid - 1)
+        ids = np.floor(k - k[0]).astype(np.int64)
+        ids = np.unique(ids, return_inverse=True)[1]
+
+        merged_w = np.bincount(ids, weights=weights)
+        self.means = np.bincount(ids, weights=weights * means) / merged_w
+        self.weights = merged_w
+        return self
+
+    def update(self, values: np.ndarray) -> TDigest:
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._absorb(values, np.ones(len(values)))
+        return self
+
+    def merge(self, other: TDigest) -> TDigest:
+        out = TDigest(self.compression, self.means.copy(), self.weights.copy(), self.min, self.max)
+        out.min = min(self.min, other.min)
+        out.max = max(self.max, other.max)
+        return out._absorb(other.means, other.weights)
+
+    def quantile(self, q: float | np.ndarray) -> np.ndarray:
+        """Estimated quantile(s); exact for small inputs where every centroid is a single value."""
+        q = np.clip(np.asarray(q, dtype=float), 0.0, 1.0)
+        if len(self.means) == 0:
+            return np.full(q.shape, np.nan)
+        total = self.weights.sum()
+        # centroid mass is spread around its mean; interpolate between centroid midpoints
+        mid = np.cumsum(self.weights) - self.weights / 2
+        ranks = np.concatenate([[0.0], mid, [total]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(q * total, ranks, values)
+
+
+def compute_variant_digests(
+    chunks: Iterable[pd.DataFrame],
+    variant_col: str,
+    metric_col: str,
+    compression: float = 200.0,
+) -> tuple[list[Any], list[TDigest], np.ndarray]:
+    """
+    Builds one ``TDigest`` per variant in a single streaming pass over ``chunks``.
+
+    Pass ``[df]`` for an in-memory frame. Labels keep first-appearance order.
+    Returns (labels, digests, n_rows) where n_rows counts rows including missing values.
+    """
+    labels: list[Any] = []
+    digests: dict[Any, TDigest] = {}
+    n_rows: dict[Any, int] = {}
+    for chunk in chunks:
+        codes, uniques = pd.factorize(chunk[variant_col], sort=False)
+        values = chunk[metric_col].to_numpy(dtype="float64", na_value=np.nan)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        for j, label in enumerate(uniques):
+            if label not in digests:
+                labels.append(label)
+                digests[label] = TDigest(compression)
+                n_rows[label] = 0
+            digests[label].update(values[order[bounds[j]:bounds[j + 1]]])
+            n_rows[label] += int(bounds[j + 1] - bounds[j])
+    return labels, [digests[label] for label in labels], np.array([n_rows[label] for label in labels])
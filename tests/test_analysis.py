@@ -0,0 +1,382 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from causal_agent.analysis import (
+    adjust_p_values,
+    analyze_experiment,
+    analyze_experiment_stream,
+    analyze_quantiles,
+    analyze_scorecard,
+    analyze_scorecard_stream,
+    analyze_summary_stats,
+    apply_cuped,
+    auto_drill_down,
+    check_srm,
+    prob_beat_control,
+    srm_time_series,
+)
+from causal_agent.moments import compute_variant_stats
+from causal_agent.schemas import (
+    AnalysisType,
+    ExperimentInputs,
+    MetricSpec,
+    MetricType,
+    VariantSummary,
+)
+
+
+def _ab_frame(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "variant": rng.choice(["control", "treatment", "other"], n),
+        "pre": rng.normal(50, 5, n),
+    })
+    df["y"] = 0.8 * df["pre"] + rng.normal(0, 2, n) + (df["variant"] == "treatment") * 0.5
+    df.loc[rng.random(n) < 0.05, "y"] = np.nan
+    return df
+
+
+def test_variant_stats_match_pandas():
+    df = _ab_frame()
+    vs = compute_variant_stats(df, "variant", "y")
+    grouped = df.groupby("variant", sort=False)["y"]
+
+    assert vs.labels == list(df["variant"].unique())
+    np.testing.assert_allclose(vs.metric.mean, grouped.mean().to_numpy())
+    np.testing.assert_allclose(vs.metric.std, grouped.std().to_numpy())
+    np.testing.assert_array_equal(vs.n_rows, grouped.size().to_numpy())
+
+
+def test_analyze_matches_row_level_welch():
+    df = _ab_frame()
+    res = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control")
+    treat = next(r for r in res.results if r.variant == "treatment")
+
+    y_t = df.loc[df["variant"] == "treatment", "y"].dropna()
+    y_c = df.loc[df["variant"] == "control", "y"].dropna()
+    _, p = stats.ttest_ind(y_t, y_c, equal_var=False)
+
+    assert treat.p_value == pytest.approx(p, rel=1e-9)
+    assert treat.mean == pytest.approx(y_t.mean(), rel=1e-12)
+
+
+def test_cuped_from_moments_matches_apply_cuped():
+    df = _ab_frame()
+    columns = list(df.columns)
+    res = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col="pre")
+
+    adjusted = apply_cuped(df, "y", "pre").groupby(df["variant"], sort=False)
+    treat = next(r for r in res.results if r.variant == "treatment")
+    assert treat.mean == pytest.approx(adjusted.mean()["treatment"], rel=1e-12)
+    assert treat.std_dev == pytest.approx(adjusted.std()["treatment"], rel=1e-9)
+    # the caller's frame is left untouched
+    assert list(df.columns) == columns
+
+
+def test_streaming_matches_in_memory():
+    df = _ab_frame()
+    chunks = (df.iloc[i:i + 150] for i in range(0, len(df), 150))
+
+    full = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col="pre")
+    streamed = analyze_experiment_stream(chunks, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col="pre")
+
+    assert [r.variant for r in streamed.results] == [r.variant for r in full.results]
+    for a, b in zip(full.results, streamed.results, strict=True):
+        assert b.sample_size == a.sample_size
+        assert b.mean == pytest.approx(a.mean, rel=1e-12)
+        assert b.std_dev == pytest.approx(a.std_dev, rel=1e-9)
+        if a.p_value is not None:
+            assert b.p_value == pytest.approx(a.p_value, rel=1e-9)
+
+
+def test_streaming_skips_non_numeric_covariate_like_in_memory():
+    df = _ab_frame()
+    df["pre_text"] = "n/a"
+    chunks = (df.iloc[i:i + 500] for i in range(0, len(df), 500))
+
+    full = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col="pre_text")
+    streamed = analyze_experiment_stream(
+        chunks, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col="pre_text"
+    )
+
+    assert streamed.cuped_theta is None and full.cuped_theta is None
+    assert any(w.startswith("CUPED failed") for w in streamed.warnings)
+    for a, b in zip(full.results, streamed.results, strict=True):
+        assert b.mean == pytest.approx(a.mean, rel=1e-12)
+        if a.p_value is not None:
+            assert b.p_value == pytest.approx(a.p_value, rel=1e-9)
+
+
+def test_summary_stats_match_rows():
+    df = _ab_frame().dropna()
+    df["segment"] = np.where(df["pre"] > 50, "high", "low")
+    summaries = [
+        VariantSummary(
+            variant=v,
+            segment=seg,
+            n=len(g),
+            sum=g["y"].sum(),
+            sum_sq=(g["y"] ** 2).sum(),
+            sum_x=g["pre"].sum(),
+            sum_x_sq=(g["pre"] ** 2).sum(),
+            sum_xy=(g["y"] * g["pre"]).sum(),
+        )
+        for (seg, v), g in df.groupby(["segment", "variant"])
+    ]
+
+    result = analyze_summary_stats(summaries, MetricType.CONTINUOUS, "control")
+    rows = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col="pre")
+    by_variant = {r.variant: r for r in result.overall.results}
+    for r in rows.results:
+        assert by_variant[r.variant].mean == pytest.approx(r.mean, rel=1e-9)
+        assert by_variant[r.variant].std_dev == pytest.approx(r.std_dev, rel=1e-6)
+        if r.p_value is not None:
+            assert by_variant[r.variant].p_value == pytest.approx(r.p_value, rel=1e-6)
+    assert set(result.segments) == {"high", "low"}
+
+
+def test_summary_stats_binary_without_sum_sq():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({"variant": rng.choice(["A", "B"], 5000), "conv": rng.integers(0, 2, 5000)})
+    summaries = [
+        VariantSummary(variant=v, n=len(g), sum=float(g["conv"].sum()))
+        for v, g in df.groupby("variant")
+    ]
+    result = analyze_summary_stats(summaries, MetricType.BINARY, "A").overall
+    rows = analyze_experiment(df, "conv", "variant", MetricType.BINARY, "A")
+    b_sum = next(r for r in result.results if r.variant == "B")
+    b_row = next(r for r in rows.results if r.variant == "B")
+    assert b_sum.p_value == pytest.approx(b_row.p_value, rel=1e-9)
+    assert b_sum.srm_p_value == pytest.approx(b_row.srm_p_value)
+
+
+def test_bayesian_prob_beat_control_is_deterministic():
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({"variant": rng.choice(["A", "B"], 4000)})
+    df["conv"] = (rng.random(4000) < np.where(df["variant"] == "B", 0.12, 0.10)).astype(int)
+
+    def prob(**kwargs):
+        res = analyze_experiment(df, "conv", "variant", MetricType.BINARY, "A", analysis_type=AnalysisType.BAYESIAN, **kwargs)
+        return next(r for r in res.results if r.variant == "B").prob_beat_control
+
+    exact = prob()
+    assert exact == prob()
+    assert prob(bayesian_method="monte_carlo", seed=7) == prob(bayesian_method="monte_carlo", seed=7)
+    assert prob(bayesian_method="monte_carlo", seed=7) == pytest.approx(exact, abs=0.02)
+
+
+def test_prob_beat_control_matches_beta_closed_form():
+    from scipy.special import betaln
+
+    a_c, b_c, a_t, b_t = 41, 361, 56, 346
+    i = np.arange(a_t)
+    closed = np.sum(np.exp(betaln(a_c + i, b_c + b_t) - np.log(b_t + i) - betaln(1 + i, b_t) - betaln(a_c, b_c)))
+    assert prob_beat_control(stats.beta(a_t, b_t), stats.beta(a_c, b_c)) == pytest.approx(closed, abs=1e-8)
+
+
+def test_adjust_p_values():
+    p = np.array([0.01, 0.04, 0.03, 0.20])
+    np.testing.assert_allclose(adjust_p_values(p, "bh"), [0.04, 0.04 * 4 / 3, 0.04 * 4 / 3, 0.20])
+    np.testing.assert_allclose(adjust_p_values(p, "holm"), [0.04, 0.09, 0.09, 0.20])
+
+
+def test_drill_down_matches_per_segment_welch():
+    rng = np.random.default_rng(11)
+    n = 6000
+    df = pd.DataFrame({
+        "variant": rng.choice(["A", "B"], n),
+        "country": rng.choice([f"c{i}" for i in range(20)], n),
+    })
+    df["y"] = rng.normal(0, 1, n) + ((df["country"] == "c3") & (df["variant"] == "B")) * 1.5
+
+    insights = auto_drill_down(df, "y", "variant", "A", ["country"], p_adjust="none", alpha=1.0)
+    seg = df[df["country"] == "c3"]
+    _, p = stats.ttest_ind(seg.loc[seg["variant"] == "B", "y"], seg.loc[seg["variant"] == "A", "y"], equal_var=False)
+    c3 = next(i for i in insights if i["segment_value"] == "c3")
+    assert c3["p_value"] == pytest.approx(p, rel=1e-9)
+    assert len(insights) == 20
+
+    # FDR control keeps the real effect and never flags more than the raw tests
+    raw = auto_drill_down(df, "y", "variant", "A", ["country"], p_adjust="none")
+    adjusted = auto_drill_down(df, "y", "variant", "A", ["country"])
+    assert "c3" in [i["segment_value"] for i in adjusted]
+    assert len(adjusted) <= len(raw)
+    assert all(i["p_value_adjusted"] >= i["p_value"] for i in adjusted)
+
+
+def test_scorecard_matches_single_metric_analysis():
+    df = _ab_frame()
+    df["conv"] = (df["y"] > 40).astype(int)
+    df["pre_text"] = "n/a"
+    specs = [
+        MetricSpec(column="y", covariate_col="pre"),
+        MetricSpec(column="conv", metric_type=MetricType.BINARY),
+        MetricSpec(column="pre", covariate_col="pre_text"),
+    ]
+    card = analyze_scorecard(df, specs, "variant", "control")
+
+    assert list(card.metrics) == ["y", "conv", "pre"]
+    single = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col="pre")
+    for a, b in zip(single.results, card.metrics["y"].results, strict=True):
+        assert b.mean == pytest.approx(a.mean, rel=1e-12)
+        assert b.std_dev == pytest.approx(a.std_dev, rel=1e-9)
+    assert any("CUPED failed" in w for w in card.metrics["pre"].warnings)
+
+    chunks = (df.iloc[i:i + 500] for i in range(0, len(df), 500))
+    streamed = analyze_scorecard_stream(chunks, specs, "variant", "control")
+    conv = next(r for r in streamed.metrics["conv"].results if r.variant == "treatment")
+    expected = next(r for r in card.metrics["conv"].results if r.variant == "treatment")
+    assert conv.p_value == pytest.approx(expected.p_value, rel=1e-9)
+    assert streamed.metrics["pre"].warnings == card.metrics["pre"].warnings
+
+
+def test_ratio_metric_uses_delta_method():
+    rng = np.random.default_rng(21)
+    n = 3000
+    df = pd.DataFrame({"variant": rng.choice(["A", "B"], n), "sessions": rng.poisson(5, n) + 1})
+    df["clicks"] = rng.binomial(df["sessions"], np.where(df["variant"] == "B", 0.32, 0.30))
+
+    res = analyze_experiment(df, "clicks", "variant", MetricType.RATIO, "A", denominator_col="sessions")
+    b = next(r for r in res.results if r.variant == "B")
+
+    def ratio_and_var(g):
+        y, x = g["clicks"].to_numpy(float), g["sessions"].to_numpy(float)
+        r = y.sum() / x.sum()
+        lin = (y - r * x) / x.mean()
+        return r, lin.var(ddof=1) / len(g)
+
+    r_a, v_a = ratio_and_var(df[df["variant"] == "A"])
+    r_b, v_b = ratio_and_var(df[df["variant"] == "B"])
+    assert b.mean == pytest.approx(r_b)
+    assert b.ci_upper - b.ci_lower == pytest.approx(2 * 1.96 * np.sqrt(v_a + v_b), rel=1e-9)
+    assert b.ci_lower < r_b - r_a < b.ci_upper
+
+    card = analyze_scorecard(
+        df, [MetricSpec(column="clicks", metric_type=MetricType.RATIO, denominator_col="sessions")], "variant", "A"
+    )
+    assert next(r for r in card.metrics["clicks"].results if r.variant == "B").p_value == pytest.approx(b.p_value)
+
+
+def test_multi_covariate_cuped_matches_row_level_regression():
+    df = _ab_frame().dropna()
+    rng = np.random.default_rng(8)
+    df["pre2"] = rng.normal(0, 1, len(df))
+    df["y"] = df["y"] + 0.7 * df["pre2"]
+    before = df.copy()
+
+    res = analyze_experiment(
+        df, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col=["pre", "pre2"]
+    )
+    pd.testing.assert_frame_equal(df, before)
+
+    # theta from the pooled regression of y on both covariates (apply_cuped's ddof convention)
+    x = df[["pre", "pre2"]].to_numpy()
+    xc, yc = x - x.mean(axis=0), df["y"].to_numpy() - df["y"].mean()
+    n = len(df)
+    theta = np.linalg.solve(xc.T @ xc / n, xc.T @ yc / (n - 1))
+    assert list(res.cuped_theta) == ["pre", "pre2"]
+    np.testing.assert_allclose(list(res.cuped_theta.values()), theta, rtol=1e-9)
+
+    adjusted = pd.Series(df["y"].to_numpy() - xc @ theta, index=df.index).groupby(df["variant"])
+    treat = next(r for r in res.results if r.variant == "treatment")
+    assert treat.mean == pytest.approx(adjusted.mean()["treatment"], rel=1e-9)
+    assert treat.std_dev == pytest.approx(adjusted.std()["treatment"], rel=1e-9)
+
+    # a single-element list is the classic single-covariate CUPED
+    single = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col="pre")
+    listed = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col=["pre"])
+    assert listed.cuped_theta["pre"] == pytest.approx(single.cuped_theta["pre"], rel=1e-12)
+
+
+def test_cupac_predictions_and_cached_theta():
+    df = _ab_frame().dropna()
+    prediction = 0.8 * df["pre"].to_numpy()  # stands in for a model trained on pre-period data
+
+    first = analyze_experiment(
+        df, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col=[prediction], cuped_cache_key="exp-1"
+    )
+    assert list(first.cuped_theta) == ["covariate_0"]
+
+    # same key: the cached theta is reused even though the data changed
+    shifted = df.assign(y=df["y"] + df["pre"])
+    second = analyze_experiment(
+        shifted, "y", "variant", MetricType.CONTINUOUS, "control", covariate_col=[prediction], cuped_cache_key="exp-1"
+    )
+    assert second.cuped_theta == first.cuped_theta
+
+
+def test_srm_with_configured_allocation_and_daily_series():
+    rng = np.random.default_rng(5)
+    n = 20_000
+    df = pd.DataFrame({
+        "variant": rng.choice(["control", "treatment"], n, p=[0.9, 0.1]),
+        "y": rng.normal(size=n),
+        "ts": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10 * 24, n), unit="h"),
+    })
+    inputs = ExperimentInputs(
+        goal="ramp", baseline_rate=0.1, mde_abs=0.01, traffic_per_day=2000, allocation_treatment=0.1,
+        allocation_control=0.9, randomization_unit="user_id", primary_metric="y", metric_window_days=7,
+    )
+
+    assert check_srm(df, "variant") < 1e-6
+    assert check_srm(df, "variant", inputs, "control") > 0.001
+    assert check_srm(df, "variant", {"control": 9, "treatment": 1}) > 0.001
+
+    ramp = analyze_experiment(
+        df, "y", "variant", MetricType.CONTINUOUS, "control", allocation={"control": 0.9, "treatment": 0.1},
+        timestamp_col="ts"
+    )
+    assert not ramp.srm_warning
+    assert [p.date for p in ramp.srm_series][:2] == ["2024-01-01", "2024-01-02"]
+    assert sum(ramp.srm_series[-1].counts.values()) == n
+
+    # from day 6 on, half of the treatment traffic is lost
+    late = (df["ts"] >= "2024-01-06") & (df["variant"] == "treatment")
+    broken = df[~late | (np.arange(n) % 2 == 0)]
+    series = srm_time_series(broken, "variant", "ts", "control", inputs)
+    assert series[3].p_value > 0.001
+    assert series[-1].p_value < 1e-6
+    assert series[-1].p_value == pytest.approx(check_srm(broken, "variant", inputs, "control"), rel=1e-9)
+
+    streamed = analyze_experiment_stream(
+        (broken.iloc[i:i + 3000] for i in range(0, len(broken), 3000)), "y", "variant", MetricType.CONTINUOUS,
+        "control", allocation=inputs, timestamp_col="ts"
+    )
+    assert streamed.srm_warning
+    assert [p.p_value for p in streamed.srm_series] == pytest.approx([p.p_value for p in series])
+
+
+def test_srm_ignores_unused_categories():
+    rng = np.random.default_rng(6)
+    n = 5000
+    variant = pd.Categorical(rng.choice(["control", "treatment"], n), categories=["control", "treatment", "holdout"])
+    df = pd.DataFrame({
+        "variant": variant,
+        "y": rng.normal(size=n),
+        "ts": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 5 * 24, n), unit="h"),
+    })
+
+    assert check_srm(df, "variant") == pytest.approx(check_srm(df.astype({"variant": str}), "variant"))
+    assert check_srm(df, "variant") > 0.001
+    result = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control", timestamp_col="ts")
+    assert not result.srm_warning
+    assert set(result.srm_series[-1].counts) == {"control", "treatment"}
+
+
+def test_scorecard_and_quantiles_check_srm_against_allocation():
+    rng = np.random.default_rng(8)
+    n = 20_000
+    df = pd.DataFrame({"variant": rng.choice(["control", "treatment"], n, p=[0.9, 0.1]), "y": rng.normal(size=n)})
+    allocation = {"control": 0.9, "treatment": 0.1}
+    specs = [MetricSpec(column="y")]
+
+    assert analyze_scorecard(df, specs, "variant", "control").srm_warning
+    assert not analyze_scorecard(df, specs, "variant", "control", allocation=allocation).srm_warning
+    chunks = (df.iloc[i:i + 5000] for i in range(0, n, 5000))
+    assert not analyze_scorecard_stream(chunks, specs, "variant", "control", allocation=allocation).srm_warning
+
+    assert analyze_quantiles(df, "y", "variant", "control").srm_warning
+    ramp = analyze_quantiles(df, "y", "variant", "control", allocation=allocation)
+    assert not ramp.srm_warning and not ramp.warnings
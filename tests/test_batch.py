@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from causal_agent.analysis import analyze_experiment
+from causal_agent.batch import analyze_batch
+from causal_agent.schemas import BatchExperiment, MetricType
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_analyze_batch_matches_single_runs(tmp_path, n_jobs):
+    rng = np.random.default_rng(5)
+    specs, expected = [], {}
+    for i in range(3):
+        df = pd.DataFrame({
+            "variant": rng.choice(["A", "B"], 2000),
+            "revenue": rng.normal(10 + i, 2, 2000),
+        })
+        path = tmp_path / f"exp{i}.parquet"
+        df.to_parquet(path)
+        specs.append(BatchExperiment(
+            experiment_id=f"exp{i}", path=str(path), metric_col="revenue", variant_col="variant",
+            metric_type=MetricType.CONTINUOUS, control_label="A",
+        ))
+        expected[f"exp{i}"] = analyze_experiment(df, "revenue", "variant", MetricType.CONTINUOUS, "A")
+    specs.append(specs[0].model_copy(update={"experiment_id": "broken", "metric_col": "missing"}))
+
+    results = {r.experiment_id: r for r in analyze_batch(specs, n_jobs=n_jobs)}
+
+    assert set(results) == {"exp0", "exp1", "exp2", "broken"}
+    assert results["broken"].analysis is None and results["broken"].error
+    for key, want in expected.items():
+        got = results[key].analysis
+        assert results[key].error is None
+        for a, b in zip(got.results, want.results, strict=True):
+            assert a.variant == b.variant
+            assert a.mean == pytest.approx(b.mean)
+            assert (a.p_value is None and b.p_value is None) or a.p_value == pytest.approx(b.p_value)
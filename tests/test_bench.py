@@ -0,0 +1,18 @@
+from causal_agent import bench
+
+
+def test_bench_cases_run_and_compare(monkeypatch, tmp_path):
+    monkeypatch.setitem(bench.SIZES, "tiny", 2000)
+    monkeypatch.setattr(bench, "HTE_MAX_ROWS", 200)
+    results = [bench.run_case(case, "tiny", repeat=1) for case in bench.CASES]
+    assert len({r.key for r in results}) == len(bench.CASES)
+    assert all(r.seconds > 0 and r.peak_mb >= 0 for r in results)
+
+    path = tmp_path / "baseline.json"
+    bench.save_results(results, path)
+    baseline = bench.load_results(path)
+    assert not any(row["regressed"] for row in bench.compare(results, baseline))
+
+    slower = [bench.BenchResult(r.case, r.size, r.seconds * 2, r.peak_mb, r.info) for r in results]
+    rows = bench.compare(slower, baseline, threshold=1.5)
+    assert len(rows) == len(results) and all(row["regressed"] for row in rows)
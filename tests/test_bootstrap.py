@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from causal_agent.analysis import analyze_experiment
+from causal_agent.bootstrap import (
+    bootstrap_mean_diff_ci,
+    bootstrap_quantile_diff_ci,
+    poisson_bootstrap,
+)
+from causal_agent.schemas import MetricType
+
+
+def _revenue_frame(n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    variant = rng.choice(["A", "B"], n)
+    revenue = rng.lognormal(mean=np.where(variant == "B", 1.1, 1.0), sigma=1.0)
+    return pd.DataFrame({"variant": variant, "revenue": revenue})
+
+
+def test_poisson_bootstrap_is_reproducible_across_workers():
+    rng = np.random.default_rng(1)
+    codes = rng.integers(0, 3, 5000)
+    values = rng.normal(size=5000)
+
+    serial = poisson_bootstrap(codes, values, 3, n_boot=250, seed=42, block_size=1000)
+    parallel = poisson_bootstrap(codes, values, 3, n_boot=250, seed=42, block_size=1000, n_jobs=2)
+    np.testing.assert_allclose(serial[0], parallel[0])
+    np.testing.assert_allclose(serial[1], parallel[1])
+    # Poisson(1) weights sum to roughly the group size
+    assert serial[0].mean(axis=1) == pytest.approx(np.bincount(codes), rel=0.02)
+
+
+def test_bootstrap_ci_close_to_normal_ci():
+    df = _revenue_frame()
+    ci = bootstrap_mean_diff_ci(df, "revenue", "variant", "A", n_boot=400, seed=3)
+    normal = analyze_experiment(df, "revenue", "variant", MetricType.CONTINUOUS, "A")
+    boot = analyze_experiment(
+        df, "revenue", "variant", MetricType.CONTINUOUS, "A", ci_method="bootstrap", n_boot=400, seed=3
+    )
+
+    b_normal = next(r for r in normal.results if r.variant == "B")
+    b_boot = next(r for r in boot.results if r.variant == "B")
+    assert (b_boot.ci_lower, b_boot.ci_upper) == pytest.approx(ci["B"])
+    width = b_normal.ci_upper - b_normal.ci_lower
+    assert b_boot.ci_lower == pytest.approx(b_normal.ci_lower, abs=0.15 * width)
+    assert b_boot.ci_upper == pytest.approx(b_normal.ci_upper, abs=0.15 * width)
+
+
+def test_median_bootstrap_matches_across_workers_and_covers_the_difference():
+    df = _revenue_frame(n=6000, seed=4)
+    serial = bootstrap_quantile_diff_ci(df, "revenue", "variant", "A", n_boot=300, seed=7, block_size=1000)
+    parallel = bootstrap_quantile_diff_ci(df, "revenue", "variant", "A", n_boot=300, seed=7, block_size=1000, n_jobs=2)
+    assert serial["B"] == pytest.approx(parallel["B"])
+
+    medians = df.groupby("variant")["revenue"].median()
+    lower, upper = serial["B"]
+    assert lower < medians["B"] - medians["A"] < upper
+    # lognormal medians differ by e^1.1 - e^1.0 in population
+    assert lower < np.exp(1.1) - np.exp(1.0) < upper
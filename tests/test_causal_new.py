@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 import pytest
+from scipy import stats
 
 from causal_agent.analysis import MetricType, auto_drill_down
 from causal_agent.causal import DifferenceInDifferences, HTELearner, SyntheticControl
@@ -107,3 +108,157 @@ def test_auto_drill_down():
     assert len(insights) > 0
     found_ios = any("iOS" in i['message'] for i in insights)
     assert found_ios
+
+
+def test_did_cluster_robust_matches_row_level_sandwich():
+    rng = np.random.default_rng(7)
+    units, periods = 60, 12
+    unit = np.repeat(np.arange(units), periods)
+    time = np.tile(np.arange(periods), units)
+    treat = (unit < 25).astype(int)
+    y = rng.normal(size=units)[unit] + 0.1 * time + 1.0 * treat * (time >= 6) + rng.normal(size=len(unit))
+    df = pd.DataFrame({"unit": unit, "time": time, "treat": treat, "y": y}).sample(frac=0.8, random_state=0)
+    before = df.copy()
+
+    result = DifferenceInDifferences().fit(df, "unit", "time", "treat", "y", post_period_start=6)
+    pd.testing.assert_frame_equal(df, before)
+
+    # row-level OLS with CR1 cluster-robust variance
+    post = (df["time"].to_numpy() >= 6).astype(float)
+    t = df["treat"].to_numpy(dtype=float)
+    X = np.column_stack([np.ones(len(df)), t, post, t * post])
+    yv = df["y"].to_numpy()
+    beta = np.linalg.lstsq(X, yv, rcond=None)[0]
+    u = yv - X @ beta
+    bread = np.linalg.inv(X.T @ X)
+    scores = pd.DataFrame(X * u[:, None]).groupby(df["unit"].to_numpy()).sum().to_numpy()
+    G, N = len(scores), len(df)
+    V = G / (G - 1) * (N - 1) / (N - 4) * bread @ scores.T @ scores @ bread
+    se = np.sqrt(V[3, 3])
+
+    assert result.effect == pytest.approx(beta[3])
+    assert result.details["se"] == pytest.approx(se)
+    assert result.details["n_clusters"] == units
+    assert result.ci_lower < result.effect < result.ci_upper
+    assert result.ci_upper - result.effect == pytest.approx(se * stats.t.ppf(0.975, units - 1))
+    assert result.p_value < 0.05
+
+
+def test_twfe_unbalanced_matches_dummy_regression():
+    from causal_agent.analysis import analyze_observational
+
+    rng = np.random.default_rng(11)
+    units, periods = 40, 10
+    unit = np.repeat(np.arange(units), periods)
+    time = np.tile(np.arange(periods), units)
+    adopt = np.where(np.arange(units) < 20, rng.integers(3, 8, units), 99)
+    d = (time >= adopt[unit]).astype(int)
+    y = rng.normal(size=units)[unit] + rng.normal(size=periods)[time] + 1.5 * d + rng.normal(size=len(unit))
+    df = pd.DataFrame({"unit": unit, "time": time, "d": d, "y": y}).sample(frac=0.7, random_state=1)
+
+    result = analyze_observational(df, "twfe", unit_col="unit", time_col="time", treatment_col="d", outcome_col="y")
+
+    dummies = pd.get_dummies(df[["unit", "time"]].astype(str), drop_first=True).to_numpy(dtype=float)
+    X = np.column_stack([df["d"].to_numpy(float), np.ones(len(df)), dummies])
+    beta = np.linalg.lstsq(X, df["y"].to_numpy(), rcond=None)[0]
+    assert result.effect == pytest.approx(beta[0], rel=1e-6)
+    assert not result.details["balanced"] and result.details["converged"]
+    assert result.ci_lower < 1.5 < result.ci_upper
+    assert result.p_value < 1e-3
+
+
+def _staggered_panel(units=600, periods=12, seed=3):
+    rng = np.random.default_rng(seed)
+    cohort = rng.choice([0, 4, 7, 9], units)
+    unit = np.repeat(np.arange(units), periods)
+    time = np.tile(np.arange(1, periods + 1), units)
+    g = cohort[unit]
+    treated = (g > 0) & (time >= g)
+    y = rng.normal(size=units)[unit] + 0.3 * time + np.where(treated, 1 + 0.5 * (time - g), 0) + rng.normal(size=len(unit))
+    return pd.DataFrame({"unit": unit, "time": time, "g": g, "d": treated.astype(int), "y": y})
+
+
+def test_staggered_did_group_time_and_event_study():
+    from causal_agent.analysis import analyze_observational
+    from causal_agent.causal import StaggeredDiD
+
+    df = _staggered_panel()
+    result = analyze_observational(df, "staggered", unit_col="unit", time_col="time", outcome_col="y", cohort_col="g")
+
+    # ATT(7, 9) by hand: long differences against the period before adoption
+    means = df.groupby(["g", "time"])["y"].mean()
+    expected = (means[7, 9] - means[7, 6]) - (means[0, 9] - means[0, 6])
+    cell = next(c for c in result.details["group_time"] if c["cohort"] == 7 and c["period"] == 9)
+    assert cell["att"] == pytest.approx(expected)
+    assert cell["event_time"] == 2
+
+    event = {e["event_time"]: e for e in result.details["event_study"]}
+    for e in range(0, 4):
+        assert event[e]["ci_lower"] < 1 + 0.5 * e < event[e]["ci_upper"]
+    assert all(abs(event[e]["att"]) < 4 * event[e]["se"] for e in range(-5, 0))
+    sizes = df.drop_duplicates("unit")["g"].value_counts()
+    assert result.p_value < 1e-6
+    assert result.details["cohorts"] == {str(g): int(sizes[g]) for g in (4, 7, 9)}
+
+    # same seed, same answer on a process pool; cohorts can also come from the treatment indicator
+    pooled = StaggeredDiD(n_jobs=2).fit(df, "unit", "time", "y", treatment_col="d")
+    assert pooled.effect == pytest.approx(result.effect)
+    assert pooled.details["se"] == pytest.approx(result.details["se"])
+
+    not_yet = StaggeredDiD(control_group="not_yet_treated").fit(df, "unit", "time", "y", cohort_col="g")
+    assert not_yet.ci_lower < not_yet.effect < not_yet.ci_upper
+
+
+def test_event_study_matches_dummy_regression():
+    from causal_agent.analysis import analyze_observational
+
+    df = _staggered_panel(units=200, periods=10).sample(frac=0.85, random_state=2)
+    result = analyze_observational(
+        df, "event_study", unit_col="unit", time_col="time", outcome_col="y", cohort_col="g", leads=3, lags=6
+    )
+
+    path = {row["event_time"]: row for row in result.details["coefficients"]}
+    assert sorted(path) == list(range(-3, 7)) and path[-1]["coef"] == 0.0
+
+    rel = np.where(df["g"] > 0, np.clip(df["time"] - df["g"], -3, 6), -99)
+    events = [-3, -2, *range(7)]
+    indicators = np.column_stack([(rel == k).astype(float) for k in events])
+    fe = pd.get_dummies(df[["unit", "time"]].astype(str), drop_first=True).to_numpy(dtype=float)
+    X = np.column_stack([indicators, np.ones(len(df)), fe])
+    beta = np.linalg.lstsq(X, df["y"].to_numpy(), rcond=None)[0]
+    for k, b in zip(events, beta[:len(events)], strict=True):
+        assert path[k]["coef"] == pytest.approx(b, rel=1e-6, abs=1e-8)
+
+    for k in range(4):
+        assert path[k]["ci_lower"] < 1 + 0.5 * k < path[k]["ci_upper"]
+    assert result.effect == pytest.approx(np.mean(beta[2:len(events)]))
+    assert result.details["pre_trend_p_value"] > 0.01
+
+
+def test_scm_simplex_weights_are_sparse_convex_and_warm_start():
+    rng = np.random.default_rng(7)
+    n_periods, n_donors, start = 100, 40, 80
+    factors = rng.normal(size=(n_periods, 3)).cumsum(axis=0)
+    donors = factors @ rng.normal(size=(3, n_donors)) + rng.normal(0, 1.0, (n_periods, n_donors))
+    true_weights = {3: 0.5, 10: 0.3, 17: 0.2}
+    treated = sum(w * donors[:, j] for j, w in true_weights.items()) + rng.normal(0, 0.05, n_periods)
+    treated[start:] += 2.0
+    wide = pd.DataFrame(donors, columns=range(1, n_donors + 1))
+    wide[0] = treated
+    df = wide.rename_axis("time").reset_index().melt(id_vars="time", var_name="unit", value_name="y")
+
+    scm = SyntheticControl()
+    result = scm.fit(df, "unit", "time", "y", treated_unit=0, intervention_time=start)
+    weights = pd.Series(result.details["weights"])
+
+    assert result.details["converged"]
+    assert (weights > 0).all() and weights.sum() == pytest.approx(1.0)
+    assert len(weights) <= n_donors // 4
+    for j, w in true_weights.items():
+        assert weights.get(j + 1, 0.0) == pytest.approx(w, abs=0.05)
+    assert result.effect == pytest.approx(2.0, abs=0.1)
+
+    cold = SyntheticControl().fit(df, "unit", "time", "y", treated_unit=0, intervention_time=start + 1)
+    warm = scm.fit(df, "unit", "time", "y", treated_unit=0, intervention_time=start + 1, warm_start=True)
+    assert warm.details["iterations"] < cold.details["iterations"]
+    assert warm.effect == pytest.approx(cold.effect, abs=1e-3)
@@ -0,0 +1,91 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from causal_agent.analysis import analyze_experiment, analyze_experiment_stream
+from causal_agent.ingest import compact_dtypes, file_format, iter_table_chunks, read_table
+from causal_agent.schemas import MetricType
+
+
+def _wide_frame(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({f"extra_{i}": rng.normal(size=n) for i in range(20)})
+    df["variant"] = rng.choice(["control", "treatment"], n)
+    df["y"] = rng.normal(size=n)
+    return df
+
+
+def _encode(df, fmt):
+    buf = io.BytesIO()
+    if fmt == "parquet":
+        pq.write_table(pa.Table.from_pandas(df), buf, row_group_size=1000)
+    elif fmt == "arrow":
+        feather.write_feather(df, buf, chunksize=1000)
+    else:
+        df.to_csv(buf, index=False)
+    buf.seek(0)
+    return buf
+
+
+def test_file_format():
+    assert file_format("a.PARQUET") == "parquet"
+    assert file_format("a.feather") == "arrow"
+    assert file_format("a.xlsx") == "xlsx"
+    assert file_format(None) == "csv"
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow", "csv"])
+def test_read_table_projects_columns(fmt):
+    df = _wide_frame()
+    buf = _encode(df, fmt)
+
+    got = read_table(buf, fmt, ["y", "variant", "missing_covariate"], categorical=["variant"])
+    assert set(got.columns) == {"y", "variant"}
+    assert isinstance(got["variant"].dtype, pd.CategoricalDtype)
+    np.testing.assert_allclose(got["y"], df["y"])
+
+    assert len(read_table(buf, fmt, nrows=5)) == 5
+    assert len(read_table(buf, fmt, nrows=5).columns) == len(df.columns)
+
+    chunks = list(iter_table_chunks(buf, fmt, ["variant", "y"], ["variant"], chunksize=700))
+    assert sum(len(c) for c in chunks) == len(df)
+    assert all(set(c.columns) == {"variant", "y"} for c in chunks)
+
+    expected = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control")
+    streamed = analyze_experiment_stream(iter(chunks), "y", "variant", MetricType.CONTINUOUS, "control")
+    framed = analyze_experiment(got, "y", "variant", MetricType.CONTINUOUS, "control")
+    for res in (streamed, framed):
+        assert res.results[1].p_value == pytest.approx(expected.results[1].p_value, rel=1e-9)
+
+
+def test_compact_dtypes_is_lossless():
+    rng = np.random.default_rng(2)
+    n = 5000
+    df = pd.DataFrame({
+        "variant": rng.choice(["control", "treatment"], n),
+        "user_id": [f"u{i}" for i in range(n)],
+        "converted": rng.integers(0, 2, n).astype(float),
+        "clicks": rng.integers(0, 40, n),
+        "revenue": rng.normal(size=n),
+        "price": rng.integers(0, 400, n) / 4,
+    })
+    out, report = compact_dtypes(df)
+
+    assert isinstance(out["variant"].dtype, pd.CategoricalDtype)
+    assert out["user_id"].dtype == df["user_id"].dtype  # high cardinality stays as is
+    assert out["converted"].dtype == np.int8
+    assert out["clicks"].dtype == np.int8
+    assert out["revenue"].dtype == np.float64
+    assert out["price"].dtype == np.float32
+    assert set(report.changes) == {"variant", "converted", "clicks", "price"}
+    assert report.bytes_saved == report.bytes_before - report.bytes_after > 0
+    pd.testing.assert_frame_equal(out.astype(df.dtypes.to_dict()), df)
+
+    before = analyze_experiment(df, "converted", "variant", MetricType.BINARY, "control")
+    after = analyze_experiment(out, "converted", "variant", MetricType.BINARY, "control")
+    assert after.model_dump() == before.model_dump()
@@ -0,0 +1,52 @@
+from causal_agent.analysis import QuantileResult
+from causal_agent.memo import ResultCache, result_key
+from causal_agent.schemas import AnalysisType
+
+
+class DictStore:
+    def __init__(self):
+        self.rows = {}
+
+    def load(self, key):
+        return self.rows.get(key)
+
+    def save(self, key, payload):
+        self.rows[key] = payload
+
+
+def _result(value):
+    return QuantileResult(variant="B", quantile=0.5, value=value)
+
+
+def test_result_key_normalises_params():
+    a = result_key("experiment", "abc", {"metric_col": " y ", "analysis_type": AnalysisType.BAYESIAN, "seed": None})
+    b = result_key("experiment", "abc", {"analysis_type": "bayesian", "metric_col": "y"})
+    assert a == b
+    assert a != result_key("experiment", "abd", {"analysis_type": "bayesian", "metric_col": "y"})
+    assert a != result_key("causal", "abc", {"analysis_type": "bayesian", "metric_col": "y"})
+
+
+def test_lru_bound_stats_and_store():
+    size = len(_result(0.0).model_dump_json())
+    store = DictStore()
+    cache = ResultCache(max_bytes=2 * size, store=store)
+
+    assert cache.get("k0", QuantileResult) is None
+    for i in range(3):
+        cache.put(f"k{i}", _result(float(i)))
+    stats = cache.stats()
+    assert (stats.entries, stats.evictions, stats.misses) == (2, 1, 1)
+    assert stats.bytes <= stats.max_bytes
+
+    got = cache.get("k2", QuantileResult)
+    assert got == _result(2.0)
+    got.value = -1.0  # callers get their own copy
+    assert cache.get("k2", QuantileResult).value == 2.0
+
+    # evicted from memory but persisted
+    assert cache.get("k0", QuantileResult) == _result(0.0)
+    stats = cache.stats()
+    assert (stats.hits, stats.store_hits) == (3, 1)
+
+    cache.clear()
+    assert ResultCache(store=store).get("k1", QuantileResult) == _result(1.0)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from causal_agent.analysis import analyze_experiment, analyze_observational
+from causal_agent.profiling import profile
+from causal_agent.schemas import AnalysisType, MetricType
+
+
+def _frame(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    pre = rng.normal(10, 2, n)
+    return pd.DataFrame({
+        "variant": rng.choice(["A", "B"], n),
+        "pre": pre,
+        "y": pre + rng.normal(0, 1, n),
+    })
+
+
+def test_profile_records_stages_and_attaches():
+    df = _frame()
+    assert analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "A").profile is None
+
+    with profile(memory=True, cprofile=True, attach=True) as prof:
+        result = analyze_experiment(
+            df, "y", "variant", MetricType.CONTINUOUS, "A", covariate_col="pre",
+            analysis_type=AnalysisType.BAYESIAN, bayesian_method="monte_carlo", seed=1,
+        )
+    stages = {s.name: s for s in prof.report().stages}
+    for name in [
+        "analyze_experiment",
+        "analyze_experiment/sufficient_stats",
+        "analyze_experiment/cuped",
+        "analyze_experiment/analyze_variant_stats/srm",
+        "analyze_experiment/analyze_variant_stats/prob_beat_control",
+    ]:
+        assert name in stages
+    assert stages["analyze_experiment"].calls == 1
+    assert stages["analyze_experiment"].peak_mb > 0
+    assert result.profile is not None and result.profile.cprofile
+    assert {s.name for s in result.profile.stages} == set(stages)
+
+
+def test_profile_env_var_attaches_to_causal_details(monkeypatch):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "unit": np.repeat(np.arange(20), 10),
+        "time": np.tile(np.arange(10), 20),
+        "treated": np.repeat(np.arange(20) < 10, 10).astype(int),
+    })
+    df["y"] = rng.normal(size=len(df)) + 2 * df["treated"] * (df["time"] >= 5)
+
+    kwargs = dict(unit_col="unit", time_col="time", treatment_col="treated", outcome_col="y", post_period_start=5)
+    monkeypatch.setenv("CAUSAL_AGENT_PROFILE", "1")
+    result = analyze_observational(df, "did", **kwargs)
+    names = [s["name"] for s in result.details["profile"]["stages"]]
+    assert "analyze_observational/DifferenceInDifferences.fit/solve" in names
+    assert result.details["profile"]["cprofile"] is None
+
+    monkeypatch.setenv("CAUSAL_AGENT_PROFILE", "0")
+    assert "profile" not in analyze_observational(df, "did", **kwargs).details
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pytest
+
+from causal_agent.analysis import analyze_experiment, analyze_observational, check_srm
+from causal_agent.schemas import MetricType
+
+pytest.importorskip("duckdb")
+
+from causal_agent.pushdown import analyze_experiment_sql, check_srm_sql, did_sql  # noqa: E402
+
+
+def _experiment(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "variant": rng.choice(["control", "treatment", "other"], n),
+        "pre": rng.normal(size=n),
+        "pre2": rng.normal(size=n),
+        "ts": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 24 * 7, n), unit="h"),
+    })
+    df["y"] = df["pre"] + rng.normal(size=n)
+    df.loc[::13, "y"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("suffix", ["parquet", "csv", "arrow"])
+@pytest.mark.parametrize(
+    "metric_type,covariate_col,denominator_col",
+    [
+        (MetricType.CONTINUOUS, None, None),
+        (MetricType.CONTINUOUS, "pre", None),
+        (MetricType.CONTINUOUS, ["pre", "pre2"], None),
+        (MetricType.RATIO, None, "pre2"),
+    ],
+)
+def test_sql_matches_pandas(tmp_path, suffix, metric_type, covariate_col, denominator_col):
+    df = _experiment()
+    path = tmp_path / f"exp.{suffix}"
+    if suffix == "parquet":
+        df.to_parquet(path)
+    elif suffix == "csv":
+        df.to_csv(path, index=False)
+    else:
+        feather.write_feather(df, path)
+
+    options = dict(covariate_col=covariate_col, denominator_col=denominator_col, timestamp_col="ts")
+    expected = analyze_experiment(df, "y", "variant", metric_type, "control", **options)
+    got = analyze_experiment_sql(path, "y", "variant", metric_type, "control", **options)
+
+    by_variant = {r.variant: r for r in got.results}
+    for res in expected.results:
+        other = by_variant[res.variant]
+        for field in ["sample_size", "mean", "std_dev", "lift", "p_value", "ci_lower", "ci_upper"]:
+            assert getattr(other, field) == pytest.approx(getattr(res, field), rel=1e-8, abs=1e-12)
+    if expected.cuped_theta is None:
+        assert got.cuped_theta is None
+    else:
+        assert got.cuped_theta == pytest.approx(expected.cuped_theta)
+    assert [p.p_value for p in got.srm_series] == pytest.approx([p.p_value for p in expected.srm_series])
+    assert check_srm_sql(path, "variant") == pytest.approx(check_srm(df, "variant"))
+
+
+@pytest.mark.parametrize("suffix", ["parquet", "csv"])
+def test_sql_keeps_pandas_variant_order(tmp_path, suffix):
+    df = _experiment()
+    df = pd.concat([df[df["variant"] == "treatment"].head(1), df]).reset_index(drop=True)
+    path = tmp_path / f"exp.{suffix}"
+    if suffix == "parquet":
+        df.to_parquet(path)
+    else:
+        df.to_csv(path, index=False)
+
+    # an unknown control label falls back to the first arm in both paths
+    expected = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "missing")
+    got = analyze_experiment_sql(path, "y", "variant", MetricType.CONTINUOUS, "missing")
+
+    assert got.control_variant == expected.control_variant == "treatment"
+    assert [r.variant for r in got.results] == [r.variant for r in expected.results]
+    assert [r.p_value for r in got.results] == pytest.approx([r.p_value for r in expected.results], nan_ok=True)
+
+
+@pytest.mark.parametrize("suffix", ["parquet", "csv"])
+def test_sql_srm_series_skips_missing_timestamps(tmp_path, suffix):
+    df = _experiment(n=3000)
+    df.loc[::59, "ts"] = pd.NaT
+    path = tmp_path / f"exp.{suffix}"
+    if suffix == "parquet":
+        df.to_parquet(path)
+    else:
+        df.to_csv(path, index=False)
+
+    expected = analyze_experiment(df, "y", "variant", MetricType.CONTINUOUS, "control", timestamp_col="ts")
+    got = analyze_experiment_sql(path, "y", "variant", MetricType.CONTINUOUS, "control", timestamp_col="ts")
+
+    assert [p.date for p in got.srm_series] == [p.date for p in expected.srm_series]
+    assert [p.p_value for p in got.srm_series] == pytest.approx([p.p_value for p in expected.srm_series])
+
+
+def test_did_sql_matches_ols(tmp_path):
+    rng = np.random.default_rng(1)
+    unit = np.repeat(np.arange(40), 8)
+    time = np.tile(np.arange(8), 40)
+    treat = (unit < 15).astype(int)
+    df = pd.DataFrame({"unit": unit, "time": time, "treat": treat, "y": rng.normal(size=len(unit)) + 1.5 * treat * (time >= 4)})
+    df.to_parquet(tmp_path / "panel.parquet")
+
+    kwargs = dict(unit_col="unit", time_col="time", treatment_col="treat", outcome_col="y", post_period_start=4)
+    expected = analyze_observational(df, "did", **kwargs)
+    got = did_sql(tmp_path / "panel.parquet", **kwargs)
+    assert got.effect == pytest.approx(expected.effect, rel=1e-9)
+    assert got.details["coefficients"] == pytest.approx(expected.details["coefficients"], rel=1e-9, abs=1e-12)
+    assert sum(cell["n"] for cell in got.details["cells"]) == len(df)
@@ -0,0 +1,56 @@
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from causal_agent import registry as registry_module
+from causal_agent.registry import DatasetRegistry
+
+
+def _csv(seed, n=2000):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"variant": rng.choice([0, 1], n), "y": rng.normal(size=n), "pre": rng.normal(size=n)})
+    return df, io.BytesIO(df.to_csv(index=False).encode())
+
+
+def test_register_once_and_read_columns(tmp_path, monkeypatch):
+    reg = DatasetRegistry(tmp_path)
+    df, buf = _csv(0)
+    info = reg.register(buf, "exp.csv")
+    assert info.n_rows == len(df)
+    assert info.columns == ["variant", "y", "pre"]
+    assert info.compaction.changes["variant"] == "int64 -> int8"
+
+    # same bytes: no re-parse
+    with monkeypatch.context() as m:
+        m.setattr(registry_module, "read_table", lambda *a, **k: pytest.fail("re-parsed"))
+        assert reg.register(io.BytesIO(buf.getvalue()), "copy.csv").dataset_id == info.dataset_id
+
+    got = reg.read(info.dataset_id, ["y", "variant", None], categorical=["variant"])
+    assert list(got.columns) == ["y", "variant"]
+    assert sorted(got["variant"].cat.categories) == ["0", "1"]
+    np.testing.assert_allclose(got["y"], df["y"])
+    assert sum(len(c) for c in reg.iter_chunks(info.dataset_id, ["y"], chunksize=300)) == len(df)
+
+    with pytest.raises(ValueError):
+        reg.info("0" * 32)
+    with pytest.raises(ValueError):
+        reg.read("../etc")
+
+
+def test_lru_eviction(tmp_path):
+    reg = DatasetRegistry(tmp_path, max_bytes=10**9)
+    ids = []
+    for seed in range(3):
+        ids.append(reg.register(_csv(seed)[1], "d.csv").dataset_id)
+        time.sleep(0.01)
+    size = reg.info(ids[0]).size_bytes
+
+    reg.read(ids[0])  # most recently used now
+    reg.max_bytes = 2 * size + size // 2
+    assert reg.evict() == [ids[1]]
+    assert reg.info(ids[0]) and reg.info(ids[2])
+    with pytest.raises(ValueError):
+        reg.info(ids[1])
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from causal_agent.sequential import SequentialTest
+
+
+def _batch(rng, n, effect=0.0):
+    variant = rng.choice(["A", "B"], n)
+    y = rng.normal(0, 1, n) + (variant == "B") * effect
+    return pd.DataFrame({"variant": variant, "y": y})
+
+
+def test_incremental_updates_match_single_update():
+    rng = np.random.default_rng(0)
+    batches = [_batch(rng, 500, effect=0.3) for _ in range(6)]
+
+    incremental = SequentialTest("y", "variant", "A", mixture_sd=0.2)
+    for b in batches:
+        incremental.update(b)
+    once = SequentialTest("y", "variant", "A", mixture_sd=0.2).update(pd.concat(batches))
+
+    a = next(r for r in incremental.analyze().results if r.variant == "B")
+    b = next(r for r in once.analyze().results if r.variant == "B")
+    assert a.p_value == pytest.approx(b.p_value, rel=1e-9)
+    assert a.is_significant
+
+
+def test_always_valid_p_value_is_monotone_and_state_round_trips():
+    rng = np.random.default_rng(1)
+    test = SequentialTest("y", "variant", "A")
+    p_values, widths = [], []
+    for _ in range(10):
+        test = SequentialTest.from_dict(test.update(_batch(rng, 300)).to_dict())
+        res = next(r for r in test.analyze().results if r.variant == "B")
+        p_values.append(res.p_value)
+        widths.append(res.ci_upper - res.ci_lower)
+
+    assert p_values == sorted(p_values, reverse=True)
+    assert widths == sorted(widths, reverse=True)
+    assert test.looks == 10
+
+
+def test_mixture_sd_waits_for_a_usable_variance():
+    rng = np.random.default_rng(2)
+    test = SequentialTest("y", "variant", "A")
+    test.update(pd.DataFrame({"variant": ["A", "B", "A", "B"], "y": [1.0, 1.0, 1.0, 1.0]}))
+    first = next(r for r in test.analyze().results if r.variant == "B")
+    assert first.p_value is None and test.mixture_sd is None and not test.running
+
+    test = SequentialTest.from_dict(test.to_dict())
+    res = next(r for r in test.update(_batch(rng, 2000, effect=0.5)).analyze().results if r.variant == "B")
+    assert test.mixture_sd > 0
+    assert np.isfinite(res.ci_lower) and np.isfinite(res.ci_upper) and res.is_significant
+
+    with pytest.raises(ValueError, match="mixture_sd"):
+        SequentialTest("y", "variant", "A", mixture_sd=0.0)
+
+
+def test_srm_uses_allocation_across_saved_state():
+    rng = np.random.default_rng(3)
+    n = 20_000
+    batch = pd.DataFrame({"variant": rng.choice(["A", "B"], n, p=[0.9, 0.1]), "y": rng.normal(size=n)})
+
+    assert SequentialTest("y", "variant", "A", mixture_sd=0.2).update(batch).analyze().srm_warning
+    test = SequentialTest("y", "variant", "A", mixture_sd=0.2, allocation={"A": 0.9, "B": 0.1}).update(batch)
+    restored = SequentialTest.from_dict(test.to_dict())
+    assert restored.allocation == {"A": 0.9, "B": 0.1}
+    assert not restored.analyze().srm_warning
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from causal_agent.analysis import analyze_quantiles
+from causal_agent.sketch import TDigest
+
+
+def test_tdigest_quantiles_and_merge():
+    rng = np.random.default_rng(0)
+    x = rng.lognormal(size=200_000)
+
+    streamed = TDigest()
+    for part in np.array_split(x, 10):
+        streamed.update(part)
+    merged = TDigest().update(x[:50_000]).merge(TDigest().update(x[50_000:]))
+
+    assert streamed.count == merged.count == len(x)
+    assert len(streamed.means) <= 2 * streamed.compression
+    for q in [0.5, 0.95, 0.99]:
+        exact = np.quantile(x, q)
+        assert streamed.quantile(q) == pytest.approx(exact, rel=0.01)
+        assert merged.quantile(q) == pytest.approx(exact, rel=0.01)
+
+    np.testing.assert_allclose(TDigest().update([1, 2, 3, 4, np.nan]).quantile([0, 0.5, 1]), [1, 2.5, 4])
+
+
+def test_analyze_quantiles_stream_matches_frame():
+    rng = np.random.default_rng(3)
+    n = 40_000
+    variant = rng.choice(["control", "treatment"], n)
+    latency = rng.lognormal(size=n) * np.where(variant == "treatment", 1.2, 1.0)
+    df = pd.DataFrame({"variant": variant, "latency": latency})
+
+    result = analyze_quantiles(df, "latency", "variant", "control")
+    chunked = analyze_quantiles(
+        (df.iloc[i:i + 7000] for i in range(0, n, 7000)), "latency", "variant", "control"
+    )
+
+    assert result.control_variant == "control"
+    treated = [r for r in result.results if r.variant == "treatment"]
+    assert [r.quantile for r in treated] == [0.5, 0.95, 0.99]
+    for r in treated:
+        exact = np.quantile(latency[variant == "treatment"], r.quantile)
+        assert r.value == pytest.approx(exact, rel=0.02)
+        assert r.ci_lower < r.diff < r.ci_upper
+    assert treated[0].is_significant
+    for a, b in zip(result.results, chunked.results, strict=True):
+        assert a.value == pytest.approx(b.value, rel=0.01)
+
+    with pytest.raises(ValueError):
+        analyze_quantiles(df, "latency", "variant", "control", quantiles=[95])